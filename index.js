@@ -153,14 +153,41 @@ app.get("/numbers-letters", (req, res) => {
     res.render("numbers-letters.ejs");
 });
 
+// Headers for requests forwarded to the Python APIs: they rate limit per client,
+// so name the browser (the APIs only trust these from FORWARDED_ALLOW_IPS)
+function recognitionHeaders(req) {
+    const forwardedFor = [req.headers['x-forwarded-for'], req.socket.remoteAddress].filter(Boolean).join(', ');
+    const headers = {
+        'Content-Type': 'application/json',
+        'X-Forwarded-For': forwardedFor
+    };
+    // Only a saved session is stable across requests; a fresh ID per request would dodge the limit
+    if (req.session?.user) {
+        headers['X-Session-ID'] = req.sessionID;
+    }
+    return headers;
+}
+
+// Pass rate limiting (429) and load shedding (503) through with their Retry-After hint
+function forwardThrottling(res, error) {
+    const status = error.response?.status;
+    if (status !== 429 && status !== 503) {
+        return false;
+    }
+    const retryAfter = error.response.headers['retry-after'];
+    if (retryAfter) {
+        res.set('Retry-After', retryAfter);
+    }
+    res.status(status).json(error.response.data);
+    return true;
+}
+
 // API endpoint to proxy requests to the Python backend for quiz
 app.post("/api/quiz", async (req, res) => {
     try {
         // Forward the request to the Python backend
         const response = await axios.post(`${PYTHON_API_URL}/api/quiz`, req.body, {
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: recognitionHeaders(req),
             maxContentLength: Infinity,
             maxBodyLength: Infinity
         });
@@ -169,6 +196,9 @@ app.post("/api/quiz", async (req, res) => {
         res.json(response.data);
     } catch (error) {
         console.error("Error forwarding to Python backend:", error.message);
+        if (forwardThrottling(res, error)) {
+            return;
+        }
         res.status(500).json({
             error: "Failed to process sign language recognition",
             details: error.message
@@ -181,9 +211,7 @@ app.post("/api/translate", async (req, res) => {
     try {
         // Forward the request to the Translation API backend
         const response = await axios.post(`${TRANSLATE_API_URL}/api/translate`, req.body, {
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: recognitionHeaders(req),
             maxContentLength: Infinity,
             maxBodyLength: Infinity
         });
@@ -192,6 +220,9 @@ app.post("/api/translate", async (req, res) => {
         res.json(response.data);
     } catch (error) {
         console.error("Error forwarding to Translation API:", error.message);
+        if (forwardThrottling(res, error)) {
+            return;
+        }
         res.status(500).json({
             error: "Failed to process sign language translation",
             details: error.message
@@ -242,9 +273,7 @@ app.post("/api/recognize", async (req, res) => {
     try {
         // Forward the request to the Numbers & Letters Recognition API
         const response = await axios.post(`${NUMBERS_LETTERS_API_URL}/api/recognize`, req.body, {
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: recognitionHeaders(req),
             maxContentLength: Infinity,
             maxBodyLength: Infinity
         });
@@ -253,6 +282,9 @@ app.post("/api/recognize", async (req, res) => {
         res.json(response.data);
     } catch (error) {
         console.error("Error forwarding to Recognition API:", error.message);
+        if (forwardThrottling(res, error)) {
+            return;
+        }
         res.status(500).json({
             error: "Failed to process numbers and letters recognition",
             details: error.message
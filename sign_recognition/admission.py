@@ -0,0 +1,240 @@
+"""
+Per-client rate limiting and adaptive load shedding for the recognition APIs.
+Each client gets a token bucket, so a few browser tabs polling every 200 ms
+cannot take a single worker away from everyone else. Behind the Node proxy
+(index.js) every request comes from the proxy's address, so the proxy names
+the browser in X-Forwarded-For (and a persisted session in X-Session-ID);
+those headers are only believed from FORWARDED_ALLOW_IPS (addresses or
+CIDR ranges). A trusted proxy that does not name the client is not rate
+limited, rather than putting all of its users in one bucket. For the same
+reason rate limiting is off unless FORWARDED_ALLOW_IPS is set: until the
+proxies in front of the service are known, every visitor would share the
+proxy's bucket. On top of that the
+service watches how many recognition requests are in flight and how long
+recent ones took: when it falls behind, requests are served at reduced
+fidelity (fewer frames processed), and past the hard limit they are turned
+away at once with 503 instead of all timing out together. Both 429 and 503
+carry a Retry-After hint.
+"""
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from collections import OrderedDict
+import ipaddress
+import math
+import os
+import time
+import numpy as np
+import logging
+from metrics import inc, observe, set_gauge
+from server_config import FORWARDED_ALLOW_IPS
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per second per client (the translate client polls at 5/s); 0 disables rate limiting.
+# Off by default until FORWARDED_ALLOW_IPS names the proxies in front of the service
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "6" if os.getenv("FORWARDED_ALLOW_IPS") else "0"))
+# Requests a client may send in a burst above the sustained rate
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+# Clients whose buckets are remembered; the longest idle ones are forgotten first
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Recognition requests in flight above which new ones run at reduced fidelity
+SHED_DEGRADE_IN_FLIGHT = int(os.getenv("SHED_DEGRADE_IN_FLIGHT", "4"))
+# Recognition requests in flight above which new ones are rejected with 503; 0 disables shedding
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "16"))
+# Recent request latency (seconds, moving average) above which requests run at reduced fidelity
+SHED_LATENCY_TARGET = float(os.getenv("SHED_LATENCY_TARGET", "1.0"))
+# Weight of the newest request in the latency moving average
+SHED_LATENCY_SMOOTHING = float(os.getenv("SHED_LATENCY_SMOOTHING", "0.2"))
+# Frames of a capture processed at reduced fidelity
+DEGRADED_MAX_FRAMES = int(os.getenv("DEGRADED_MAX_FRAMES", "12"))
+# Of streamed frames, only every n-th is decoded at reduced fidelity
+DEGRADED_FRAME_STRIDE = int(os.getenv("DEGRADED_FRAME_STRIDE", "2"))
+
+TRUSTED_PROXIES = {address.strip() for address in FORWARDED_ALLOW_IPS.split(',') if address.strip()}
+
+
+def _networks(entries):
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            pass  # "*" or a hostname, matched literally
+    return networks
+
+
+TRUSTED_NETWORKS = _networks(TRUSTED_PROXIES)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """0 when a token was taken, otherwise the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets keyed by client, bounded to the most recently seen clients"""
+
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def check(self, client):
+        """0 when the client may proceed, otherwise the seconds it should wait"""
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.pop(client, None) or TokenBucket(self.rate, self.burst)
+        self._buckets[client] = bucket
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return bucket.take()
+
+
+class LoadShedder:
+    """Load level from the requests in flight and the recent latency
+
+    Requests are handled on the event loop, so the counters need no lock.
+    """
+
+    def __init__(self, degrade_in_flight=SHED_DEGRADE_IN_FLIGHT, max_in_flight=SHED_MAX_IN_FLIGHT,
+                 latency_target=SHED_LATENCY_TARGET, smoothing=SHED_LATENCY_SMOOTHING):
+        self.degrade_in_flight = degrade_in_flight
+        self.max_in_flight = max_in_flight
+        self.latency_target = latency_target
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.latency = 0.0
+
+    def level(self):
+        """'normal', 'degraded' or 'overloaded' for a request arriving now"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return 'overloaded'
+        if self.in_flight >= self.degrade_in_flight or self.latency > self.latency_target:
+            return 'degraded'
+        return 'normal'
+
+    def retry_after(self):
+        """Seconds until the requests ahead should have drained"""
+        return max(1, math.ceil(self.latency * self.in_flight / max(self.max_in_flight, 1)))
+
+    def started(self):
+        self.in_flight += 1
+        set_gauge('sign_requests_in_flight', self.in_flight)
+
+    def finished(self, seconds):
+        self.in_flight -= 1
+        self.latency += self.smoothing * (seconds - self.latency)
+        set_gauge('sign_requests_in_flight', self.in_flight)
+        set_gauge('sign_request_latency_average_seconds', self.latency)
+
+
+def is_trusted_proxy(address):
+    if '*' in TRUSTED_PROXIES or address in TRUSTED_PROXIES:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_NETWORKS)
+
+
+def client_key(request: Request):
+    """Rate limit key of the client behind a request, None when it cannot be told apart
+
+    Directly connected clients are keyed by their address. For a trusted
+    proxy, the forwarded session, else the nearest untrusted address in
+    X-Forwarded-For (earlier entries can be forged by the client).
+    """
+    peer = request.client.host if request.client else None
+    if peer is None:
+        return None
+    if not is_trusted_proxy(peer):
+        return f"ip:{peer}"
+
+    session = request.headers.get("x-session-id")
+    if session:
+        return f"session:{session[:128]}"
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return f"ip:{hop}"
+    return None
+
+
+def is_degraded(request: Request):
+    """Whether this request should be served at reduced fidelity"""
+    return getattr(request.state, 'load_level', 'normal') == 'degraded'
+
+
+def frame_stride(request: Request):
+    """Stride for StreamingLandmarkPipeline at this request's fidelity"""
+    return DEGRADED_FRAME_STRIDE if is_degraded(request) else 1
+
+
+def thin_frames(frames, max_frames=DEGRADED_MAX_FRAMES):
+    """Evenly spaced subset of at most max_frames frames, first and last included"""
+    if len(frames) <= max_frames:
+        return frames
+    return [frames[i] for i in np.linspace(0, len(frames) - 1, max_frames).round().astype(int)]
+
+
+def register_admission(app, path_prefix="/api/"):
+    """Rate limit and shed POST requests under path_prefix"""
+    limiter = RateLimiter()
+    shedder = LoadShedder()
+
+    @app.middleware("http")
+    async def admit_request(request: Request, call_next):
+        if request.method != "POST" or not request.url.path.startswith(path_prefix):
+            return await call_next(request)
+
+        endpoint = request.url.path
+        client = client_key(request)
+        wait = limiter.check(client) if client is not None else 0.0
+        if wait > 0:
+            inc('sign_requests_rejected_total', reason='rate_limited', endpoint=endpoint)
+            return JSONResponse(status_code=429, content={"detail": "Too many requests, slow down"},
+                                headers={"Retry-After": str(max(1, math.ceil(wait)))})
+
+        level = shedder.level()
+        if level == 'overloaded':
+            inc('sign_requests_rejected_total', reason='overloaded', endpoint=endpoint)
+            logger.warning(f"Shedding {endpoint}: {shedder.in_flight} requests in flight")
+            return JSONResponse(status_code=503, content={"detail": "Service overloaded, try again shortly"},
+                                headers={"Retry-After": str(shedder.retry_after())})
+
+        if level == 'degraded':
+            inc('sign_requests_degraded_total', endpoint=endpoint)
+        request.state.load_level = level
+
+        started = time.perf_counter()
+        shedder.started()
+        try:
+            response = await call_next(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            shedder.finished(elapsed)
+        response.headers["X-Load-Level"] = level
+
+        # Set by tiers.resolve_tier() in the endpoint
+        tier = getattr(request.state, 'quality_tier', None)
+        if tier is not None:
+            observe('sign_request_seconds', elapsed, tier=tier, endpoint=endpoint)
+            response.headers["X-Quality-Tier"] = tier
+        return response
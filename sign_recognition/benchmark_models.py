@@ -0,0 +1,97 @@
+"""
+CPU latency benchmark of the sign model architectures.
+Times single-sequence inference (batch size 1, as the API runs it) for
+freshly built models of each architecture (model.py, tcn.py) and for any trained
+model files given, and reports p50/p99 latency both through model.predict
+(what SignLanguageModel.classify calls) and through a direct model call.
+Latency does not depend on the weights, so untrained models are enough to
+compare architectures; trained ones are also scored on --data.
+
+Usage:
+    python benchmark_models.py
+    python benchmark_models.py --models models/sign_language_numbers_letters.h5 --data training_data
+    MODEL_ARCHITECTURE=tcn python train.py  # then benchmark the trained TCN the same way
+    python benchmark_models.py --threads 2 --runs 500
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare inference latency of sign model architectures")
+    parser.add_argument('--architectures', nargs='*', choices=['lstm', 'tcn'], default=['lstm', 'tcn'],
+                        help="Architectures to build and time with untrained weights")
+    parser.add_argument('--models', nargs='*', default=[], help="Trained model files to time as well")
+    parser.add_argument('--data', help="Dataset to measure the trained models' accuracy on")
+    parser.add_argument('--classes', type=int, default=6, help="Output classes of the untrained models")
+    parser.add_argument('--features', type=int, default=63, help="Features per frame of the untrained models")
+    parser.add_argument('--runs', type=int, default=300, help="Timed predictions per model and call path")
+    parser.add_argument('--threads', type=int, help="TensorFlow intra-op threads (default: all cores)")
+    return parser.parse_args()
+
+
+def latency_ms(keras_model, X, runs, direct=False):
+    """p50 and p99 of single-sequence predictions, through model.predict or a direct model call"""
+    def run(sample):
+        if direct:
+            keras_model(sample, training=False)
+        else:
+            keras_model.predict(sample, verbose=0)
+
+    run(X[:1])  # Warm-up
+    timings = []
+    for i in range(runs):
+        sample = X[i % len(X)][None]
+        started = time.perf_counter()
+        run(sample)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def main():
+    args = parse_args()
+    import tensorflow as tf
+    if args.threads:
+        # Must happen before TensorFlow runs anything
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    from model import SignLanguageModel
+    from tcn import build_tcn
+
+    candidates = []
+    for architecture in args.architectures:
+        input_shape = (30, args.features)
+        if architecture == 'tcn':
+            keras_model = build_tcn(input_shape, args.classes)
+        else:
+            keras_model = SignLanguageModel.build_lstm(input_shape, args.classes)
+        candidates.append((f"{architecture} (untrained)", keras_model, None))
+    for path in args.models:
+        model = SignLanguageModel(model_path=path)
+        candidates.append((os.path.basename(path), model.model, model))
+
+    print(f"{'model':<40} {'params':>8} {'accuracy':>9} {'predict p50':>12} {'p99':>8} {'call p50':>9} {'p99':>8}")
+    best = None
+    for name, keras_model, model in candidates:
+        accuracy = None
+        if model is not None and args.data:
+            X, y = model.prepare_data_from_directory(args.data)
+            accuracy = float((keras_model.predict(X, verbose=0).argmax(axis=-1) == y).mean()) if len(X) else None
+        X_bench = np.random.default_rng(0).random((32,) + tuple(keras_model.input_shape[1:]), dtype=np.float32)
+
+        predict_p50, predict_p99 = latency_ms(keras_model, X_bench, args.runs)
+        call_p50, call_p99 = latency_ms(keras_model, X_bench, args.runs, direct=True)
+        accuracy_text = f"{accuracy:.3f}" if accuracy is not None else "-"
+        print(f"{name:<40} {keras_model.count_params():>8} {accuracy_text:>9} "
+              f"{predict_p50:>12.2f} {predict_p99:>8.2f} {call_p50:>9.2f} {call_p99:>8.2f}")
+        # Ranked by the path serving takes
+        if best is None or predict_p99 < best[1]:
+            best = (name, predict_p99)
+
+    if best is not None:
+        print(f"\nLowest p99: {best[0]} ({best[1]:.2f} ms through model.predict)")
+
+
+if __name__ == "__main__":
+    main()
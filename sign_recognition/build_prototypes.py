@@ -0,0 +1,55 @@
+"""
+Build or extend the prototype index used by the large-vocabulary engine.
+Each sign's landmark sequences (a seq_N.npy tree as written by the collection
+scripts, or a landmark dataset) become one prototype embedded with the
+trained backbone; signs can be added one at a time without retraining
+anything.
+
+Usage:
+    python build_prototypes.py training_data
+    python build_prototypes.py landmark_data --signs hello thanks --replace
+"""
+import argparse
+import os
+from landmark_store import LandmarkDataset, is_landmark_dataset, iter_sequences
+from prototypes import PrototypeEngine, PROTOTYPE_INDEX_PATH
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Add signs to the prototype index")
+    parser.add_argument('data_dir', help="Landmark dataset, or directory with one sub-directory of .npy sequences per sign")
+    parser.add_argument('--signs', nargs='*', help="Only these signs (default: every sub-directory)")
+    parser.add_argument('--index', default=PROTOTYPE_INDEX_PATH, help="Prototype index file to extend")
+    parser.add_argument('--replace', action='store_true',
+                        help="Drop existing prototypes of a sign before adding the new one")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    engine = PrototypeEngine(index_path=args.index)
+
+    if args.signs:
+        signs = args.signs
+    elif is_landmark_dataset(args.data_dir):
+        signs = LandmarkDataset(args.data_dir).classes
+    else:
+        signs = sorted(name for name in os.listdir(args.data_dir) if os.path.isdir(os.path.join(args.data_dir, name)))
+
+    for sign in signs:
+        sequences = list(iter_sequences(args.data_dir, sign))
+        if not sequences:
+            print(f"Warning: No data files found for '{sign}'")
+            continue
+
+        if args.replace:
+            engine.index.remove(sign)
+        engine.add_sign(sign, sequences)
+        print(f"Added '{sign}' from {len(sequences)} sequences")
+
+    engine.save()
+    print(f"\nSaved {len(engine.index)} prototypes for {len(engine.classes)} signs to {args.index}")
+
+
+if __name__ == "__main__":
+    main()
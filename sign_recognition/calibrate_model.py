@@ -0,0 +1,45 @@
+"""
+Fit the confidence temperature of an already trained model.
+train.py calibrates every model it trains, incremental updates included;
+use this for models trained before calibration existed. The temperature
+is fitted on the same held-out split SignLanguageModel.train validates on.
+
+Usage:
+    python calibrate_model.py
+    python calibrate_model.py training_data --model models/sign_language_student.h5
+"""
+import argparse
+import os
+from sklearn.model_selection import train_test_split
+from model import SignLanguageModel
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calibrate a sign model's confidences")
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(os.path.dirname(__file__), 'training_data'),
+                        help="Landmark dataset, or directory with one sub-directory of .npy sequences per sign")
+    parser.add_argument('--model', help="Model file (default: the model the API loads)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    model = SignLanguageModel(model_path=args.model)
+    if model.version == "untrained":
+        print("No trained model found. Run train.py first.")
+        return
+
+    X, y = model.prepare_data_from_directory(args.data_dir)
+    if len(X) == 0:
+        print(f"No data found in {args.data_dir}")
+        return
+    _, X_val, _, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    report = model.calibrate(X_val, y_val)
+    print(f"Temperature {report['temperature']:.3f} from {report['samples']} held-out sequences")
+    print(f"Negative log-likelihood {report['nll'][0]:.4f} -> {report['nll'][1]:.4f}")
+    print(f"Expected calibration error {report['ece'][0]:.4f} -> {report['ece'][1]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
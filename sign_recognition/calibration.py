@@ -0,0 +1,82 @@
+"""
+Temperature scaling of classifier confidences.
+Softmax outputs of different trainings are not equally confident: one model
+version may put 0.9 where another puts 0.6 for equally reliable answers. A
+single temperature per model, fitted on held-out data to minimize the
+negative log-likelihood, rescales the outputs so that a confidence of 0.8
+is right about 80% of the time, and thresholds mean the same thing across
+versions. The temperature is saved next to the model
+(<model>.calibration.json).
+"""
+import json
+import os
+import numpy as np
+
+# Calibrated confidence below which a prediction is reported as "uncertain"
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.35"))
+# Temperatures searched when fitting
+TEMPERATURE_GRID = np.exp(np.linspace(np.log(0.2), np.log(10.0), 200))
+
+
+def calibration_path(model_path):
+    return os.path.splitext(model_path)[0] + '.calibration.json'
+
+
+def apply_temperature(probabilities, temperature):
+    """softmax(logits / T) from softmax outputs; the log-sum-exp of the logits cancels out"""
+    scaled = np.log(np.clip(probabilities, 1e-7, 1.0)) / temperature
+    scaled -= scaled.max(axis=-1, keepdims=True)
+    calibrated = np.exp(scaled)
+    return calibrated / calibrated.sum(axis=-1, keepdims=True)
+
+
+def negative_log_likelihood(probabilities, labels):
+    return float(-np.log(np.clip(probabilities[np.arange(len(labels)), labels], 1e-7, 1.0)).mean())
+
+
+def expected_calibration_error(probabilities, labels, bins=10):
+    """Average gap between confidence and accuracy over confidence bins"""
+    confidence = probabilities.max(axis=-1)
+    correct = probabilities.argmax(axis=-1) == labels
+    edges = np.linspace(0, 1, bins + 1)
+    error = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            error += in_bin.mean() * abs(confidence[in_bin].mean() - correct[in_bin].mean())
+    return float(error)
+
+
+def fit_temperature(probabilities, labels):
+    """Temperature minimizing the held-out negative log-likelihood"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.int64)
+    losses = [negative_log_likelihood(apply_temperature(probabilities, t), labels) for t in TEMPERATURE_GRID]
+    return float(TEMPERATURE_GRID[int(np.argmin(losses))])
+
+
+def calibrate(model_path, probabilities, labels, version=None):
+    """Fit, save and report the temperature of a model from its held-out outputs"""
+    temperature = fit_temperature(probabilities, labels)
+    calibrated = apply_temperature(probabilities, temperature)
+    report = {
+        'temperature': temperature,
+        'fitted_on': version,
+        'samples': int(len(labels)),
+        'nll': [negative_log_likelihood(probabilities, labels), negative_log_likelihood(calibrated, labels)],
+        'ece': [expected_calibration_error(probabilities, labels), expected_calibration_error(calibrated, labels)],
+    }
+    path = calibration_path(model_path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return report
+
+
+def load_calibration(model_path):
+    """Saved calibration of a model, or None when it has not been calibrated"""
+    path = calibration_path(model_path)
+    if not model_path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
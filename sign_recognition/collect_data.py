@@ -2,19 +2,28 @@
 Script to collect training data for sign language recognition.
 Modified to collect data for numbers 1,2,3 and letters a,b,c.
 Run this script to record hand gesture data for model training.
+Pass --input with recorded videos or image directories to collect headlessly.
 """
+import atexit
 import cv2
 import mediapipe as mp
 import numpy as np
 import os
+import sys
 import time
+from headless_collection import parse_collection_args, run_headless
+from landmark_store import LandmarkDataset
+from vision import two_hand_landmarks
+
+# Hands per frame: 2 records 42 landmarks (left hand, then right hand) for two-handed signs
+num_hands = int(os.getenv("NUM_HANDS", "1"))
 
 # Initialize MediaPipe
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 hands = mp_hands.Hands(
     static_image_mode=False,
-    max_num_hands=1,
+    max_num_hands=num_hands,
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5
 )
@@ -27,6 +36,19 @@ os.makedirs(data_dir, exist_ok=True)
 signs = ['one', 'two', 'three', 'a', 'b', 'c']
 num_sequences = 20  # Number of sequences to collect per sign (reduced for faster collection)
 sequence_length = 30  # Number of frames per sequence
+flush_every = 10  # Sequences written to the landmark dataset together, as one chunk
+
+args = parse_collection_args("Collect training data for numbers 1,2,3 and letters a,b,c")
+if args.input:
+    # Headless: ingest recorded videos or image directories, no display or webcam needed
+    run_headless(args, data_dir, signs, num_hands)
+    sys.exit(0)
+
+# Optionally append to a landmark dataset instead of writing seq_N.npy files
+dataset = LandmarkDataset(args.dataset, create=True, frame_shape=(21 * num_hands, 3)) if args.dataset else None
+if dataset is not None:
+    # Write the sequences still queued on exit, Ctrl+C included
+    atexit.register(dataset.close)
 
 # Initialize webcam
 cap = cv2.VideoCapture(0)
@@ -40,7 +62,9 @@ for sign in signs:
     print(f"COLLECTING DATA FOR SIGN: {sign.upper()}")
     print(f"{'='*50}\n")
     
-    for sequence in range(num_sequences):
+    # A while loop, so a rejected sequence is really recorded again
+    sequence = 0
+    while sequence < num_sequences:
         # Show preparation screen
         print(f"Preparing for sequence {sequence+1}/{num_sequences}")
         print("Please position yourself and press 'q' when ready")
@@ -105,10 +129,14 @@ for sign in signs:
                 for hand_landmarks in results.multi_hand_landmarks:
                     mp_drawing.draw_landmarks(
                         frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                    
+                
+                if num_hands == 2:
+                    # Both hands in one frame, ordered by handedness like the APIs
+                    sequence_data.append(two_hand_landmarks(results))
+                else:
                     # Extract landmarks
                     landmarks = []
-                    for lm in hand_landmarks.landmark:
+                    for lm in results.multi_hand_landmarks[0].landmark:
                         landmarks.append([lm.x, lm.y, lm.z])
                     
                     sequence_data.append(landmarks)
@@ -141,11 +169,19 @@ for sign in signs:
                 # Truncate if needed
                 sequence_data = sequence_data[:sequence_length]
             
-            np.save(filename, np.array(sequence_data))
+            if dataset is not None:
+                # The recording loop waits 40 ms per frame, so roughly 25 fps
+                dataset.append(np.array(sequence_data), sign, source="webcam", fps=25.0)
+                # Batched into one chunk per flush_every sequences (the rest is written on exit)
+                if (sequence + 1) % flush_every == 0:
+                    dataset.flush()
+                filename = f"{args.dataset} [{sign}]"
+            else:
+                np.save(filename, np.array(sequence_data))
             print(f"Saved {filename} ({len(sequence_data)} frames)")
+            sequence += 1
         else:
             print(f"Not enough frames with hand landmarks. Retrying sequence {sequence+1}...")
-            sequence -= 1  # Retry this sequence
             
         # Short pause between sequences
         time.sleep(1)
@@ -0,0 +1,78 @@
+"""
+Convert a training_data/<sign>/seq_N.npy tree into a landmark dataset.
+The result is read by train.py, train_gesture_model.py and
+build_prototypes.py in place of the original directory (see
+landmark_store.py for the format). Converting into an existing dataset
+only appends the files it does not already hold, so a re-run picks up new
+recordings without duplicating the old ones.
+
+Usage:
+    python convert_dataset.py training_data training_data.lmk
+    python convert_dataset.py translation_data translation_data.lmk --dtype float32 --fps 25
+"""
+import argparse
+import os
+import time
+import numpy as np
+from landmark_store import LandmarkDataset, is_landmark_dataset, iter_sequences
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert seq_N.npy files into a landmark dataset")
+    parser.add_argument('source', help="Directory with one sub-directory of .npy sequences per sign")
+    parser.add_argument('output', help="Landmark dataset directory to create or append to")
+    parser.add_argument('--dtype', choices=['float16', 'float32'], default='float16')
+    parser.add_argument('--fps', type=float, help="Capture rate to record for every sequence, if known")
+    return parser.parse_args()
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    args = parse_args()
+    signs = sorted(name for name in os.listdir(args.source) if os.path.isdir(os.path.join(args.source, name)))
+
+    dataset = LandmarkDataset(args.output) if is_landmark_dataset(args.output) else None
+    # Source files converted by an earlier run
+    converted = {record['source'] for record in dataset.records} if dataset is not None else set()
+    started = time.perf_counter()
+    count = 0
+    skipped = 0
+    for sign in signs:
+        sign_dir = os.path.join(args.source, sign)
+        files = sorted(f for f in os.listdir(sign_dir) if f.endswith('.npy'))
+        new = [f for f in files if os.path.join(sign, f) not in converted]
+        skipped += len(files) - len(new)
+        for file_name in new:
+            sequence = np.load(os.path.join(sign_dir, file_name))
+            if dataset is None:
+                # The first sequence decides between one-hand (21) and two-hand (42) frames
+                dataset = LandmarkDataset(args.output, create=True, dtype=args.dtype, frame_shape=sequence.shape[1:])
+            dataset.append(sequence, sign, source=os.path.join(sign, file_name), fps=args.fps)
+            count += 1
+        print(f"Converted {len(new)} sequences for '{sign}'")
+
+    if dataset is None:
+        print(f"No sequences found in {args.source}")
+        return
+    dataset.close()
+    if skipped:
+        print(f"Skipped {skipped} sequences already in {args.output}")
+    elapsed = time.perf_counter() - started
+
+    before, after = directory_size(args.source), directory_size(args.output)
+    print(f"\nConverted {count} sequences in {elapsed:.1f}s: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB "
+          f"({before / max(after, 1):.1f}x smaller)")
+
+    # Cold read of everything, the way training loads it
+    started = time.perf_counter()
+    for sign in dataset.classes:
+        for _ in iter_sequences(args.output, sign):
+            pass
+    print(f"Read back all sequences in {time.perf_counter() - started:.2f}s (dataset version {dataset.version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Knowledge distillation of the served sign model into a compact student.
+The teacher (the trained SignLanguageModel: stacked LSTMs, two of them
+bidirectional) labels the training data with temperature-softened class
+probabilities, and small unidirectional students - a causal dilated 1D
+convolution or a single GRU - are trained to match them, blended with the
+true labels. Causal convolutions and a forward-only GRU only look at past
+frames, so the student can run on a live stream.
+
+Every candidate student is timed at batch size 1 the way the API calls the
+model, and the latency/accuracy tradeoff is reported as a table, a JSON
+file and a plot. The fastest student within --max-accuracy-drop of the
+teacher is saved as the serving artifact, which main.py serves with
+RECOGNITION_ENGINE=student.
+
+Usage:
+    python distill_student.py
+    python distill_student.py training_data --kinds conv --widths 16 32 --temperature 4
+"""
+import argparse
+import json
+import os
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import Input
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import Conv1D, GRU, Dense, Dropout, GlobalAveragePooling1D
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.optimizers import Adam
+from sklearn.model_selection import train_test_split
+import matplotlib.pyplot as plt
+from model import SignLanguageModel, STUDENT_MODEL_PATH, artifact_version
+from calibration import apply_temperature, calibrate
+from incremental import save_training_manifest
+from benchmark_models import latency_ms
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distill the sign model into a compact student")
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(os.path.dirname(__file__), 'training_data'),
+                        help="Landmark dataset, or directory with one sub-directory of .npy sequences per sign")
+    parser.add_argument('--teacher', help="Teacher model file (default: the model the API loads)")
+    parser.add_argument('--output', default=STUDENT_MODEL_PATH, help="Where to save the chosen student")
+    parser.add_argument('--kinds', nargs='+', choices=['conv', 'gru'], default=['conv', 'gru'])
+    parser.add_argument('--widths', nargs='+', type=int, default=[16, 32, 64], help="Filters or GRU units")
+    parser.add_argument('--temperature', type=float, default=4.0, help="Softening of the teacher's outputs")
+    parser.add_argument('--alpha', type=float, default=0.3, help="Weight of the true labels against the teacher")
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02,
+                        help="Largest validation accuracy loss against the teacher allowed for the chosen student")
+    parser.add_argument('--latency-runs', type=int, default=200, help="Single-sequence predictions timed per model")
+    return parser.parse_args()
+
+
+def create_student(input_shape, num_classes, kind='conv', width=32):
+    """Small unidirectional model with the teacher's inputs and outputs"""
+    if kind == 'conv':
+        # Causal, dilated convolutions: each frame only sees the 15 frames up to it
+        body = [
+            Conv1D(width, 3, padding='causal', dilation_rate=1, activation='relu'),
+            Conv1D(width, 3, padding='causal', dilation_rate=2, activation='relu'),
+            Conv1D(width, 3, padding='causal', dilation_rate=4, activation='relu'),
+            GlobalAveragePooling1D(),
+        ]
+    elif kind == 'gru':
+        body = [GRU(width)]
+    else:
+        raise ValueError(f"Unknown student kind {kind!r}, expected 'conv' or 'gru'")
+
+    return Sequential([Input(shape=input_shape)] + body + [
+        Dropout(0.2),
+        Dense(num_classes, activation='softmax')
+    ])
+
+
+def distillation_loss(num_classes, temperature, alpha):
+    """Loss on targets [teacher soft outputs | one-hot labels] against the student's softmax"""
+    def loss(targets, probabilities):
+        soft_targets, hard_targets = targets[:, :num_classes], targets[:, num_classes:]
+        log_probabilities = tf.math.log(tf.clip_by_value(probabilities, 1e-7, 1.0))
+        soft_probabilities = tf.nn.softmax(log_probabilities / temperature)
+        # T^2 keeps the soft term's gradients on the same scale as the hard term's
+        soft_loss = tf.keras.losses.categorical_crossentropy(soft_targets, soft_probabilities)
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard_targets, probabilities)
+        return (1 - alpha) * temperature ** 2 * soft_loss + alpha * hard_loss
+    return loss
+
+
+def distill(student, X, targets, num_classes, args):
+    student.compile(
+        optimizer=Adam(learning_rate=0.003),
+        loss=distillation_loss(num_classes, args.temperature, args.alpha)
+    )
+    student.fit(
+        X, targets,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        validation_split=0.1,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)],
+        verbose=0
+    )
+    # Standard loss for the saved artifact, so load_model() needs no custom objects
+    student.compile(optimizer=Adam(), loss='categorical_crossentropy', metrics=['categorical_accuracy'])
+    return student
+
+
+def evaluate(name, keras_model, X_val, y_val, teacher_val, runs):
+    predictions = keras_model.predict(X_val, verbose=0).argmax(axis=-1)
+    p50, p99 = latency_ms(keras_model, X_val, runs)
+    return {
+        'name': name,
+        'params': int(keras_model.count_params()),
+        'accuracy': float((predictions == y_val).mean()),
+        'teacher_agreement': float((predictions == teacher_val).mean()),
+        'p50_ms': p50,
+        'p99_ms': p99,
+    }
+
+
+def save_report(results, chosen, output_path):
+    plots_dir = os.path.join(os.path.dirname(output_path), 'plots')
+    os.makedirs(plots_dir, exist_ok=True)
+
+    with open(os.path.join(plots_dir, 'distillation_report.json'), 'w') as f:
+        json.dump({'results': results, 'chosen': chosen}, f, indent=2)
+
+    plt.figure(figsize=(6, 4))
+    for result in results:
+        plt.scatter(result['p99_ms'], result['accuracy'], marker='*' if result['name'] == 'teacher' else 'o')
+        plt.annotate(result['name'], (result['p99_ms'], result['accuracy']), fontsize=8)
+    plt.title('Latency / accuracy tradeoff')
+    plt.xlabel('p99 latency at batch size 1 (ms)')
+    plt.ylabel('Validation accuracy')
+    plt.tight_layout()
+    plt.savefig(os.path.join(plots_dir, 'distillation_tradeoff.png'))
+    plt.close()
+    print(f"Report saved to {plots_dir}")
+
+
+def main():
+    args = parse_args()
+    teacher = SignLanguageModel(model_path=args.teacher)
+    if teacher.version == "untrained":
+        print("No trained teacher model found. Run train.py first.")
+        return
+
+    X, y = teacher.prepare_data_from_directory(args.data_dir)
+    if len(X) == 0:
+        print(f"No training data found in {args.data_dir}")
+        return
+    num_classes = len(teacher.classes)
+
+    # Same split as SignLanguageModel.train, so validation sequences stay unseen
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+    teacher_train = teacher.model.predict(X_train, verbose=0)
+    teacher_val = teacher.model.predict(X_val, verbose=0).argmax(axis=-1)
+    targets = np.concatenate([
+        apply_temperature(teacher_train, args.temperature),
+        tf.keras.utils.to_categorical(y_train, num_classes=num_classes)
+    ], axis=1)
+
+    print(f"Distilling {teacher.model_path} ({teacher.model.count_params()} parameters) "
+          f"on {len(X_train)} sequences, validating on {len(X_val)}")
+    results = [evaluate('teacher', teacher.model, X_val, y_val, teacher_val, args.latency_runs)]
+    students = {}
+    for kind in args.kinds:
+        for width in args.widths:
+            name = f"{kind}-{width}"
+            student = distill(create_student(X.shape[1:], num_classes, kind, width), X_train, targets, num_classes, args)
+            students[name] = student
+            results.append(evaluate(name, student, X_val, y_val, teacher_val, args.latency_runs))
+
+    print(f"\n{'model':<10} {'params':>8} {'accuracy':>9} {'agreement':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result['name']:<10} {result['params']:>8} {result['accuracy']:>9.3f} "
+              f"{result['teacher_agreement']:>10.3f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+    floor = results[0]['accuracy'] - args.max_accuracy_drop
+    eligible = [result for result in results[1:] if result['accuracy'] >= floor]
+    chosen = min(eligible, key=lambda result: result['p99_ms'])['name'] if eligible else None
+    save_report(results, chosen, args.output)
+
+    if chosen is None:
+        print(f"\nNo student within {args.max_accuracy_drop:.3f} of the teacher's accuracy; nothing saved")
+        return
+
+    students[chosen].save(args.output)
+    # Classes in output order, read by StudentModel like any SignLanguageModel
+    save_training_manifest(args.output, teacher.classes, teacher.data_manifest)
+    report = calibrate(args.output, students[chosen].predict(X_val, verbose=0), y_val, artifact_version(args.output))
+    print(f"Calibrated confidence temperature {report['temperature']:.3f}")
+    print(f"\nSaved {chosen} to {args.output}; serve it with RECOGNITION_ENGINE=student")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Batch landmark extraction from the sign video library.
+Videos are decoded and run through MediaPipe in parallel worker processes,
+and each one is written as a landmark sequence in the training layout
+(<output>/<sign>/seq_N.npy) that train.py and build_prototypes.py read.
+Frames without a hand are stored as NaN so training can impute them.
+Output goes to video_landmarks/ by default, kept apart from the webcam
+sequences in training_data/, so an extraction run never mixes library
+videos into (or numbers its files among) the collected data; pass
+--output training_data to add them deliberately.
+
+A manifest of content hashes makes runs resumable: videos whose bytes and
+extraction settings are unchanged since the last run are skipped, and the
+manifest is updated after every finished video.
+
+Usage:
+    python extract_video_landmarks.py
+    python extract_video_landmarks.py ../public/assets/videos/signs --output training_data --workers 8
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp_proc
+import os
+import re
+import time
+import numpy as np
+from headless_collection import next_sequence_path
+
+VIDEO_EXTENSIONS = ('.webm', '.mp4', '.mov', '.avi')
+DEFAULT_VIDEO_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'assets', 'videos', 'signs')
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'video_landmarks')
+MANIFEST_NAME = 'video_manifest.json'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract hand landmark sequences from sign videos")
+    parser.add_argument('video_dir', nargs='?', default=DEFAULT_VIDEO_DIR)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help="Dataset root, one directory per sign")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num-hands', type=int, choices=[1, 2], default=int(os.getenv("NUM_HANDS", "1")))
+    parser.add_argument('--max-width', type=int, default=640,
+                        help="Downscale wider frames before tracking (MediaPipe works at low resolution anyway)")
+    parser.add_argument('--force', action='store_true', help="Re-extract every video, ignoring the manifest")
+    return parser.parse_args()
+
+
+def sign_name(file_name):
+    """Class directory for a video: 'HELLO.webm' -> 'hello', 'EVENING (1).webm' -> 'evening'"""
+    stem = os.path.splitext(file_name)[0]
+    stem = stem.replace('%0A', '')  # Some uploads carry a URL-encoded trailing newline
+    stem = re.sub(r'\s*\(\d+\)$', '', stem)
+    return stem.strip().lower()
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    # Write then rename, so an interrupted run never leaves a truncated manifest
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def extract_video(job):
+    """Worker: decode one video and track hands frame by frame"""
+    from headless_collection import iter_frames, track_frames
+
+    video_path, output_path, num_hands, max_width = job
+    started = time.perf_counter()
+    frames, with_hands = track_frames(iter_frames(video_path), num_hands, max_width)
+
+    if with_hands:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        np.save(output_path, frames)
+    elif os.path.exists(output_path):
+        # The video changed and no longer shows a hand; drop its old sequence
+        os.remove(output_path)
+
+    return video_path, len(frames), with_hands, time.perf_counter() - started
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    settings = {'num_hands': args.num_hands, 'max_width': args.max_width}
+
+    videos = sorted(f for f in os.listdir(args.video_dir) if f.lower().endswith(VIDEO_EXTENSIONS))
+    print(f"Found {len(videos)} videos in {args.video_dir}")
+
+    jobs = []
+    hashes = {}
+    taken = set()
+    skipped = 0
+    for file_name in videos:
+        video_path = os.path.join(args.video_dir, file_name)
+        digest = file_hash(video_path)
+        entry = manifest.get(file_name)
+
+        if (not args.force and entry and entry['sha1'] == digest and entry['settings'] == settings
+                and (entry['output'] is None or os.path.exists(entry['output']))):
+            skipped += 1
+            continue
+
+        # A changed video overwrites its previous sequence instead of adding another
+        if entry and entry['output']:
+            output_path = entry['output']
+            taken.add(output_path)
+        else:
+            output_path = next_sequence_path(os.path.join(args.output, sign_name(file_name)), taken)
+            taken.add(output_path)
+
+        hashes[video_path] = (file_name, digest, output_path)
+        jobs.append((video_path, output_path, args.num_hands, args.max_width))
+
+    print(f"Skipping {skipped} unchanged videos, extracting {len(jobs)} with {args.workers} workers")
+    if not jobs:
+        return
+
+    started = time.perf_counter()
+    total_frames = 0
+    # Spawned workers, so no MediaPipe or OpenCV state is inherited through fork
+    with mp_proc.get_context('spawn').Pool(args.workers) as pool:
+        for done, (video_path, frame_count, with_hands, seconds) in enumerate(
+                pool.imap_unordered(extract_video, jobs), start=1):
+            file_name, digest, output_path = hashes[video_path]
+            total_frames += frame_count
+
+            manifest[file_name] = {
+                'sha1': digest,
+                'sign': sign_name(file_name),
+                'output': output_path if with_hands else None,
+                'frames': frame_count,
+                'frames_with_hands': with_hands,
+                'settings': settings,
+            }
+            save_manifest(manifest_path, manifest)
+
+            elapsed = time.perf_counter() - started
+            status = f"{with_hands}/{frame_count} frames with hands" if with_hands else "no hands found, skipped"
+            print(f"[{done}/{len(jobs)}] {file_name}: {status} ({seconds:.1f}s) - "
+                  f"{done / elapsed:.2f} videos/s, {total_frames / elapsed:.0f} frames/s")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nExtracted {len(jobs)} videos ({total_frames} frames) in {elapsed:.1f}s "
+          f"({total_frames / elapsed:.0f} frames/s). Manifest: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Fast path for static signs: k-nearest-neighbour search over single frames.
+Static handshapes ('a', 'b', 'one', ...) are recognizable from any one frame,
+so instead of running the 30-step recurrent model, a few frames of the
+capture are each matched against normalized training frames and vote for a
+sign. The router answers from the votes when they agree, the hand held
+still and the frames lie as close to their neighbours as held-out training
+frames do, and escalates to the full model otherwise (a unanimous vote among
+far-away neighbours says little); a confident answer costs one small matrix
+product, well under a millisecond.
+
+The confidence of a fast-path answer is the winning sign's share of the
+neighbour votes, not a calibrated softmax probability: it is not scaled by
+the backbone's temperature, and since answers need a share of at least
+FAST_PATH_MIN_CONFIDENCE (0.8 by default, well above the backbone's
+CONFIDENCE_THRESHOLD) they are never reported as "uncertain". The two
+routes' confidences are therefore on different scales. A capture the votes
+are unsure about is escalated to the backbone, whose calibrated confidence
+and "uncertain" cutoff apply.
+"""
+import hashlib
+import os
+import time
+import numpy as np
+import logging
+import traceback
+from landmarks import impute_missing, resample_sequence, normalize_frames
+from metrics import inc, observe
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH_INDEX_PATH = os.getenv(
+    "FAST_PATH_INDEX_PATH", os.path.join(os.path.dirname(__file__), 'models', 'fast_path_frames.npz')
+)
+# Signs the fast path may answer; everything else always goes to the full model
+STATIC_SIGNS = [s for s in os.getenv("STATIC_SIGNS", "one,two,three,a,b,c").split(',') if s]
+# Frames of a capture (and of every training sequence) that are matched
+FAST_PATH_FRAMES = int(os.getenv("FAST_PATH_FRAMES", "8"))
+FAST_PATH_K = int(os.getenv("FAST_PATH_K", "5"))
+# Share of neighbour votes the winning sign needs for the fast path to answer; the share is
+# reported as the confidence, so keep this above the backbone's CONFIDENCE_THRESHOLD
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+# Wrist travel over the capture, in palm lengths, above which the sign is not static
+FAST_PATH_MAX_MOTION = float(os.getenv("FAST_PATH_MAX_MOTION", "1.0"))
+# Share of each sign's training sequences held out to fit the neighbour distance threshold
+FAST_PATH_HOLDOUT = float(os.getenv("FAST_PATH_HOLDOUT", "0.2"))
+# Quantile of the held-out captures' median nearest distance used as the threshold
+FAST_PATH_DISTANCE_QUANTILE = float(os.getenv("FAST_PATH_DISTANCE_QUANTILE", "0.95"))
+
+
+def sample_frames(frame_landmarks, num_frames=FAST_PATH_FRAMES):
+    """(num_frames, features) normalized frames and the wrist travel, or (None, None) without a hand"""
+    sequence, _ = impute_missing(frame_landmarks)
+    if sequence is None:
+        return None, None
+
+    sequence = resample_sequence(sequence, num_frames)
+    hands = sequence.reshape(num_frames, -1, 21, 3)
+    palm = np.linalg.norm(hands[:, :, 9] - hands[:, :, 0], axis=-1).max()
+    travel = np.linalg.norm(np.diff(hands[:, :, 0], axis=0), axis=-1).sum(axis=0).max()
+    motion = float(travel / palm) if palm > 0 else 0.0
+    return normalize_frames(sequence).reshape(num_frames, -1), motion
+
+
+class FrameIndex:
+    """Labelled normalized frames with batched k-nearest-neighbour voting
+
+    distance_threshold is the median nearest-neighbour distance above which a
+    capture is too unlike the training frames to trust the vote; None for
+    indexes built without held-out data.
+    """
+
+    def __init__(self, frames, labels, classes, distance_threshold=None):
+        self.frames = np.asarray(frames, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.classes = list(classes)
+        self.distance_threshold = distance_threshold
+        # Cached for the ||a||^2 - 2ab + ||b||^2 distance expansion
+        self.norms = (self.frames ** 2).sum(axis=1)
+        self.version = hashlib.sha1(self.frames.tobytes() + '\n'.join(self.classes).encode()).hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.frames)
+
+    @classmethod
+    def from_sampled(cls, sampled_by_sign):
+        """Index of {sign: [sampled frames of each sequence]}"""
+        frames, labels, classes = [], [], []
+        for sign, sequences in sampled_by_sign.items():
+            for sampled in sequences:
+                frames.append(sampled)
+                labels.extend([len(classes)] * len(sampled))
+            classes.append(sign)
+        width = frames[0].shape[1] if frames else 63
+        return cls(np.concatenate(frames) if frames else np.zeros((0, width)), labels, classes)
+
+    @classmethod
+    def build(cls, sequences_by_sign, holdout=FAST_PATH_HOLDOUT, seed=0):
+        """Index sampled frames of {sign: [landmark sequences]}
+
+        The distance threshold is fitted first: a share of every sign's
+        sequences is matched against an index of the rest, and the threshold
+        is a high quantile of their median nearest distances.
+        """
+        sampled_by_sign = {}
+        for sign, sequences in sequences_by_sign.items():
+            sampled_by_sign[sign] = [sampled for sampled, _ in map(sample_frames, sequences) if sampled is not None]
+
+        rng = np.random.default_rng(seed)
+        kept, held_out = {}, []
+        for sign, sequences in sampled_by_sign.items():
+            # Signs with a single sequence cannot spare one
+            count = max(1, round(len(sequences) * holdout)) if len(sequences) > 1 and holdout > 0 else 0
+            order = rng.permutation(len(sequences))
+            held_out.extend(sequences[i] for i in order[:count])
+            kept[sign] = [sequences[i] for i in order[count:]]
+
+        index = cls.from_sampled(sampled_by_sign)
+        if held_out:
+            fitting = cls.from_sampled(kept)
+            medians = [np.median(fitting.search(frames)[1]) for frames in held_out]
+            index.distance_threshold = float(np.quantile(medians, FAST_PATH_DISTANCE_QUANTILE))
+            logger.info(f"Fast path distance threshold {index.distance_threshold:.4f} from {len(held_out)} held-out sequences")
+        else:
+            logger.warning("Too few sequences to hold any out; the fast path will not check neighbour distances")
+        return index
+
+    def search(self, frames, k=FAST_PATH_K):
+        """(per-sign share of the k nearest training frames of every query frame, nearest distance per query frame)"""
+        if not len(self.frames):
+            return np.zeros(len(self.classes)), np.full(len(frames), np.inf)
+        distances = (frames ** 2).sum(axis=1)[:, None] - 2 * frames @ self.frames.T + self.norms[None, :]
+        k = min(k, len(self.frames))
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        votes = np.bincount(self.labels[nearest].ravel(), minlength=len(self.classes))
+        # The expansion can go slightly negative for identical frames
+        nearest_distances = np.sqrt(np.maximum(distances.min(axis=1), 0))
+        return votes / votes.sum(), nearest_distances
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        threshold = np.nan if self.distance_threshold is None else self.distance_threshold
+        np.savez(path, frames=self.frames, labels=self.labels, classes=np.array(self.classes, dtype=str),
+                 distance_threshold=threshold)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        # Indexes saved before the threshold existed have none
+        threshold = float(data['distance_threshold']) if 'distance_threshold' in data.files else np.nan
+        return cls(data['frames'], data['labels'], data['classes'].tolist(),
+                   None if np.isnan(threshold) else threshold)
+
+
+def build_fast_path(data_dir, signs=None, index_path=FAST_PATH_INDEX_PATH):
+    """Index the static signs of a training dataset; returns the FrameIndex"""
+    from landmark_store import iter_sequences
+
+    sequences_by_sign = {}
+    for sign in signs or STATIC_SIGNS:
+        sequences = list(iter_sequences(data_dir, sign))
+        if sequences:
+            sequences_by_sign[sign] = sequences
+        else:
+            logger.warning(f"No sequences for static sign '{sign}' in {data_dir}")
+
+    index = FrameIndex.build(sequences_by_sign)
+    index.save(index_path)
+    logger.info(f"Indexed {len(index)} frames of {len(index.classes)} static signs in {index_path}")
+    return index
+
+
+class FastPathRouter:
+    """Answers static signs from the frame index, escalating to the full model when unsure
+
+    Served like SignLanguageModel ("fast_path:FastPathRouter"); without an
+    index every request goes to the full model.
+    """
+
+    def __init__(self, index_path=FAST_PATH_INDEX_PATH, backbone=None):
+        if backbone is None:
+            from model import SignLanguageModel
+            backbone = SignLanguageModel()
+        self.backbone = backbone
+        self.index_path = index_path
+        self.num_hands = backbone.num_hands
+        self.model = backbone.model
+        self.model_path = backbone.model_path
+
+        self.index = None
+        if os.path.exists(index_path):
+            self.index = FrameIndex.load(index_path)
+            logger.info(f"Fast path loaded {len(self.index)} frames of {self.index.classes} from {index_path}")
+        else:
+            logger.warning(f"No fast path index at {index_path}; train.py builds it. Using the full model only.")
+
+    @property
+    def classes(self):
+        return self.backbone.classes
+
+    @property
+    def version(self):
+        return f"{self.backbone.version}-{self.index.version}" if self.index else self.backbone.version
+
+    def classify_fast(self, landmarks_sequence):
+        """(sign, vote share) from the frame index, or None when the full model should decide"""
+        if self.index is None:
+            return None
+        frames, motion = sample_frames(landmarks_sequence)
+        if frames is None or frames.shape[1] != self.index.frames.shape[1] or motion > FAST_PATH_MAX_MOTION:
+            return None
+
+        shares, distances = self.index.search(frames)
+        best = int(shares.argmax())
+        if shares[best] < FAST_PATH_MIN_CONFIDENCE:
+            return None
+        # Neighbours that agree but are far away: likely a sign the index does not know
+        threshold = self.index.distance_threshold
+        if threshold is not None and np.median(distances) > threshold:
+            logger.debug(f"Fast path neighbours too far ({np.median(distances):.4f} > {threshold:.4f})")
+            return None
+        return self.index.classes[best], float(shares[best])
+
+    def predict(self, landmarks_sequence):
+        sign, confidence, _ = self.predict_cached(landmarks_sequence, None)
+        return sign, confidence
+
+    def predict_cached(self, landmarks_sequence, cache):
+        """Predict sign, fast path first; returns (sign, confidence, cache_hit)"""
+        if not landmarks_sequence or all(landmarks is None for landmarks in landmarks_sequence):
+            logger.warning("No landmarks provided for prediction")
+            return "unknown", 0.0, False
+
+        try:
+            started = time.perf_counter()
+            fast = self.classify_fast(landmarks_sequence)
+            observe('sign_fast_path_seconds', time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"Error in fast path, using the full model: {e}")
+            logger.error(traceback.format_exc())
+            fast = None
+
+        if fast is not None:
+            inc('sign_fast_path_requests_total', route='fast')
+            logger.debug(f"Fast path answered {fast}")
+            return fast[0], fast[1], False
+
+        inc('sign_fast_path_requests_total', route='escalated')
+        return self.backbone.predict_cached(landmarks_sequence, cache)
@@ -0,0 +1,106 @@
+"""
+Preallocated shared-memory frame buffers for the inference workers.
+Frames are stored as RGB in reusable slots of one shared memory block and
+handed to the inference process by slot number, so they cross the process
+boundary without being pickled or copied. With PyTurboJPEG installed, JPEG
+frames are decoded straight into their slot (see frame_decoder.py);
+otherwise OpenCV decodes into a fresh BGR image that is color-converted
+into the slot.
+
+The pool only exists with INFERENCE_WORKERS > 0: in-process inference has
+no process boundary to cross and tracks the decoded images directly.
+Slots are FRAME_MAX_WIDTH x FRAME_MAX_HEIGHT (640x480 by default); larger
+frames are downscaled to fit, keeping their aspect ratio, without warning.
+"""
+from collections import namedtuple
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pool geometry; frames larger than the slot size are silently downscaled to fit
+FRAME_POOL_SLOTS = int(os.getenv("FRAME_POOL_SLOTS", "32"))
+FRAME_MAX_WIDTH = int(os.getenv("FRAME_MAX_WIDTH", "640"))
+FRAME_MAX_HEIGHT = int(os.getenv("FRAME_MAX_HEIGHT", "480"))
+
+# A frame living in a pool slot: what the inference worker receives instead of pixels
+FrameRef = namedtuple('FrameRef', ['slot', 'shape'])
+
+
+class FrameBufferPool:
+    """Fixed set of RGB frame slots backed by a single shared memory block"""
+
+    def __init__(self, num_slots=FRAME_POOL_SLOTS, max_height=FRAME_MAX_HEIGHT,
+                 max_width=FRAME_MAX_WIDTH, name=None):
+        self.num_slots = num_slots
+        self.max_height = max_height
+        self.max_width = max_width
+        self.slot_size = max_height * max_width * 3
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_slots * self.slot_size)
+        else:
+            # Spawned workers share the owner's resource tracker, so attaching
+            # does not schedule a second unlink
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.buffer = np.ndarray((num_slots, self.slot_size), dtype=np.uint8, buffer=self.shm.buf)
+
+        self._free = list(range(num_slots))
+        self._lock = threading.Lock()
+
+    @property
+    def spec(self):
+        """Arguments another process needs to attach to this pool"""
+        return (self.num_slots, self.max_height, self.max_width, self.shm.name)
+
+    @classmethod
+    def attach(cls, spec):
+        num_slots, max_height, max_width, name = spec
+        return cls(num_slots, max_height, max_width, name=name)
+
+    def acquire(self):
+        """Take a free slot, or None when the pool is exhausted"""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, slots):
+        with self._lock:
+            self._free.extend(slots)
+
+    def view(self, slot, shape):
+        """Contiguous image view over a slot, without copying"""
+        height, width, channels = shape
+        return self.buffer[slot, :height * width * channels].reshape(shape)
+
+    def fits(self, shape):
+        """Whether an image of this shape can be stored in a slot as is"""
+        return shape[0] <= self.max_height and shape[1] <= self.max_width
+
+    def write_rgb(self, slot, bgr_frame):
+        """Convert a decoded BGR frame into a slot as RGB; returns the stored shape"""
+        height, width = bgr_frame.shape[:2]
+
+        if height > self.max_height or width > self.max_width:
+            scale = min(self.max_height / height, self.max_width / width)
+            shape = (int(height * scale), int(width * scale), 3)
+            target = self.view(slot, shape)
+            cv2.resize(bgr_frame, (shape[1], shape[0]), dst=target, interpolation=cv2.INTER_AREA)
+            # Color conversion in place, the slot is both source and destination
+            cv2.cvtColor(target, cv2.COLOR_BGR2RGB, dst=target)
+            return shape
+
+        shape = (height, width, 3)
+        cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB, dst=self.view(slot, shape))
+        return shape
+
+    def close(self):
+        del self.buffer
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
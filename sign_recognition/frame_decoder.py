@@ -0,0 +1,181 @@
+"""
+Pluggable frame decoding for the sign recognition APIs.
+All frames of a request are decoded in parallel on a thread pool (OpenCV and
+libjpeg-turbo release the GIL while decoding), optionally at reduced size via
+DCT scaling, and with PyTurboJPEG as the backend when it is installed.
+With PyTurboJPEG, JPEG frames can also be decoded as RGB straight into a
+caller's buffer (decode_base64_into), e.g. a shared frame pool slot.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import binascii
+import cv2
+import numpy as np
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Optional libjpeg-turbo backend
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJPF_RGB
+except ImportError:
+    TurboJPEG = None
+
+DECODER_BACKEND = os.getenv("FRAME_DECODER", "auto")  # auto, opencv or turbojpeg
+DECODE_SCALE = int(os.getenv("FRAME_DECODE_SCALE", "1"))  # 1, 2, 4 or 8 (downscale factor)
+DECODE_THREADS = int(os.getenv("FRAME_DECODE_THREADS", str(min(8, os.cpu_count() or 1))))
+
+# imdecode flags that let libjpeg scale during the IDCT instead of after decoding
+REDUCED_COLOR_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+JPEG_MAGIC = b'\xff\xd8'
+
+
+def decode_base64_payload(base64_string):
+    """Strip an optional data URL prefix and return the raw encoded bytes
+
+    Accepts str or ASCII bytes, so streamed request bodies can be decoded
+    without converting each frame to a Python string first.
+    """
+    if isinstance(base64_string, str):
+        if base64_string.startswith("data:"):
+            base64_string = base64_string[base64_string.index(',') + 1:]
+    elif base64_string.startswith(b"data:"):
+        base64_string = memoryview(base64_string)[base64_string.index(b',') + 1:]
+    return binascii.a2b_base64(base64_string)
+
+
+class OpenCVDecoder:
+    name = 'opencv'
+
+    def decode(self, data, scale=1):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_COLOR_FLAGS[scale])
+
+
+class TurboJPEGDecoder:
+    name = 'turbojpeg'
+
+    def __init__(self):
+        self.jpeg = TurboJPEG()
+        self.fallback = OpenCVDecoder()
+
+    def decode(self, data, scale=1):
+        # PNG/WebP frames from some browsers still go through OpenCV
+        if not data.startswith(JPEG_MAGIC):
+            return self.fallback.decode(data, scale)
+        scaling_factor = (1, scale) if scale > 1 else None
+        return self.jpeg.decode(data, pixel_format=TJPF_BGR, scaling_factor=scaling_factor)
+
+    def decode_into(self, data, allocate, scale=1):
+        """Decode a JPEG as RGB into the array allocate(shape) returns; None when not possible
+
+        Not possible means: not a JPEG, or allocate() returned None (e.g. the
+        frame does not fit). The caller then decodes the frame as usual.
+        """
+        if not data.startswith(JPEG_MAGIC):
+            return None
+        width, height, _, _ = self.jpeg.decode_header(data)
+        # libjpeg-turbo rounds scaled dimensions up
+        shape = (-(-height // scale), -(-width // scale), 3)
+        target = allocate(shape)
+        if target is None:
+            return None
+        scaling_factor = (1, scale) if scale > 1 else None
+        self.jpeg.decode(data, pixel_format=TJPF_RGB, scaling_factor=scaling_factor, dst=target)
+        return target
+
+
+def create_backend(backend=DECODER_BACKEND):
+    if backend in ('auto', 'turbojpeg') and TurboJPEG is not None:
+        try:
+            return TurboJPEGDecoder()
+        except Exception as e:
+            # The Python package is present but libturbojpeg could not be loaded
+            logger.warning(f"TurboJPEG unavailable, falling back to OpenCV: {e}")
+    elif backend == 'turbojpeg':
+        logger.warning("FRAME_DECODER=turbojpeg but PyTurboJPEG is not installed, using OpenCV")
+    return OpenCVDecoder()
+
+
+class FrameDecoder:
+    """Decodes batches of base64 frames in parallel"""
+
+    def __init__(self, backend=DECODER_BACKEND, scale=DECODE_SCALE, threads=DECODE_THREADS):
+        if scale not in REDUCED_COLOR_FLAGS:
+            raise ValueError(f"Unsupported decode scale {scale}, expected one of {sorted(REDUCED_COLOR_FLAGS)}")
+
+        self.backend = create_backend(backend)
+        self.scale = scale
+        self.threads = threads
+        self._executor = None
+        self._executor_pid = None
+        logger.info(f"Frame decoder: {self.backend.name}, scale 1/{scale}, {threads} threads")
+
+    @property
+    def executor(self):
+        # Thread pools do not survive a fork, so each process builds its own
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="frame-decode")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def decode_base64(self, base64_string, scale=None):
+        """Decode one base64 frame to a BGR image, or None if it is unreadable"""
+        try:
+            return self.backend.decode(decode_base64_payload(base64_string), scale or self.scale)
+        except Exception as e:
+            logger.error(f"Error converting base64 to image: {e}")
+            return None
+
+    def decode_base64_into(self, base64_string, allocate, scale=None):
+        """Decode one base64 frame as RGB into allocate(shape)'s array (see TurboJPEGDecoder.decode_into)
+
+        Returns the filled array, or None when the backend cannot decode into
+        a caller's buffer or the frame could not be decoded this way.
+        """
+        if getattr(self.backend, 'decode_into', None) is None:
+            return None
+        try:
+            return self.backend.decode_into(decode_base64_payload(base64_string), allocate, scale or self.scale)
+        except TypeError as e:
+            # PyTurboJPEG releases without decode(dst=...)
+            logger.warning(f"Decoding into buffers is not supported by this PyTurboJPEG: {e}")
+            self.backend.decode_into = None
+        except Exception as e:
+            logger.error(f"Error decoding image into buffer: {e}")
+        return None
+
+    def decode_bytes(self, data, scale=None):
+        """Decode one encoded (JPEG, PNG, ...) frame to a BGR image, or None if it is unreadable"""
+        try:
+            return self.backend.decode(data, scale or self.scale)
+        except Exception as e:
+            logger.error(f"Error decoding image: {e}")
+            return None
+    
+    def decode_many(self, base64_frames, scale=None):
+        """Decode all frames of a request in parallel, preserving order"""
+        if len(base64_frames) <= 1 or self.threads <= 1:
+            return [self.decode_base64(frame, scale) for frame in base64_frames]
+        return list(self.executor.map(lambda frame: self.decode_base64(frame, scale), base64_frames))
+
+
+# Process-wide decoder shared by the API modules
+_decoder = None
+
+
+def get_decoder():
+    global _decoder
+    if _decoder is None:
+        _decoder = FrameDecoder()
+    return _decoder
+
+
+def decode_frames(base64_frames, scale=None):
+    """Decode a request's base64 frames with the shared decoder"""
+    return get_decoder().decode_many(base64_frames, scale)
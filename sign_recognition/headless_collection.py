@@ -0,0 +1,276 @@
+"""
+Headless data collection from recorded videos and image directories.
+Used by collect_data.py and collect_gesture_data.py when they are given
+--input, so contributors' recorded sessions can be ingested on a server
+without a display or webcam. Frame decoding, hand tracking and disk writes
+run as pipelined threads: each recording has a reader thread feeding a
+bounded queue, several recordings are tracked at once, and a single writer
+thread saves the finished sequences.
+
+Inputs are laid out like the dataset itself:
+    recordings/<sign>/<take>.webm
+    recordings/<sign>/<take>/frame_0001.jpg ...
+or a single video / image directory together with --sign.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from landmark_store import LandmarkDataset
+
+VIDEO_EXTENSIONS = ('.webm', '.mp4', '.mov', '.avi', '.mkv')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Frames buffered per recording between its reader thread and the tracker
+READ_AHEAD = 64
+
+
+def add_headless_arguments(parser):
+    parser.add_argument('--input', nargs='+', metavar='PATH',
+                        help="Recorded videos or image directories to ingest instead of using the webcam")
+    parser.add_argument('--sign', help="Sign of every input (default: name of the directory holding it)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Recordings tracked in parallel")
+    parser.add_argument('--max-width', type=int, default=640, help="Downscale wider frames before tracking")
+    parser.add_argument('--min-hand-ratio', type=float, default=0.7,
+                        help="Reject recordings with a hand in fewer than this fraction of frames")
+    parser.add_argument('--dataset', help="Append to this landmark dataset (see landmark_store.py) "
+                                          "instead of writing seq_N.npy files")
+
+
+def parse_collection_args(description):
+    parser = argparse.ArgumentParser(description=description)
+    add_headless_arguments(parser)
+    return parser.parse_args()
+
+
+def is_video(path):
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def find_sources(path, sign=None):
+    """(path, sign) for every recording under path"""
+    if os.path.isfile(path):
+        return [(path, sign or os.path.basename(os.path.dirname(os.path.abspath(path))))] if is_video(path) else []
+
+    entries = sorted(os.listdir(path))
+    if any(is_image(entry) for entry in entries):
+        # A directory of frames is one recording
+        return [(path, sign or os.path.basename(os.path.dirname(os.path.abspath(path))))]
+
+    sources = []
+    for entry in entries:
+        child = os.path.join(path, entry)
+        sources.extend(find_sources(child, sign or (entry if os.path.isdir(child) else None)))
+    return sources
+
+
+def iter_frames(path):
+    """BGR frames of a video file or of the images in a directory, in order"""
+    if os.path.isdir(path):
+        for name in sorted(f for f in os.listdir(path) if is_image(f)):
+            frame = cv2.imread(os.path.join(path, name))
+            if frame is not None:
+                yield frame
+        return
+
+    cap = cv2.VideoCapture(path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def recording_fps(path):
+    """Capture rate of a video file, None when unknown (image directories)"""
+    if os.path.isdir(path):
+        return None
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+    finally:
+        cap.release()
+    return float(fps) if fps and fps > 0 else None
+
+
+class ReaderError:
+    """Carries an exception from a read_ahead() reader thread to its consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_ahead(frames, maxsize=READ_AHEAD):
+    """Decode frames on a background thread, handing them over through a bounded queue
+
+    An exception raised while reading is re-raised in the consumer. When the
+    consumer stops early (or fails), the reader stops too instead of
+    blocking on the full queue forever.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def hand_over(item):
+        # Put with a timeout, so a consumer that went away cannot strand the reader
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for frame in frames:
+                if not hand_over(frame):
+                    return
+        except Exception as e:
+            hand_over(ReaderError(e))
+            return
+        hand_over(done)
+
+    threading.Thread(target=reader, daemon=True).start()
+    try:
+        while True:
+            frame = buffer.get()
+            if frame is done:
+                return
+            if isinstance(frame, ReaderError):
+                raise frame.error
+            yield frame
+    finally:
+        stop.set()
+
+
+def track_frames(frames, num_hands=1, max_width=640):
+    """Track one recording with fresh MediaPipe graphs
+
+    Returns a (frames, 21 * num_hands, 3) array with NaN rows for frames
+    without a hand, and the number of frames with a hand.
+    """
+    from vision import TwoHandTracker, create_hands, hand_to_list, process_frame, two_hand_landmarks
+
+    # Fresh graphs per recording, so tracking never carries over from the previous one
+    tracker = TwoHandTracker() if num_hands == 2 else create_hands()
+    missing = np.full((21 * num_hands, 3), np.nan, dtype=np.float32)
+
+    sequence = []
+    with_hands = 0
+    try:
+        for frame in frames:
+            height, width = frame.shape[:2]
+            if width > max_width:
+                frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+            results = process_frame(frame, False, tracker.process)
+            if num_hands == 2:
+                landmarks = two_hand_landmarks(results)
+            elif results.multi_hand_landmarks:
+                landmarks = hand_to_list(results.multi_hand_landmarks[0])
+            else:
+                landmarks = None
+
+            if landmarks is None:
+                sequence.append(missing)
+            else:
+                sequence.append(np.asarray(landmarks, dtype=np.float32))
+                with_hands += 1
+    finally:
+        tracker.close()
+
+    if not sequence:
+        return np.zeros((0, 21 * num_hands, 3), dtype=np.float32), 0
+    return np.stack(sequence), with_hands
+
+
+def next_sequence_path(sign_dir, taken=()):
+    """First seq_N.npy that neither exists on disk nor is already taken"""
+    index = 0
+    while True:
+        path = os.path.join(sign_dir, f"seq_{index}.npy")
+        if path not in taken and not os.path.exists(path):
+            return path
+        index += 1
+
+
+def run_headless(args, data_dir, signs, num_hands=1):
+    """Ingest args.input into data_dir/<sign>/seq_N.npy or args.dataset; returns the number of saved sequences"""
+    sources = []
+    for path in args.input:
+        sources.extend(find_sources(path, args.sign))
+
+    unknown = sorted({sign for _, sign in sources if sign not in signs})
+    if unknown:
+        print(f"Warning: signs not in this collection's list will not be trained on: {', '.join(unknown)}")
+    print(f"Ingesting {len(sources)} recordings with {args.workers} workers")
+
+    written = queue.Queue()
+    stats = {'saved': 0, 'rejected': 0, 'frames': 0}
+    dataset = LandmarkDataset(args.dataset, create=True, frame_shape=(21 * num_hands, 3)) if args.dataset else None
+    started = time.perf_counter()
+
+    def writer():
+        # The only thread touching the dataset, so sequence numbers never collide
+        while True:
+            item = written.get()
+            if item is None:
+                return
+            path, sign, sequence, with_hands, fps = item
+            stats['frames'] += len(sequence)
+
+            if len(sequence) == 0 or with_hands < len(sequence) * args.min_hand_ratio:
+                stats['rejected'] += 1
+                print(f"Rejected {path}: hands in {with_hands}/{len(sequence)} frames")
+                continue
+
+            if dataset is not None:
+                dataset.append(sequence, sign, source=path, fps=fps)
+                filename = f"{args.dataset} [{sign}]"
+            else:
+                sign_dir = os.path.join(data_dir, sign)
+                os.makedirs(sign_dir, exist_ok=True)
+                filename = next_sequence_path(sign_dir)
+                np.save(filename, sequence)
+            stats['saved'] += 1
+
+            elapsed = time.perf_counter() - started
+            print(f"Saved {filename} from {path} ({with_hands}/{len(sequence)} frames with hands) - "
+                  f"{stats['frames'] / elapsed:.0f} frames/s")
+
+    def track(source):
+        path, sign = source
+        try:
+            sequence, with_hands = track_frames(read_ahead(iter_frames(path)), num_hands, args.max_width)
+            written.put((path, sign, sequence, with_hands, recording_fps(path)))
+        except Exception as e:
+            print(f"Error processing {path}: {e}")
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="collect") as executor:
+            list(executor.map(track, sources))
+    finally:
+        written.put(None)
+        writer_thread.join()
+        if dataset is not None:
+            dataset.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\nSaved {stats['saved']} sequences, rejected {stats['rejected']}, "
+          f"{stats['frames']} frames in {elapsed:.1f}s ({stats['frames'] / max(elapsed, 1e-9):.0f} frames/s)")
+    return stats['saved']
@@ -0,0 +1,161 @@
+"""
+Incremental training: refresh a trained model with newly collected sequences.
+A training manifest saved next to the model (<model>.manifest.json) records
+the classes it was trained on, in output order, and a digest of every
+sequence it has seen (see landmark_store.iter_keyed_sequences). An
+incremental run fine-tunes the current model for a few epochs on only the
+new or changed sequences, mixed with a class-balanced replay sample of the
+sequences it already knows so earlier signs are not forgotten. Signs new to
+the model get an output unit each by growing the final Dense layer; the
+learned weights of the existing classes are kept.
+"""
+import json
+import os
+import time
+import numpy as np
+from tensorflow.keras.layers import BatchNormalization, Dense
+from tensorflow.keras.models import Model
+from tensorflow.keras.optimizers import Adam
+from landmark_store import iter_keyed_sequences
+
+# Old sequences per class mixed into every fine-tuning run
+REPLAY_PER_CLASS = int(os.getenv("REPLAY_PER_CLASS", "32"))
+FINE_TUNE_EPOCHS = int(os.getenv("FINE_TUNE_EPOCHS", "5"))
+# Well below the full-training rate, so a few sequences cannot pull the model far
+FINE_TUNE_LEARNING_RATE = float(os.getenv("FINE_TUNE_LEARNING_RATE", "0.0002"))
+
+
+def manifest_path(model_path):
+    return os.path.splitext(model_path)[0] + '.manifest.json'
+
+
+def load_training_manifest(model_path):
+    """{'classes': [...], 'sequences': {key: digest}} of a trained model, None if it has none"""
+    path = manifest_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_training_manifest(model_path, classes, sequences):
+    path = manifest_path(model_path)
+    # Write then rename, so an interrupted run never leaves a truncated manifest
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'classes': list(classes), 'sequences': sequences}, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def scan_sequences(data_dir, classes, seen):
+    """Split a dataset into sequences the model has not been trained on and ones it has
+
+    Returns (new, old, digests): new and old are lists of (class_idx,
+    sequence), digests maps the key of every sequence found to its digest.
+    """
+    new, old, digests = [], [], {}
+    for class_idx, class_name in enumerate(classes):
+        for key, digest, sequence in iter_keyed_sequences(data_dir, class_name):
+            digests[key] = digest
+            (old if seen.get(key) == digest else new).append((class_idx, sequence))
+    return new, old, digests
+
+
+def replay_sample(old, num_classes, per_class, rng=None):
+    """Up to per_class randomly chosen old sequences of every class"""
+    rng = rng or np.random.default_rng()
+    by_class = [[] for _ in range(num_classes)]
+    for class_idx, sequence in old:
+        by_class[class_idx].append(sequence)
+
+    sample = []
+    for class_idx, sequences in enumerate(by_class):
+        for i in rng.permutation(len(sequences))[:per_class]:
+            sample.append((class_idx, sequences[i]))
+    return sample
+
+
+def grow_output_layer(keras_model, num_classes):
+    """Model with the same layers but num_classes output units
+
+    Existing units keep their weights; new ones start from the usual
+    initializer. Returns keras_model itself when it is already wide enough.
+    """
+    output = keras_model.layers[-1]
+    kernel, bias = output.get_weights()
+    known = kernel.shape[1]
+    if num_classes <= known:
+        return keras_model
+
+    grown_output = Dense(num_classes, activation='softmax')
+    # Functional rebuild on the penultimate layer, so residual (non-Sequential) models grow too
+    grown = Model(inputs=keras_model.inputs, outputs=grown_output(keras_model.layers[-2].output))
+    grown_kernel, grown_bias = grown_output.get_weights()
+    grown_kernel[:, :known] = kernel
+    grown_bias[:known] = bias
+    grown_output.set_weights([grown_kernel, grown_bias])
+    return grown
+
+
+def fine_tune(keras_model, X, y, epochs=None, batch_size=16, learning_rate=None):
+    """Train an already trained model for a few epochs on integer labels y"""
+    # Batch statistics of a handful of sequences would undo the normalization
+    # learned on the full dataset, so BatchNormalization runs in inference mode
+    frozen = [layer for layer in keras_model.layers if isinstance(layer, BatchNormalization) and layer.trainable]
+    for layer in frozen:
+        layer.trainable = False
+    try:
+        keras_model.compile(
+            optimizer=Adam(learning_rate=learning_rate or FINE_TUNE_LEARNING_RATE),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        return keras_model.fit(X, y, epochs=epochs or FINE_TUNE_EPOCHS, batch_size=batch_size, shuffle=True)
+    finally:
+        for layer in frozen:
+            layer.trainable = True
+
+
+def incremental_update(keras_model, model_path, classes, data_dir, training_samples,
+                       epochs=None, batch_size=16, replay_per_class=None):
+    """Fine-tune a trained model on the sequences of data_dir it has not seen yet, and save it
+
+    training_samples(sequence) returns the preprocessed sample(s) for one
+    raw sequence, augmented copies included. Classes not in the model's
+    manifest are added as new outputs, after the existing ones. Returns
+    (model, classes in output order, history), history being None when
+    there was nothing new to train on.
+    """
+    manifest = load_training_manifest(model_path)
+    if manifest is None:
+        raise FileNotFoundError(f"No training manifest for {model_path}; run a full training first")
+    known = manifest['classes']
+    if keras_model.output_shape[-1] != len(known):
+        raise ValueError(f"{model_path} has {keras_model.output_shape[-1]} outputs but its manifest "
+                         f"lists {len(known)} classes")
+
+    # Known classes keep their output index; new signs are appended after them
+    classes = known + [name for name in classes if name not in known]
+    started = time.perf_counter()
+    new, old, digests = scan_sequences(data_dir, classes, manifest['sequences'])
+    print(f"Found {len(new)} new or changed sequences and {len(old)} already trained on")
+    if not new:
+        return keras_model, classes, None
+
+    replay = replay_sample(old, len(classes), REPLAY_PER_CLASS if replay_per_class is None else replay_per_class)
+    X, y = [], []
+    for class_idx, sequence in new + replay:
+        for sample in training_samples(sequence):
+            X.append(sample)
+            y.append(class_idx)
+
+    if len(classes) > len(known):
+        print(f"Adding output classes: {', '.join(classes[len(known):])}")
+    keras_model = grow_output_layer(keras_model, len(classes))
+
+    print(f"Fine-tuning on {len(new)} new and {len(replay)} replayed sequences ({len(X)} samples)")
+    history = fine_tune(keras_model, np.array(X), np.array(y), epochs, batch_size)
+
+    keras_model.save(model_path)
+    save_training_manifest(model_path, classes, digests)
+    print(f"Incremental update finished in {time.perf_counter() - started:.1f}s")
+    return keras_model, classes, history
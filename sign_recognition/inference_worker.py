@@ -0,0 +1,271 @@
+"""
+Dedicated inference processes for the sign recognition APIs.
+HTTP workers decode frames and hand them to a pool of worker processes over
+IPC queues (by slot number when a shared FrameBufferPool is configured); each
+worker owns its own model and MediaPipe Hands instance and results come back
+asynchronously. A worker that hangs past the timeout is
+killed and replaced, so a stuck inference cannot freeze the API.
+"""
+import asyncio
+import importlib
+import itertools
+import multiprocessing as mp_proc
+import os
+import queue
+import threading
+import time
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# Seconds a single job may take before its worker is considered stuck
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "20"))
+# Seconds a request may wait for a (re)starting worker to finish loading its model
+INFERENCE_STARTUP_TIMEOUT = float(os.getenv("INFERENCE_STARTUP_TIMEOUT", "120"))
+
+
+class InferenceTimeout(Exception):
+    """Raised when a worker does not answer within the timeout"""
+
+
+class InferenceWorkerError(Exception):
+    """Raised when a worker fails or dies while handling a job"""
+
+
+def worker_main(index, predictor_path, frame_pool_spec, job_queue, result_queue):
+    """Entry point of an inference process: build the model, then serve jobs"""
+    # Imported here so the HTTP process never pays for TensorFlow or MediaPipe graphs
+    import cv2
+    from vision import landmark_extractor
+    from frame_buffers import FrameBufferPool, FrameRef
+    from keyframes import extract_keyframe_landmarks
+    from prediction_cache import create_prediction_cache
+    from quality import capture_problem
+    from tiers import TIERS, variant_predictors
+
+    frame_pool = FrameBufferPool.attach(frame_pool_spec) if frame_pool_spec else None
+
+    module_name, _, attr = predictor_path.partition(':')
+    predictor = getattr(importlib.import_module(module_name), attr)()
+    # Model per quality tier, e.g. the distilled student for 'fast'
+    predictors = variant_predictors(predictor)
+    # In-process per worker unless REDIS_URL makes it shared
+    prediction_cache = create_prediction_cache()
+    # One- or two-hand landmarks, whichever the predictor's model was built for
+    num_hands = getattr(predictor, 'num_hands', 1)
+    result_queue.put(('ready', index, os.getpid()))
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        job_id, frames, tier_name = job
+        try:
+            tier = TIERS[tier_name]
+            extract_landmarks = landmark_extractor(num_hands, tier.model_complexity)
+            images = []
+            for frame in frames:
+                if isinstance(frame, FrameRef):
+                    # Already RGB in shared memory, read it in place
+                    images.append(frame_pool.view(frame.slot, frame.shape))
+                else:
+                    images.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+            frame_landmarks, keyframe_count = extract_keyframe_landmarks(
+                images, lambda image: extract_landmarks(image, is_rgb=True),
+                tier.keyframe_threshold, tier.keyframe_max_gap
+            )
+            frames_with_hands = sum(landmarks is not None for landmarks in frame_landmarks)
+
+            # Hopeless captures are answered without running the model
+            rejected = capture_problem(frame_landmarks) if frames_with_hands else None
+            if rejected:
+                predicted_sign, confidence, cache_hit = "uncertain", 0.0, False
+            elif frames_with_hands:
+                # Frames without a hand stay in place and are imputed by the predictor
+                predicted_sign, confidence, cache_hit = predictors[tier.model_variant].predict_cached(
+                    frame_landmarks, prediction_cache
+                )
+            else:
+                predicted_sign, confidence, cache_hit = "unknown", 0.0, False
+
+            result_queue.put((job_id, 'ok', {
+                'predicted_sign': predicted_sign,
+                'confidence': confidence,
+                'frames_with_hands': frames_with_hands,
+                'keyframes': keyframe_count,
+                'cache_hit': cache_hit,
+                'rejected': rejected
+            }))
+        except Exception as e:
+            result_queue.put((job_id, 'error', f"{e}\n{traceback.format_exc()}"))
+
+
+class InferencePool:
+    """Pool of inference processes fed through per-worker job queues"""
+
+    def __init__(self, predictor_path, num_workers=1, timeout=INFERENCE_TIMEOUT, frame_pool=None):
+        # "module:Class" of a predictor exposing
+        # predict_cached(landmarks, cache) -> (sign, confidence, cache_hit)
+        self.predictor_path = predictor_path
+        self.frame_pool = frame_pool
+        self.num_workers = num_workers
+        self.timeout = timeout
+
+        # Spawn rather than fork: TensorFlow and MediaPipe are not fork-safe
+        self._ctx = mp_proc.get_context('spawn')
+        self._result_queue = self._ctx.Queue()
+        self._workers = [None] * num_workers
+        self._job_queues = [None] * num_workers
+        self._ready = [threading.Event() for _ in range(num_workers)]
+        self._pending = {}  # job_id -> (future, loop, worker index)
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._collector = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        for index in range(self.num_workers):
+            self._start_worker(index)
+        self._collector = threading.Thread(target=self._collect_results, name="inference-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"Started inference pool with {self.num_workers} workers")
+
+    def stop(self):
+        self._running = False
+        for job_queue in self._job_queues:
+            if job_queue is not None:
+                job_queue.put(None)
+        for process in self._workers:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+
+    def _start_worker(self, index):
+        job_queue = self._ctx.Queue()
+        self._ready[index] = threading.Event()
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(index, self.predictor_path, self.frame_pool.spec if self.frame_pool else None, job_queue, self._result_queue),
+            name=f"inference-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self._workers[index] = process
+        self._job_queues[index] = job_queue
+
+    def _restart_worker(self, index, process, reason):
+        """Kill a worker, fail its in-flight jobs and start a replacement"""
+        with self._restart_lock:
+            # Another thread may already have replaced this worker
+            if self._workers[index] is not process:
+                return
+
+            logger.warning(f"Restarting inference worker {index} (pid {process.pid}): {reason}")
+            if process.is_alive():
+                process.kill()
+            process.join(timeout=5)
+
+            with self._lock:
+                failed = [job_id for job_id, (_, _, worker) in self._pending.items() if worker == index]
+                for job_id in failed:
+                    self._resolve(job_id, InferenceWorkerError(reason))
+
+            if self._running:
+                self._start_worker(index)
+
+    def _resolve(self, job_id, outcome):
+        """Complete a pending future from any thread; caller holds the lock"""
+        entry = self._pending.pop(job_id, None)
+        if entry is None:
+            return
+
+        future, loop, _ = entry
+
+        def settle():
+            if future.done():
+                return
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+        loop.call_soon_threadsafe(settle)
+
+    def _replace_dead_workers(self):
+        """Replace any worker that died (e.g. segfault in a native library)"""
+        for index, process in enumerate(self._workers):
+            if self._running and process is not None and not process.is_alive():
+                self._restart_worker(index, process, f"exited with code {process.exitcode}")
+
+    def _collect_results(self):
+        while self._running:
+            # Checked on every iteration: under steady load the queue never times out
+            self._replace_dead_workers()
+            try:
+                job_id, status, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if job_id == 'ready':
+                index, pid = status, payload
+                # Ignore late announcements from a worker that was already replaced
+                if self._workers[index] is not None and self._workers[index].pid == pid:
+                    self._ready[index].set()
+                    logger.info(f"Inference worker {index} (pid {pid}) ready")
+                continue
+
+            with self._lock:
+                if status == 'ok':
+                    self._resolve(job_id, payload)
+                else:
+                    logger.error(f"Inference job {job_id} failed: {payload}")
+                    self._resolve(job_id, InferenceWorkerError(payload.splitlines()[0]))
+
+    def _pick_worker(self):
+        """Choose the worker with the fewest jobs in flight, preferring ready ones"""
+        load = [0] * self.num_workers
+        for _, _, index in self._pending.values():
+            load[index] += 1
+        return min(range(self.num_workers), key=lambda i: (not self._ready[i].is_set(), load[i]))
+
+    async def submit(self, frames, tier='balanced'):
+        """Run hand tracking and prediction for decoded frames in a worker process
+
+        Frames are BGR arrays or FrameRefs into the pool's shared frame buffers;
+        tier names the quality tier (see tiers.py) the worker tracks and predicts at.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            index = self._pick_worker()
+            ready = self._ready[index]
+
+        # Model loading is not part of the job budget, so wait for readiness first
+        if not ready.is_set():
+            if not await asyncio.to_thread(ready.wait, INFERENCE_STARTUP_TIMEOUT):
+                raise InferenceWorkerError(f"Inference worker {index} did not start")
+
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._pending[job_id] = (future, loop, index)
+            job_queue = self._job_queues[index]
+            process = self._workers[index]
+
+        started = time.perf_counter()
+        job_queue.put((job_id, frames, tier))
+
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            elapsed = time.perf_counter() - started
+            await asyncio.to_thread(self._restart_worker, index, process, f"job {job_id} timed out after {elapsed:.1f}s")
+            raise InferenceTimeout(f"Inference timed out after {elapsed:.1f}s")
@@ -0,0 +1,109 @@
+"""
+Motion-aware keyframe selection for the sign recognition APIs.
+Frames are scored on tiny grayscale thumbnails; MediaPipe only runs on frames
+that differ enough from the previous keyframe, and landmarks for the frames
+in between are interpolated before preprocessing. For static signs most of
+a 30-frame capture is skipped.
+"""
+import cv2
+import numpy as np
+import os
+import metrics
+
+# Mean absolute grayscale difference (0-255) that starts a new keyframe; 0 disables skipping
+KEYFRAME_THRESHOLD = float(os.getenv("KEYFRAME_THRESHOLD", "4.0"))
+# Force a keyframe at least this often so slow drifts are still tracked
+KEYFRAME_MAX_GAP = int(os.getenv("KEYFRAME_MAX_GAP", "6"))
+# Thumbnail size (width, height) used for motion scoring
+THUMBNAIL_SIZE = (32, 24)
+
+
+def thumbnail(frame):
+    """Downscaled grayscale copy of a frame for cheap motion scoring"""
+    small = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+
+class KeyframeSelector:
+    """Online keyframe decision for frames arriving one at a time"""
+
+    def __init__(self, threshold=None, max_gap=None):
+        self.threshold = KEYFRAME_THRESHOLD if threshold is None else threshold
+        self.max_gap = KEYFRAME_MAX_GAP if max_gap is None else max_gap
+        self.index = -1
+        self.last_keyframe = None
+        self._last_thumb = None
+
+    def push(self, frame):
+        """Whether the next frame is a keyframe"""
+        self.index += 1
+        if self.threshold <= 0:
+            return True
+
+        thumb = thumbnail(frame)
+        is_keyframe = (
+            self.last_keyframe is None
+            or self.index - self.last_keyframe >= self.max_gap
+            or np.mean(np.abs(thumb - self._last_thumb)) > self.threshold
+        )
+        if is_keyframe:
+            self.last_keyframe = self.index
+            self._last_thumb = thumb
+        return is_keyframe
+
+
+def select_keyframes(frames, threshold=None, max_gap=None):
+    """Indices of the frames that need hand tracking; always includes first and last"""
+    selector = KeyframeSelector(threshold, max_gap)
+    keyframes = [i for i, frame in enumerate(frames) if selector.push(frame)]
+
+    if frames and keyframes[-1] != len(frames) - 1:
+        keyframes.append(len(frames) - 1)
+
+    return keyframes
+
+
+def interpolate_landmarks(keyframes, keyframe_landmarks, num_frames):
+    """Fill the frames between keyframes with interpolated landmarks
+
+    Between two keyframes with a hand the landmarks are linearly interpolated;
+    if only one of them has a hand, the nearer keyframe's result is reused.
+    """
+    result = [None] * num_frames
+    for index, landmarks in zip(keyframes, keyframe_landmarks):
+        result[index] = landmarks
+
+    for start, end in zip(keyframes, keyframes[1:]):
+        start_landmarks, end_landmarks = result[start], result[end]
+        if end - start < 2:
+            continue
+
+        if start_landmarks is not None and end_landmarks is not None:
+            start_array = np.asarray(start_landmarks)
+            end_array = np.asarray(end_landmarks)
+            for i in range(start + 1, end):
+                t = (i - start) / (end - start)
+                result[i] = ((1 - t) * start_array + t * end_array).tolist()
+        else:
+            for i in range(start + 1, end):
+                result[i] = start_landmarks if i - start <= end - i else end_landmarks
+
+    return result
+
+
+def extract_keyframe_landmarks(frames, extract_fn, threshold=None, max_gap=None):
+    """Run extract_fn on keyframes only; returns (per-frame landmarks, keyframe count)"""
+    keyframes = select_keyframes(frames, threshold, max_gap)
+    keyframe_landmarks = [extract_fn(frames[i]) for i in keyframes]
+    return interpolate_landmarks(keyframes, keyframe_landmarks, len(frames)), len(keyframes)
+
+
+def record_keyframe_metrics(endpoint, frame_count, keyframe_count, tier):
+    """Frames and MediaPipe calls of a request served at a quality tier (see tiers.py)"""
+    # Tiers may override the threshold; report the one the request actually used
+    threshold = KEYFRAME_THRESHOLD if tier.keyframe_threshold is None else tier.keyframe_threshold
+    metrics.set_gauge("sign_keyframe_threshold", threshold, endpoint=endpoint, tier=tier.name)
+    metrics.inc("sign_frames_total", frame_count, endpoint=endpoint, tier=tier.name)
+    metrics.inc("sign_mediapipe_calls_total", keyframe_count, endpoint=endpoint, tier=tier.name)
+    if frame_count:
+        metrics.observe("sign_keyframe_ratio", keyframe_count / frame_count, endpoint=endpoint, tier=tier.name)
@@ -0,0 +1,74 @@
+"""
+Landmark classification shared by the translate and numbers/letters APIs.
+Both run the same steps on a capture's per-frame landmarks: reject captures
+without a hand or too poor to classify (see quality.py), answer repeat
+captures from the prediction cache, run the Keras model, apply the
+confidence temperature (see calibration.py) and report answers below
+CONFIDENCE_THRESHOLD as "uncertain". Keeping them here means the two APIs
+only differ in how they present the result.
+"""
+from collections import namedtuple
+import numpy as np
+import logging
+from calibration import CONFIDENCE_THRESHOLD, apply_temperature
+from metrics import inc
+from quality import capture_problem
+
+logger = logging.getLogger(__name__)
+
+# Outcome of classify_landmarks(); `rejection` is the message for captures that never reached the model
+Classification = namedtuple('Classification', [
+    'sign',  # Label, "uncertain" below the threshold or for poor captures, "unknown" without a hand
+    'confidence',  # Calibrated probability of the answer
+    'probabilities',  # Calibrated per-class outputs, None when the model did not run
+    'frames_with_hands',
+    'cache_hit',
+    'rejection',
+])
+
+
+def classify_landmarks(frame_landmarks, keras_model, labels, preprocess, model_version,
+                       temperature=1.0, cache=None):
+    """Classify per-frame landmarks (None where no hand was found) with a Keras model
+
+    preprocess(frame_landmarks) returns the model input for one capture;
+    cache is a PredictionCache (or None) keyed by model_version.
+    """
+    frames_with_hands = sum(landmarks is not None for landmarks in frame_landmarks)
+    if frames_with_hands == 0:
+        return Classification("unknown", 0.0, None, 0, False, "No hand landmarks detected in any frame")
+
+    # Hopeless captures are answered without running the model
+    rejected = capture_problem(frame_landmarks)
+    if rejected:
+        reason, message = rejected
+        inc('sign_capture_rejected_total', reason=reason)
+        return Classification("uncertain", 0.0, None, frames_with_hands, False, message)
+
+    # Frames without a hand are imputed rather than dropped
+    processed_sequence = preprocess(frame_landmarks)
+
+    # Get prediction, unless this exact capture was seen recently
+    cached = cache.get(processed_sequence, model_version) if cache is not None else None
+    cache_hit = cached is not None
+    if cache_hit:
+        prediction = np.asarray(cached)
+    else:
+        prediction = keras_model.predict(np.expand_dims(processed_sequence, axis=0), verbose=0)[0]
+        if cache is not None:
+            cache.set(processed_sequence, model_version, prediction.tolist())
+    # Cached outputs are raw, so a recalibration applies to them too
+    if temperature != 1.0:
+        prediction = apply_temperature(prediction, temperature)
+
+    predicted_idx = int(np.argmax(prediction))
+    confidence = float(prediction[predicted_idx])
+    if confidence < CONFIDENCE_THRESHOLD:
+        logger.info(f"Low confidence prediction: {confidence:.4f}")
+        sign = "uncertain"
+    elif predicted_idx < len(labels):
+        sign = labels[predicted_idx]
+    else:
+        logger.warning(f"Predicted index {predicted_idx} out of range for labels {labels}")
+        sign = "unknown"
+    return Classification(sign, confidence, prediction, frames_with_hands, cache_hit, None)
@@ -0,0 +1,282 @@
+"""
+Chunked, compressed landmark dataset format.
+Replaces one float64 seq_N.npy file per sequence with a single directory:
+
+    dataset/
+        meta.json      format version, dtype and frame shape
+        index.jsonl    one line of metadata per sequence (class, source, fps,
+                       chunk, offset, length), appended as sequences are written
+        chunks/        frames of many sequences, stored column-wise: landmarks
+                       as byte-shuffled zlib-compressed float16 (or float32) and
+                       the hand presence mask as packed bits
+
+Writes are append-only: full chunks are written to a temporary file and
+renamed before their index lines are added, so an interrupted writer never
+leaves a sequence pointing at missing data. Reads are random-access by
+sequence index, decompressing (and caching) only the chunk that holds it.
+Sequences come back as float32 with NaN rows for frames without a hand, the
+same convention as the .npy files, so landmarks.prepare_sequence reads both.
+"""
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+FORMAT_NAME = 'landmark-dataset'
+FORMAT_VERSION = 1
+CHUNK_MAGIC = b'LMK1'
+# Frames per chunk: large enough to compress well, small enough to decompress quickly
+CHUNK_FRAMES = int(os.getenv("LANDMARK_CHUNK_FRAMES", "8192"))
+# Decompressed chunks kept per reader
+CHUNK_CACHE_SIZE = 8
+
+
+def is_landmark_dataset(path):
+    return os.path.isfile(os.path.join(path, 'meta.json'))
+
+
+def encode_chunk(landmarks, presence):
+    """Compress a chunk of (frames, ...) landmarks and its presence mask"""
+    # Grouping the n-th byte of every value together makes zlib far more effective
+    itemsize = landmarks.dtype.itemsize
+    shuffled = np.ascontiguousarray(landmarks).view(np.uint8).reshape(-1, itemsize).T.tobytes()
+    packed_landmarks = zlib.compress(shuffled, 6)
+    packed_presence = zlib.compress(np.packbits(presence).tobytes(), 6)
+    header = struct.pack('<4sIII', CHUNK_MAGIC, len(presence), len(packed_landmarks), len(packed_presence))
+    return header + packed_landmarks + packed_presence
+
+
+def decode_chunk(data, dtype, frame_shape):
+    magic, num_frames, landmarks_size, presence_size = struct.unpack_from('<4sIII', data)
+    if magic != CHUNK_MAGIC:
+        raise ValueError("Not a landmark dataset chunk")
+
+    offset = struct.calcsize('<4sIII')
+    itemsize = np.dtype(dtype).itemsize
+    shuffled = np.frombuffer(zlib.decompress(data[offset:offset + landmarks_size]), dtype=np.uint8)
+    landmarks = shuffled.reshape(itemsize, -1).T.copy().view(dtype).reshape((num_frames,) + tuple(frame_shape))
+
+    offset += landmarks_size
+    presence = np.unpackbits(np.frombuffer(zlib.decompress(data[offset:offset + presence_size]), dtype=np.uint8))
+    return landmarks, presence[:num_frames].astype(bool)
+
+
+class LandmarkDataset:
+    """Random-access reader and append-only writer for a landmark dataset directory"""
+
+    def __init__(self, path, create=False, dtype='float16', frame_shape=(21, 3)):
+        self.path = path
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.index_path = os.path.join(path, 'index.jsonl')
+        self.chunk_dir = os.path.join(path, 'chunks')
+
+        if not is_landmark_dataset(path):
+            if not create:
+                raise FileNotFoundError(f"No landmark dataset at {path}")
+            os.makedirs(self.chunk_dir, exist_ok=True)
+            meta = {
+                'format': FORMAT_NAME,
+                'format_version': FORMAT_VERSION,
+                'dtype': np.dtype(dtype).name,
+                'frame_shape': list(frame_shape),
+            }
+            with open(self.meta_path, 'w') as f:
+                json.dump(meta, f, indent=2)
+
+        with open(self.meta_path) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != FORMAT_NAME or self.meta.get('format_version', 0) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported landmark dataset at {path}: {self.meta}")
+
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.frame_shape = tuple(self.meta['frame_shape'])
+
+        self.records = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.records = [json.loads(line) for line in f if line.strip()]
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_chunk = max((record['chunk'] for record in self.records), default=-1) + 1
+        self._pending = []  # (record, landmarks, presence) not yet in a written chunk
+        self._pending_frames = 0
+
+    # Reading
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def classes(self):
+        return list(dict.fromkeys(record['class'] for record in self.records))
+
+    @property
+    def version(self):
+        """Content hash of the index; changes whenever sequences are appended"""
+        if not os.path.exists(self.index_path):
+            return "empty"
+        digest = hashlib.sha1()
+        with open(self.index_path, 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()[:12]
+
+    def _chunk(self, chunk_id):
+        with self._lock:
+            if chunk_id in self._cache:
+                self._cache.move_to_end(chunk_id)
+                return self._cache[chunk_id]
+
+        with open(self._chunk_path(chunk_id), 'rb') as f:
+            chunk = decode_chunk(f.read(), self.dtype, self.frame_shape)
+
+        with self._lock:
+            self._cache[chunk_id] = chunk
+            while len(self._cache) > CHUNK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return chunk
+
+    def read(self, index):
+        """(landmarks, presence) of one sequence; landmarks are float32 with NaN rows where no hand was found"""
+        record = self.records[index]
+        landmarks, presence = self._chunk(record['chunk'])
+        end = record['offset'] + record['length']
+        sequence = landmarks[record['offset']:end].astype(np.float32)
+        mask = presence[record['offset']:end]
+        sequence[~mask] = np.nan
+        return sequence, mask
+
+    def __getitem__(self, index):
+        return self.read(index)[0]
+
+    def indices(self, sign=None):
+        """Sequence indices, optionally only those of one class"""
+        return [i for i, record in enumerate(self.records) if sign is None or record['class'] == sign]
+
+    # Writing
+
+    def _chunk_path(self, chunk_id):
+        return os.path.join(self.chunk_dir, f"{chunk_id:06d}.lmk")
+
+    def append(self, landmarks, sign, source=None, fps=None, presence=None):
+        """Queue one sequence; it becomes readable once its chunk is flushed"""
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        if landmarks.shape[1:] == (int(np.prod(self.frame_shape)),):
+            landmarks = landmarks.reshape((-1,) + self.frame_shape)
+        if landmarks.ndim < 2 or landmarks.shape[1:] != self.frame_shape:
+            raise ValueError(f"Frames of shape {landmarks.shape[1:]} do not match the dataset's "
+                             f"{self.frame_shape} at {self.path}")
+        if presence is None:
+            presence = ~np.isnan(landmarks).reshape(len(landmarks), -1).all(axis=1)
+        presence = np.asarray(presence, dtype=bool)
+        # Missing frames are stored as zeros (cheap to compress) and restored from the mask
+        stored = np.where(presence.reshape((-1,) + (1,) * len(self.frame_shape)), landmarks, 0).astype(self.dtype)
+
+        record = {'class': sign, 'source': source, 'fps': fps, 'length': len(landmarks)}
+        with self._lock:
+            self._pending.append((record, stored, presence))
+            self._pending_frames += len(landmarks)
+            full = self._pending_frames >= CHUNK_FRAMES
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write queued sequences as a new chunk, then make them visible in the index"""
+        with self._lock:
+            pending, self._pending, self._pending_frames = self._pending, [], 0
+            if not pending:
+                return
+            chunk_id = self._next_chunk
+            self._next_chunk += 1
+
+        landmarks = np.concatenate([stored for _, stored, _ in pending])
+        presence = np.concatenate([mask for _, _, mask in pending])
+
+        path = self._chunk_path(chunk_id)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(encode_chunk(landmarks, presence))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        offset = 0
+        lines = []
+        records = []
+        for record, stored, _ in pending:
+            record = dict(record, chunk=chunk_id, offset=offset)
+            offset += record['length']
+            records.append(record)
+            lines.append(json.dumps(record) + '\n')
+        with open(self.index_path, 'a') as f:
+            f.writelines(lines)
+
+        with self._lock:
+            self.records.extend(records)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Readers shared by iter_sequences() calls, keyed by path and index state
+_open_datasets = {}
+
+
+def open_dataset(path):
+    """Shared reader for a dataset, reopened when its index has been appended to"""
+    stat = os.stat(os.path.join(path, 'index.jsonl')) if os.path.exists(os.path.join(path, 'index.jsonl')) else None
+    key = os.path.abspath(path)
+    state = (stat.st_size, stat.st_mtime_ns) if stat else None
+    cached = _open_datasets.get(key)
+    if cached is None or cached[0] != state:
+        cached = (state, LandmarkDataset(path))
+        _open_datasets[key] = cached
+    return cached[1]
+
+
+def iter_keyed_sequences(data_dir, sign):
+    """(key, digest, sequence) for one class, where digest changes whenever the sequence does
+
+    Keys are "<sign>/seq_N.npy" for .npy trees, whose digest is a hash of the
+    file; dataset sequences are immutable, so their key doubles as digest.
+    """
+    if is_landmark_dataset(data_dir):
+        dataset = open_dataset(data_dir)
+        for index in dataset.indices(sign):
+            record = dataset.records[index]
+            key = f"chunk{record['chunk']}:{record['offset']}"
+            yield key, key, dataset[index]
+        return
+
+    sign_dir = os.path.join(data_dir, sign)
+    if not os.path.isdir(sign_dir):
+        return
+    for file_name in sorted(f for f in os.listdir(sign_dir) if f.endswith('.npy')):
+        with open(os.path.join(sign_dir, file_name), 'rb') as f:
+            data = f.read()
+        yield f"{sign}/{file_name}", hashlib.sha1(data).hexdigest(), np.load(io.BytesIO(data))
+
+
+def iter_sequences(data_dir, sign):
+    """Landmark sequences of one class from a landmark dataset or a tree of seq_N.npy files"""
+    if is_landmark_dataset(data_dir):
+        dataset = open_dataset(data_dir)
+        for index in dataset.indices(sign):
+            yield dataset[index]
+        return
+
+    sign_dir = os.path.join(data_dir, sign)
+    if not os.path.isdir(sign_dir):
+        return
+    for file_name in sorted(f for f in os.listdir(sign_dir) if f.endswith('.npy')):
+        yield np.load(os.path.join(sign_dir, file_name))
@@ -0,0 +1,232 @@
+"""
+Landmark preprocessing shared by training and serving.
+Captures of any length are resampled in time to the model's sequence length
+by linear interpolation (instead of padding with the last frame or dropping
+the tail), then centered on the wrist and scaled per frame. Training and the
+APIs call the same functions so the model always sees identical inputs.
+
+Frames where MediaPipe found no hand are kept in place and imputed, with a
+per-frame presence value that mask-aware models receive as an extra feature.
+Two-hand frames hold 42 landmarks (left hand, then right hand); each hand is
+normalized on its own wrist, and an absent hand stays all zeros.
+
+Instead of the 63 normalized coordinates, each hand can be described by 40
+geometric features (FEATURE_SET=geometric) that do not change with the
+hand's position, size or in-plane rotation: joint bend and finger spread
+angles, fingertip distances, the palm orientation and the wrist velocity.
+"""
+from itertools import combinations
+import os
+import numpy as np
+
+# Features of one hand: 21 MediaPipe landmarks with x, y, z
+HAND_FEATURES = 21 * 3
+
+# Per-frame features of new models: "landmarks" (normalized coordinates) or
+# "geometric" (see geometric_features); loaded models keep their own
+FEATURE_SET = os.getenv("FEATURE_SET", "landmarks")
+
+# (a, b, c) landmark triples whose angle at b is a finger joint's bend
+FINGER_JOINTS = np.array([
+    (chain[i], chain[i + 1], chain[i + 2])
+    for chain in ((0, 1, 2, 3, 4), (0, 5, 6, 7, 8), (0, 9, 10, 11, 12), (0, 13, 14, 15, 16), (0, 17, 18, 19, 20))
+    for i in range(3)
+])
+# Knuckles of neighbouring fingers, whose directions from the wrist give the finger spread
+FINGER_BASES = np.array([(1, 5), (5, 9), (9, 13), (13, 17)])
+FINGERTIPS = (4, 8, 12, 16, 20)
+# Every pair of fingertips, and each fingertip to the wrist
+TIP_PAIRS = np.array(list(combinations(FINGERTIPS, 2)) + [(0, tip) for tip in FINGERTIPS])
+# 15 bends + 4 spreads + 15 distances + palm normal (3) + wrist velocity (3)
+GEOMETRIC_FEATURES = len(FINGER_JOINTS) + len(FINGER_BASES) + len(TIP_PAIRS) + 3 + 3
+FEATURE_WIDTHS = {'landmarks': HAND_FEATURES, 'geometric': GEOMETRIC_FEATURES}
+
+# How frames without a hand are filled: "interpolate" between the nearest
+# tracked frames, or "zero" (all landmarks on the wrist, the masked value)
+MISSING_HAND_FILL = os.getenv("MISSING_HAND_FILL", "interpolate")
+
+
+def resample_sequence(landmarks_sequence, sequence_length):
+    """Linearly interpolate a (frames, ...) landmark stream to sequence_length frames"""
+    sequence = np.asarray(landmarks_sequence, dtype=np.float32)
+    num_frames = len(sequence)
+    if num_frames == 0:
+        raise ValueError("Cannot resample an empty landmark sequence")
+    if num_frames == sequence_length:
+        return sequence
+    if num_frames == 1:
+        return np.repeat(sequence, sequence_length, axis=0)
+
+    # Position of every output frame on the input timeline
+    positions = np.linspace(0, num_frames - 1, sequence_length, dtype=np.float32)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, num_frames - 1)
+    weights = (positions - lower).reshape((-1,) + (1,) * (sequence.ndim - 1))
+    return sequence[lower] * (1 - weights) + sequence[upper] * weights
+
+
+def normalize_frames(sequence):
+    """Center each hand of a (frames, 21 * hands, 3) sequence on its wrist and scale it into [-1, 1]"""
+    hands = sequence.reshape(len(sequence), -1, 21, 3)
+    centered = hands - hands[:, :, :1]  # Wrist is the first landmark in MediaPipe
+    max_dist = np.abs(centered).max(axis=(2, 3), keepdims=True)
+    # Hands with all landmarks on the wrist (or absent) stay at zero
+    normalized = np.divide(centered, max_dist, out=centered, where=max_dist > 0)
+    return normalized.reshape(sequence.shape)
+
+
+def _cosines(u, v):
+    """Cosine of the angle between vectors along the last axis; 0 where either has no length"""
+    lengths = np.linalg.norm(u, axis=-1) * np.linalg.norm(v, axis=-1)
+    return np.divide((u * v).sum(axis=-1), lengths, out=np.zeros(lengths.shape, dtype=np.float32), where=lengths > 0)
+
+
+def geometric_features(sequence):
+    """(frames, GEOMETRIC_FEATURES * hands) invariant features of a (frames, 21 * hands, 3) sequence
+
+    Computed for all frames and hands at once. Distances and the wrist
+    velocity are in units of the hand's palm length (wrist to middle finger
+    knuckle), so they do not depend on how far the hand is from the camera.
+    An absent (all-zero) hand gives all-zero features, and zero velocity in
+    the frame after it.
+    """
+    hands = np.asarray(sequence, dtype=np.float32).reshape(len(sequence), -1, 21, 3)
+    wrist = hands[:, :, :1]
+
+    bends = _cosines(hands[:, :, FINGER_JOINTS[:, 0]] - hands[:, :, FINGER_JOINTS[:, 1]],
+                     hands[:, :, FINGER_JOINTS[:, 2]] - hands[:, :, FINGER_JOINTS[:, 1]])
+    spreads = _cosines(hands[:, :, FINGER_BASES[:, 0]] - wrist, hands[:, :, FINGER_BASES[:, 1]] - wrist)
+
+    palm = np.linalg.norm(hands[:, :, 9] - hands[:, :, 0], axis=-1)[..., None]
+    distances = np.linalg.norm(hands[:, :, TIP_PAIRS[:, 0]] - hands[:, :, TIP_PAIRS[:, 1]], axis=-1)
+    distances = np.divide(distances, palm, out=np.zeros_like(distances), where=palm > 0)
+
+    # Orientation of the palm plane, spanned by the index and little finger knuckles
+    normal = np.cross(hands[:, :, 5] - hands[:, :, 0], hands[:, :, 17] - hands[:, :, 0])
+    normal_length = np.linalg.norm(normal, axis=-1, keepdims=True)
+    normal = np.divide(normal, normal_length, out=np.zeros_like(normal), where=normal_length > 0)
+
+    # Movement of the whole hand, which wrist-relative features cannot see. Only
+    # between two frames that both show the hand: a hand appearing or vanishing
+    # would otherwise read as a jump from (or to) the origin
+    present = np.any(hands != 0, axis=(2, 3))
+    tracked = present & np.concatenate([present[:1], present[:-1]])
+    velocity = np.diff(hands[:, :, 0], axis=0, prepend=hands[:1, :, 0])
+    velocity = np.divide(velocity, palm, out=np.zeros_like(velocity), where=(palm > 0) & tracked[..., None])
+
+    features = np.concatenate([bends, spreads, distances, normal, velocity], axis=-1)
+    return features.reshape(len(sequence), -1)
+
+
+def resample_and_normalize(landmarks_sequence, sequence_length):
+    """Resample, normalize and flatten a landmark stream to (sequence_length, features)"""
+    sequence = resample_sequence(landmarks_sequence, sequence_length)
+    return normalize_frames(sequence).reshape(sequence_length, -1)
+
+
+def impute_missing(frame_landmarks, fill=None):
+    """Fill frames without a hand in a per-frame landmark list or array
+
+    Missing frames are None in lists from the APIs, and all-NaN in saved
+    (frames, 21, 3) arrays. Returns ((frames, 21, 3) landmarks, (frames,)
+    presence), or (None, None) when no frame has a hand. Interior gaps are
+    interpolated between the surrounding tracked frames; gaps at either end
+    repeat the nearest one.
+    """
+    fill = fill or MISSING_HAND_FILL
+    if isinstance(frame_landmarks, np.ndarray):
+        present = ~np.isnan(frame_landmarks).reshape(len(frame_landmarks), -1).all(axis=1)
+        tracked = frame_landmarks[present].astype(np.float32)
+    else:
+        present = np.array([landmarks is not None for landmarks in frame_landmarks])
+        tracked = [landmarks for landmarks in frame_landmarks if landmarks is not None]
+    if not present.any():
+        return None, None
+
+    tracked = np.asarray(tracked, dtype=np.float32)
+    if present.all():
+        return tracked, present.astype(np.float32)
+
+    sequence = np.zeros((len(frame_landmarks),) + tracked.shape[1:], dtype=np.float32)
+    sequence[present] = tracked
+    if fill == 'interpolate':
+        indices = np.flatnonzero(present)
+        missing = np.flatnonzero(~present)
+        # Tracked neighbours on each side; both clamp to the same frame at the ends
+        right = np.searchsorted(indices, missing)
+        left = np.clip(right - 1, 0, len(indices) - 1)
+        right = np.clip(right, 0, len(indices) - 1)
+        span = indices[right] - indices[left]
+        weights = np.where(span > 0, (missing - indices[left]) / np.maximum(span, 1), 0.0)
+        weights = weights.astype(np.float32).reshape((-1,) + (1,) * (tracked.ndim - 1))
+        sequence[missing] = tracked[left] * (1 - weights) + tracked[right] * weights
+    elif fill != 'zero':
+        raise ValueError(f"Unknown missing hand fill {fill!r}, expected 'interpolate' or 'zero'")
+
+    return sequence, present.astype(np.float32)
+
+
+def drop_frames(landmarks_sequence, rate, rng=None):
+    """Training augmentation: replace a random fraction of frames with None, keeping at least one hand"""
+    rng = rng or np.random.default_rng()
+    frame_landmarks = list(landmarks_sequence)
+    if isinstance(landmarks_sequence, np.ndarray):
+        # Saved sequences mark frames without a hand as NaN
+        frame_landmarks = [None if np.isnan(frame).all() else frame for frame in frame_landmarks]
+    dropped = rng.random(len(frame_landmarks)) < rate
+    present = [i for i, landmarks in enumerate(frame_landmarks) if landmarks is not None]
+    if present:
+        dropped[present[rng.integers(len(present))]] = False
+    return [None if drop else landmarks for landmarks, drop in zip(frame_landmarks, dropped)]
+
+
+def prepare_sequence(frame_landmarks, sequence_length, presence_mask=False, fill=None, features=None):
+    """Impute, resample and normalize (or turn into geometric features) a per-frame landmark list for the model
+
+    With presence_mask, the resampled presence is appended as a last feature
+    column, giving (sequence_length, features + 1).
+    """
+    features = features or FEATURE_SET
+    sequence, presence = impute_missing(frame_landmarks, fill)
+    if sequence is None:
+        raise ValueError("No hand landmarks in any frame")
+
+    if features == 'landmarks':
+        processed = resample_and_normalize(sequence, sequence_length)
+    elif features == 'geometric':
+        processed = geometric_features(resample_sequence(sequence, sequence_length))
+    else:
+        raise ValueError(f"Unknown feature set {features!r}, expected 'landmarks' or 'geometric'")
+    if not presence_mask:
+        return processed
+    mask = resample_sequence(presence, sequence_length)
+    return np.concatenate([processed, mask[:, None]], axis=1)
+
+
+def feature_width(num_hands=1, presence_mask=False, features=None):
+    """Input width of a model for the given layout"""
+    return FEATURE_WIDTHS[features or FEATURE_SET] * num_hands + (1 if presence_mask else 0)
+
+
+def input_features(keras_model, default=None):
+    """Feature set ("landmarks" or "geometric") a model was built for, read from its input width"""
+    if keras_model is None:
+        return default or FEATURE_SET
+    width = keras_model.input_shape[-1]
+    for features, per_hand in FEATURE_WIDTHS.items():
+        if width % per_hand in (0, 1) and width // per_hand in (1, 2):
+            return features
+    raise ValueError(f"Model input width {width} matches no feature set")
+
+
+def input_layout(keras_model, default_hands=1, default_mask=False):
+    """(hands, presence_mask) a model was built for, read from its input width
+
+    Widths are 63 or 126 landmark features (40 or 80 geometric ones), plus
+    one for the presence column.
+    """
+    if keras_model is None:
+        return default_hands, default_mask
+    width = keras_model.input_shape[-1]
+    per_hand = FEATURE_WIDTHS[input_features(keras_model)]
+    return width // per_hand, width % per_hand == 1
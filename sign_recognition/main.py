@@ -6,13 +6,23 @@ This server processes webcam frames and returns sign predictions.
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional
-import base64
-import cv2
 import numpy as np
 import os
-import mediapipe as mp
-from model import SignLanguageModel
+from frame_buffers import FrameBufferPool, FrameRef, FRAME_POOL_SLOTS
+from inference_worker import InferencePool, InferenceTimeout
+from keyframes import extract_keyframe_landmarks, record_keyframe_metrics
+from admission import frame_stride, is_degraded, register_admission, thin_frames
+from metrics import inc, register_metrics
+from prediction_cache import create_prediction_cache
+from quality import capture_problem
+from server_config import uvicorn_options
+from tiers import resolve_tier, variant_predictors
+from profiling import register_profiling
+from frame_decoder import decode_frames, get_decoder
+from streaming import BinaryFrameParser, FrameStreamParser, StreamingFrameDecoder, StreamingLandmarkPipeline
+from vision import landmark_extractor
 import logging
 import uvicorn
 import traceback
@@ -24,8 +34,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the inference workers (if configured) with the server and stop them on shutdown
+
+    The frame pool and the inference pool are created here rather than at
+    import, so that every server process (e.g. each worker forked by
+    serve.py) owns its own shared memory block, slot list and workers.
+    """
+    global frame_pool, inference_pool
+    if INFERENCE_WORKERS > 0:
+        # Decoded frames reach the workers through shared memory slots
+        frame_pool = FrameBufferPool() if FRAME_POOL_SLOTS > 0 else None
+        inference_pool = InferencePool(PREDICTOR_PATH, num_workers=INFERENCE_WORKERS, frame_pool=frame_pool)
+        inference_pool.start()
+        logger.info(f"Using {INFERENCE_WORKERS} dedicated inference worker(s)")
+    try:
+        yield
+    finally:
+        if inference_pool is not None:
+            inference_pool.stop()
+            inference_pool = None
+        if frame_pool is not None:
+            frame_pool.close()
+            frame_pool = None
+
 # Initialize FastAPI app
-app = FastAPI(title="Sign Language Recognition API")
+app = FastAPI(title="Sign Language Recognition API", lifespan=lifespan)
 
 # Allow CORS
 app.add_middleware(
@@ -36,27 +71,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize MediaPipe Hands
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Opt-in per-request profiling (requires PROFILE_TOKEN)
+register_profiling(app)
+register_metrics(app)
+# Per-client rate limits, and reduced fidelity or 503 under overload
+register_admission(app)
+
+# Number of dedicated inference processes; 0 keeps inference in this process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# Predictors that can serve recognition, as "module:Class"
+PREDICTORS = {
+    "classifier": "model:SignLanguageModel",  # Softmax output layer
+    "student": "model:StudentModel",  # Compact distilled model, see distill_student.py
+    "prototypes": "prototypes:PrototypeEngine",  # Nearest-prototype search, see prototypes.py
+    "fast_path": "fast_path:FastPathRouter",  # Frame k-NN for static signs first, then the classifier
+}
+RECOGNITION_ENGINE = os.getenv("RECOGNITION_ENGINE", "classifier")
+if RECOGNITION_ENGINE not in PREDICTORS:
+    raise ValueError(f"Unknown RECOGNITION_ENGINE {RECOGNITION_ENGINE!r}, expected one of {', '.join(PREDICTORS)}")
+PREDICTOR_PATH = PREDICTORS[RECOGNITION_ENGINE]
+# Quality tier of requests that do not ask for one (see tiers.py); grading favours accuracy.
+# "accurate" tracks every frame, i.e. keyframe skipping is off on the quiz endpoints by default
+QUIZ_QUALITY_TIER = os.getenv("QUIZ_QUALITY_TIER", "accurate")
+inference_pool = None
+predictors = None
+frame_pool = None
 
-# Initialize the model
-try:
-    model = SignLanguageModel()
-    # Print model details for debugging
-    logger.info(f"Sign language model initialized successfully with classes: {model.classes}")
-    logger.info(f"Model path: {model.model_path}")
-    logger.info(f"Scaler path: {model.scaler_path}")
-    logger.info(f"Model loaded: {model.model is not None}")
-except Exception as e:
-    logger.error(f"Error initializing model: {e}")
-    logger.error(traceback.format_exc())
+if INFERENCE_WORKERS > 0:
+    # Each worker loads its own model, so this process never imports TensorFlow;
+    # the workers are started by the lifespan handler
     model = None
+else:
+    # Initialize the model
+    try:
+        if RECOGNITION_ENGINE == "prototypes":
+            from prototypes import PrototypeEngine
+            model = PrototypeEngine()
+            logger.info(f"Prototype engine initialized with {len(model.classes)} signs from {model.index_path}")
+        elif RECOGNITION_ENGINE == "fast_path":
+            from fast_path import FastPathRouter
+            model = FastPathRouter()
+            logger.info(f"Fast path router initialized with classes {model.classes} from {model.model_path}")
+        elif RECOGNITION_ENGINE == "student":
+            from model import StudentModel
+            model = StudentModel()
+            logger.info(f"Student model initialized with classes {model.classes} from {model.model_path}")
+        else:
+            from model import SignLanguageModel
+            model = SignLanguageModel()
+            # Print model details for debugging
+            logger.info(f"Sign language model initialized successfully with classes: {model.classes}")
+            logger.info(f"Model path: {model.model_path}")
+            logger.info(f"Scaler path: {model.scaler_path}")
+            logger.info(f"Model loaded: {model.model is not None}")
+    except Exception as e:
+        logger.error(f"Error initializing model: {e}")
+        logger.error(traceback.format_exc())
+        model = None
+    
+    # Model per quality tier, e.g. the distilled student for 'fast'
+    if model is not None:
+        predictors = variant_predictors(model)
+
+# Repeat submissions of the same capture are answered from the cache
+prediction_cache = create_prediction_cache()
 
 # Data models
 class FrameData(BaseModel):
@@ -68,6 +146,14 @@ class RecognitionResult(BaseModel):
     predictedSign: str
     confidence: float
     message: Optional[str] = None
+    tier: Optional[str] = None  # Quality tier the request was served at
+
+def rejected_capture(rejected, tier=None):
+    """Result for a capture the quality gate turned away"""
+    reason, message = rejected
+    inc('sign_capture_rejected_total', reason=reason)
+    logger.info(f"Capture rejected before inference: {reason}")
+    return RecognitionResult(isCorrect=False, predictedSign="uncertain", confidence=0.0, message=message, tier=tier)
 
 # Increase the maximum size for requests
 @app.middleware("http")
@@ -78,62 +164,18 @@ async def add_process_time_header(request: Request, call_next):
     response = await call_next(request)
     return response
 
-def base64_to_image(base64_string):
-    """Convert base64 string to OpenCV image"""
-    try:
-        # Remove the data URL prefix if present
-        if "data:image" in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64
-        img_data = base64.b64decode(base64_string)
-        np_arr = np.frombuffer(img_data, np.uint8)
-        
-        # Convert to OpenCV image
-        return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    except Exception as e:
-        logger.error(f"Error converting base64 to image: {e}")
-        logger.error(traceback.format_exc())
-        return None
-
-def extract_hand_landmarks(frame):
-    """Extract hand landmarks from frame using MediaPipe"""
-    try:
-        # Convert to RGB (MediaPipe requires RGB)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = hands.process(rgb_frame)
-        
-        # Check for hand landmarks
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]  # First hand
-            
-            # Extract landmarks
-            landmarks = []
-            for landmark in hand_landmarks.landmark:
-                landmarks.append([landmark.x, landmark.y, landmark.z])
-            
-            return landmarks
-        
-        return None
-    except Exception as e:
-        logger.error(f"Error extracting hand landmarks: {e}")
-        logger.error(traceback.format_exc())
-        return None
-
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "Sign Language Recognition API"}
 
 @app.post("/api/quiz", response_model=RecognitionResult)
-async def recognize_sign(data: FrameData):
+async def recognize_sign(data: FrameData, request: Request):
     """
     Recognize sign language from a sequence of frames
     """
     # Check if model is initialized
-    if model is None:
+    if model is None and inference_pool is None:
         logger.error("Model not initialized, returning error response")
         raise HTTPException(status_code=500, detail="Model not initialized")
     
@@ -144,43 +186,74 @@ async def recognize_sign(data: FrameData):
     
     logger.info(f"Received {len(data.frames)} frames for recognition, expected sign: {data.expectedSign}")
     
+    # Under load only a subset of the frames is processed, one tier lower
+    degraded = is_degraded(request)
+    frames = thin_frames(data.frames) if degraded else data.frames
+    tier = resolve_tier(request, QUIZ_QUALITY_TIER, degraded)
+    
     # Process frames
-    all_landmarks = []
+    frame_landmarks = []
+    decoded_frames = []
     frames_processed = 0
     frames_with_hands = 0
     
     try:
-        for base64_frame in data.frames:
-            # Convert base64 to image
-            frame = base64_to_image(base64_frame)
+        # Decode all frames of the request in parallel; for the inference
+        # workers straight into shared frame slots where the decoder can
+        if inference_pool is not None and frame_pool is not None:
+            decoded = get_decoder().executor.map(lambda frame: pool_frame(frame, tier.decode_scale), frames)
+        else:
+            decoded = decode_frames(frames, tier.decode_scale)
+        for frame in decoded:
             frames_processed += 1
             
             if frame is None:
                 logger.warning(f"Frame {frames_processed} conversion failed")
                 continue
             
-            # Extract landmarks
-            landmarks = extract_hand_landmarks(frame)
-            
-            if landmarks is not None:
-                all_landmarks.append(landmarks)
-                frames_with_hands += 1
+            decoded_frames.append(frame)
         
-        logger.info(f"Processed {frames_processed} frames, found hands in {frames_with_hands} frames")
+        if inference_pool is not None:
+            # Hand tracking runs in the inference worker
+            result = await run_in_worker(decoded_frames, tier)
+            frames_with_hands = result['frames_with_hands']
+            keyframe_count = result['keyframes']
+        else:
+            # Run MediaPipe on keyframes only and interpolate the frames in between
+            predictor = predictors[tier.model_variant]
+            frame_landmarks, keyframe_count = extract_keyframe_landmarks(
+                decoded_frames, landmark_extractor(predictor.num_hands, tier.model_complexity),
+                tier.keyframe_threshold, tier.keyframe_max_gap
+            )
+            frames_with_hands = sum(landmarks is not None for landmarks in frame_landmarks)
+        
+        record_keyframe_metrics("quiz", len(decoded_frames), keyframe_count, tier)
+        logger.info(f"Processed {frames_processed} frames ({keyframe_count} keyframes), found hands in {frames_with_hands} frames")
         
         # Check if we have enough landmarks
-        if len(all_landmarks) == 0:
+        if frames_with_hands == 0:
             logger.warning("No hand landmarks detected in any frame")
             return RecognitionResult(
                 isCorrect=False,
                 predictedSign="unknown",
                 confidence=0.0,
-                message="No hand landmarks detected in any frame"
+                message="No hand landmarks detected in any frame",
+                tier=tier.name
             )
         
+        # Hopeless captures are answered without running the model
+        rejected = result['rejected'] if inference_pool is not None else capture_problem(frame_landmarks)
+        if rejected:
+            return rejected_capture(rejected, tier.name)
+        
         # Predict sign
-        logger.debug("Calling model.predict() with landmarks")
-        predicted_sign, confidence = model.predict(all_landmarks)
+        if inference_pool is not None:
+            predicted_sign, confidence = result['predicted_sign'], result['confidence']
+            cache_hit = result['cache_hit']
+        else:
+            # Frames without a hand are imputed rather than dropped
+            logger.debug("Calling model.predict_cached() with landmarks")
+            predicted_sign, confidence, cache_hit = predictor.predict_cached(frame_landmarks, prediction_cache)
         logger.info(f"Prediction: {predicted_sign} with confidence {confidence:.2f}")
         
         # Check correctness
@@ -188,22 +261,215 @@ async def recognize_sign(data: FrameData):
         
         # Add more detailed logging information
         logger.info(f"Recognition details - Expected: {data.expectedSign}, Predicted: {predicted_sign}, Confidence: {confidence:.4f}, Correct: {is_correct}")
-        logger.info(f"Class mapping: {model.classes}")
+        if model is not None:
+            logger.info(f"Class mapping: {model.classes}")
         
         return RecognitionResult(
             isCorrect=is_correct,
             predictedSign=predicted_sign,
             confidence=confidence,
-            message=f"Hand detected in {frames_with_hands}/{frames_processed} frames"
+            message=f"Hand detected in {frames_with_hands}/{frames_processed} frames ({keyframe_count} keyframes)"
+                    + (", cached prediction" if cache_hit else "")
+                    + (", reduced fidelity under load" if degraded else ""),
+            tier=tier.name
         )
     
+    except InferenceTimeout as e:
+        logger.error(f"Inference worker timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    
     except Exception as e:
         logger.error(f"Error in recognition: {e}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error in recognition: {str(e)}")
 
+@app.post("/api/quiz/stream", response_model=RecognitionResult)
+async def recognize_sign_stream(request: Request):
+    """
+    Recognize sign language from a streamed {"frames": [...], "expectedSign": ...} body
+
+    Frames are decoded and hand-tracked as soon as they arrive instead of after
+    the whole upload has been buffered and parsed.
+    """
+    if model is None and inference_pool is None:
+        logger.error("Model not initialized, returning error response")
+        raise HTTPException(status_code=500, detail="Model not initialized")
+    
+    parser = FrameStreamParser()
+    tier = resolve_tier(request, QUIZ_QUALITY_TIER, is_degraded(request))
+    pipeline = tier_pipeline(tier, frame_stride(request))
+    
+    try:
+        async for chunk in request.stream():
+            for frame in parser.feed(chunk):
+                pipeline.submit(frame)
+        parser.close()
+    except ValueError as e:
+        pipeline.cancel()
+        logger.warning(f"Rejected streamed request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # Client went away mid-upload; give the tracker back
+        pipeline.cancel()
+        raise
+    
+    expected_sign = parser.fields.get("expectedSign")
+    if not isinstance(expected_sign, str):
+        pipeline.cancel()
+        raise HTTPException(status_code=400, detail="expectedSign is required")
+    if pipeline.frames_received == 0:
+        logger.warning("No frames provided in request")
+        raise HTTPException(status_code=400, detail="No frames provided")
+    
+    return await recognize_streamed(pipeline, expected_sign, "quiz_stream", tier, is_degraded(request))
+
+@app.post("/api/quiz/frames", response_model=RecognitionResult)
+async def recognize_sign_frames(request: Request):
+    """
+    Recognize sign language from a binary body of length-prefixed encoded frames
+
+    Each frame is a 4-byte big-endian length followed by the JPEG/PNG bytes,
+    and the expected sign comes in the X-Expected-Sign header (or the
+    expectedSign query parameter). Proxies can stream camera frames into this
+    endpoint without base64 or JSON, which makes the body a third smaller
+    and skips encoding and parsing on both sides.
+    """
+    if model is None and inference_pool is None:
+        logger.error("Model not initialized, returning error response")
+        raise HTTPException(status_code=500, detail="Model not initialized")
+    
+    expected_sign = request.headers.get("x-expected-sign") or request.query_params.get("expectedSign")
+    if not expected_sign:
+        raise HTTPException(status_code=400, detail="X-Expected-Sign header is required")
+    
+    parser = BinaryFrameParser()
+    tier = resolve_tier(request, QUIZ_QUALITY_TIER, is_degraded(request))
+    pipeline = tier_pipeline(tier, frame_stride(request))
+    
+    try:
+        async for chunk in request.stream():
+            for frame in parser.feed(chunk):
+                pipeline.submit_encoded(frame)
+        parser.close()
+    except ValueError as e:
+        pipeline.cancel()
+        logger.warning(f"Rejected binary request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        pipeline.cancel()
+        raise
+    
+    if pipeline.frames_received == 0:
+        logger.warning("No frames provided in request")
+        raise HTTPException(status_code=400, detail="No frames provided")
+    
+    return await recognize_streamed(pipeline, expected_sign, "quiz_frames", tier, is_degraded(request))
+
+def pool_frame(base64_frame, scale):
+    """A frame decoded straight into a free shared frame slot (a FrameRef), else a BGR image or None"""
+    decoder = get_decoder()
+    slot = frame_pool.acquire()
+    if slot is not None:
+        image = decoder.decode_base64_into(
+            base64_frame, lambda shape: frame_pool.view(slot, shape) if frame_pool.fits(shape) else None, scale
+        )
+        if image is not None:
+            return FrameRef(slot, image.shape)
+        frame_pool.release([slot])
+    return decoder.decode_base64(base64_frame, scale)
+
+async def run_in_worker(decoded_frames, tier):
+    """Track and predict decoded frames in an inference worker, through shared memory slots where free
+
+    Frames are BGR images, or FrameRefs already decoded into a slot by
+    pool_frame(); the slots are released once the worker is done.
+    """
+    frames = []
+    used_slots = [frame.slot for frame in decoded_frames if isinstance(frame, FrameRef)]
+    try:
+        for frame in decoded_frames:
+            if isinstance(frame, FrameRef):
+                frames.append(frame)
+                continue
+            slot = frame_pool.acquire() if frame_pool is not None else None
+            if slot is None:
+                # No shared buffer free, send the pixels through the queue
+                frames.append(frame)
+            else:
+                used_slots.append(slot)
+                frames.append(FrameRef(slot, frame_pool.write_rgb(slot, frame)))
+        return await inference_pool.submit(frames, tier.name)
+    finally:
+        # The worker is done with (or was killed while reading) these slots
+        if used_slots:
+            frame_pool.release(used_slots)
+
+def tier_pipeline(tier, stride=1):
+    """StreamingLandmarkPipeline with a quality tier's decoding, keyframe and tracking settings"""
+    if inference_pool is not None:
+        # Frames are only decoded here; the inference worker tracks them
+        return StreamingFrameDecoder(stride=stride, scale=tier.decode_scale)
+    extract = landmark_extractor(predictors[tier.model_variant].num_hands, tier.model_complexity)
+    return StreamingLandmarkPipeline(extract, tier.keyframe_threshold, tier.keyframe_max_gap,
+                                     stride=stride, scale=tier.decode_scale)
+
+async def recognize_streamed(pipeline, expected_sign, endpoint, tier, degraded=False):
+    """Finish a streaming pipeline and classify its frames"""
+    try:
+        if inference_pool is not None:
+            result = await run_in_worker(await pipeline.finish(), tier)
+            frames_with_hands, keyframe_count = result['frames_with_hands'], result['keyframes']
+        else:
+            frame_landmarks, keyframe_count = await pipeline.finish()
+            frames_with_hands = sum(landmarks is not None for landmarks in frame_landmarks)
+        frames_processed = pipeline.frames_received
+        
+        record_keyframe_metrics(endpoint, pipeline.frames_decoded, keyframe_count, tier)
+        logger.info(f"Streamed ({endpoint}) {frames_processed} frames ({keyframe_count} keyframes), found hands in {frames_with_hands} frames")
+        
+        if frames_with_hands == 0:
+            logger.warning("No hand landmarks detected in any frame")
+            return RecognitionResult(
+                isCorrect=False,
+                predictedSign="unknown",
+                confidence=0.0,
+                message="No hand landmarks detected in any frame",
+                tier=tier.name
+            )
+        
+        rejected = result['rejected'] if inference_pool is not None else capture_problem(frame_landmarks)
+        if rejected:
+            return rejected_capture(rejected, tier.name)
+        
+        if inference_pool is not None:
+            predicted_sign, confidence, cache_hit = result['predicted_sign'], result['confidence'], result['cache_hit']
+        else:
+            predictor = predictors[tier.model_variant]
+            predicted_sign, confidence, cache_hit = predictor.predict_cached(frame_landmarks, prediction_cache)
+        is_correct = predicted_sign.lower() == expected_sign.lower()
+        logger.info(f"Recognition details - Expected: {expected_sign}, Predicted: {predicted_sign}, Confidence: {confidence:.4f}, Correct: {is_correct}")
+        
+        return RecognitionResult(
+            isCorrect=is_correct,
+            predictedSign=predicted_sign,
+            confidence=confidence,
+            message=f"Hand detected in {frames_with_hands}/{frames_processed} frames ({keyframe_count} keyframes)"
+                    + (", cached prediction" if cache_hit else "")
+                    + (", reduced fidelity under load" if degraded else ""),
+            tier=tier.name
+        )
+    
+    except InferenceTimeout as e:
+        logger.error(f"Inference worker timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    
+    except Exception as e:
+        logger.error(f"Error in streamed recognition: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error in recognition: {str(e)}")
+
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
     reload_flag = os.getenv("RELOAD", "true").lower() == "true"
-    uvicorn.run("main:app", host=host, port=port, reload=reload_flag)
\ No newline at end of file
+    uvicorn.run("main:app", host=host, port=port, reload=reload_flag, **uvicorn_options())
\ No newline at end of file
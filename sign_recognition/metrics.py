@@ -0,0 +1,65 @@
+"""
+Minimal in-process metrics for the sign recognition APIs.
+Counters, gauges and summaries (count + sum) are kept per process and exposed
+in the Prometheus text format at /metrics.
+"""
+from fastapi.responses import PlainTextResponse
+from collections import defaultdict
+import threading
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_summaries = defaultdict(lambda: [0, 0.0])
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1.0, **labels):
+    """Increase a counter"""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record one observation of a summary"""
+    with _lock:
+        summary = _summaries[_key(name, labels)]
+        summary[0] += 1
+        summary[1] += value
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(_gauges.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (count, total) in sorted(_summaries.items()):
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+    return '\n'.join(lines) + '\n'
+
+
+def register_metrics(app):
+    """Expose the metrics of this process at GET /metrics"""
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        return PlainTextResponse(render())
@@ -11,20 +11,56 @@ from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 import os
 import pickle
+import hashlib
 import logging
 import traceback
+from landmarks import prepare_sequence, drop_frames, input_layout, input_features, feature_width, FEATURE_SET
+from tcn import build_tcn
+from landmark_store import iter_keyed_sequences
+from incremental import incremental_update, load_training_manifest, save_training_manifest
+from calibration import CONFIDENCE_THRESHOLD, apply_temperature, calibrate, load_calibration
+import shared_weights
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# New models take a per-frame hand presence column next to the landmarks
+PRESENCE_MASK = os.getenv("PRESENCE_MASK", "false").lower() == "true"
+# Hands per frame for new models: 1 (63 features) or 2 (126 features, left hand first)
+NUM_HANDS = int(os.getenv("NUM_HANDS", "1"))
+# Fraction of frames hidden in the extra augmented copy of each training sequence
+MISSING_FRAME_AUGMENT = float(os.getenv("MISSING_FRAME_AUGMENT", "0.2"))
+# Architecture of newly created models: "lstm" (recurrent stack) or "tcn"
+# (dilated temporal convolutions, which process all frames in parallel)
+MODEL_ARCHITECTURE = os.getenv("MODEL_ARCHITECTURE", "lstm")
+# Distilled student served by RECOGNITION_ENGINE=student (see distill_student.py)
+STUDENT_MODEL_PATH = os.getenv(
+    "STUDENT_MODEL_PATH", os.path.join(os.path.dirname(__file__), 'models', 'sign_language_student.h5')
+)
+
+def artifact_version(path):
+    """Short content hash of a model artifact, used to tell model versions apart"""
+    if not path or not os.path.exists(path):
+        return "untrained"
+    
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
 class SignLanguageModel:
-    def __init__(self):
+    def __init__(self, model_path=None):
         # Model parameters
         self.num_landmarks = 21  # MediaPipe hand landmarks
         self.num_coords = 3      # x, y, z coordinates
         self.sequence_length = 30  # Frames per sign
         self.classes = ['one', 'two', 'three', 'a', 'b', 'c']  # Signs to detect - UPDATED
+        self.num_hands = NUM_HANDS
+        self.presence_mask = PRESENCE_MASK
+        self.architecture = MODEL_ARCHITECTURE
+        self.features = FEATURE_SET
         
         # Paths
         self.model_dir = os.path.join(os.path.dirname(__file__), 'models')
@@ -38,6 +74,11 @@ class SignLanguageModel:
         self.alt_model_path = os.path.join(self.model_dir, 'sign_language_numbers_letters.h5')
         self.alt_scaler_path = os.path.join(self.model_dir, 'scaler_numbers_letters.pkl')
         
+        # An explicit model path is the only one tried
+        if model_path is not None:
+            self.model_path = model_path
+            self.alt_model_path = None
+        
         # Load model if exists
         self.model = None
         self.scaler = None
@@ -46,7 +87,7 @@ class SignLanguageModel:
         if os.path.exists(self.model_path):
             try:
                 logger.info(f"Loading model from {self.model_path}")
-                self.model = load_model(self.model_path)
+                self.model = shared_weights.load_model(self.model_path)
                 
                 # Load scaler if exists
                 if os.path.exists(self.scaler_path):
@@ -60,10 +101,10 @@ class SignLanguageModel:
             logger.info(f"Model not found at {self.model_path}, trying alternative path")
         
         # If primary load failed, try alternative paths
-        if self.model is None and os.path.exists(self.alt_model_path):
+        if self.model is None and self.alt_model_path and os.path.exists(self.alt_model_path):
             try:
                 logger.info(f"Loading model from alternative path {self.alt_model_path}")
-                self.model = load_model(self.alt_model_path)
+                self.model = shared_weights.load_model(self.alt_model_path)
                 self.model_path = self.alt_model_path  # Update path if successful
                 
                 # Load scaler if exists
@@ -79,84 +120,65 @@ class SignLanguageModel:
         if self.model is None:
             logger.warning("No existing model found. Creating a new model...")
             self.create_model()
+            self.version = "untrained"
+            self.temperature = 1.0
+        else:
+            self.load_calibration()
+            # A loaded model decides for itself how many hands and whether a mask column it expects
+            self.num_hands, self.presence_mask = input_layout(self.model)
+            self.features = input_features(self.model)
+            # Incrementally trained models may have grown new classes
+            manifest = load_training_manifest(self.model_path)
+            if manifest is not None:
+                self.classes = manifest['classes']
+    
+    def load_calibration(self):
+        """Pick up the model's confidence temperature (see calibration.py) and version"""
+        calibration = load_calibration(self.model_path)
+        self.temperature = calibration['temperature'] if calibration else 1.0
+        self.version = artifact_version(self.model_path)
+        if calibration is None:
+            logger.info(f"No confidence calibration for {self.model_path}, using raw softmax outputs")
+            return
+        if calibration.get('fitted_on') != self.version:
+            logger.warning(f"Calibration of {self.model_path} was fitted on version {calibration.get('fitted_on')}, "
+                           f"not {self.version}; recalibrate with calibrate_model.py")
+        # Calibrated confidences differ from raw ones, so they must not share cache entries
+        self.version = f"{self.version}-t{self.temperature:.3f}"
+    
+    def calibrate(self, X_val, y_val):
+        """Fit the confidence temperature on held-out preprocessed sequences and integer labels"""
+        report = calibrate(self.model_path, self.model.predict(X_val, verbose=0), y_val,
+                           artifact_version(self.model_path))
+        logger.info(f"Calibrated temperature {report['temperature']:.3f}: NLL {report['nll'][0]:.4f} -> "
+                    f"{report['nll'][1]:.4f}, ECE {report['ece'][0]:.4f} -> {report['ece'][1]:.4f}")
+        self.load_calibration()
+        return report
     
     def preprocess_landmarks(self, landmarks_sequence):
-        """Normalize and preprocess hand landmarks"""
+        """Impute frames without a hand (None), resample to sequence_length frames, then normalize and flatten"""
         try:
-            # Convert to list if it's a numpy array
-            if isinstance(landmarks_sequence, np.ndarray):
-                landmarks_sequence = landmarks_sequence.tolist()
-            
-            # Ensure we have the right number of frames
-            if len(landmarks_sequence) < self.sequence_length:
-                # Pad with the last frame
-                last_frame = landmarks_sequence[-1]
-                landmarks_sequence = landmarks_sequence + [last_frame] * (self.sequence_length - len(landmarks_sequence))
-            elif len(landmarks_sequence) > self.sequence_length:
-                # Truncate
-                landmarks_sequence = landmarks_sequence[:self.sequence_length]
-            
-            # Flatten landmarks for each frame
-            flattened_sequence = []
-            for landmarks in landmarks_sequence:
-                # Convert to numpy array if not already
-                landmarks = np.array(landmarks)
-                
-                # Center the landmarks around the wrist
-                wrist = landmarks[0]  # Wrist is the first landmark in MediaPipe
-                centered = landmarks - wrist
-                
-                # Normalize for scale
-                max_dist = np.max(np.abs(centered))
-                if max_dist > 0:
-                    normalized = centered / max_dist
-                else:
-                    normalized = centered
-                
-                # Flatten to 1D array
-                flattened = normalized.flatten()
-                flattened_sequence.append(flattened)
-            
-            return np.array(flattened_sequence)
+            return prepare_sequence(landmarks_sequence, self.sequence_length, self.presence_mask,
+                                    features=self.features)
         except Exception as e:
             logger.error(f"Error in preprocess_landmarks: {e}")
             logger.error(traceback.format_exc())
             raise
     
     def create_model(self):
-        """Create a new LSTM model for sign language recognition"""
+        """Create a new model for sign language recognition, of the architecture in self.architecture"""
         try:
             # Input shape: [sequence_length, features]
-            input_shape = (self.sequence_length, self.num_landmarks * self.num_coords)
+            num_features = feature_width(self.num_hands, self.presence_mask, self.features)
+            input_shape = (self.sequence_length, num_features)
             num_classes = len(self.classes)
             
-            model = Sequential([
-                # First LSTM layer with bidirectional wrapper
-                Bidirectional(LSTM(64, return_sequences=True), input_shape=input_shape),
-                BatchNormalization(),
-                Dropout(0.3),
-                
-                # Second LSTM layer
-                Bidirectional(LSTM(128, return_sequences=True)),
-                BatchNormalization(),
-                Dropout(0.3),
-                
-                # Third LSTM layer
-                LSTM(64),
-                BatchNormalization(),
-                Dropout(0.3),
-                
-                # Dense layers
-                Dense(64, activation='relu'),
-                BatchNormalization(),
-                Dropout(0.3),
-                
-                Dense(32, activation='relu'),
-                BatchNormalization(),
-                
-                # Output layer
-                Dense(num_classes, activation='softmax')
-            ])
+            if self.architecture == 'tcn':
+                model = build_tcn(input_shape, num_classes)
+            elif self.architecture != 'lstm':
+                raise ValueError(f"Unknown model architecture {self.architecture!r}, expected 'lstm' or 'tcn'")
+            else:
+                model = self.build_lstm(input_shape, num_classes)
             
             # Compile with Adam optimizer
             model.compile(
@@ -166,39 +188,78 @@ class SignLanguageModel:
             )
             
             self.model = model
-            logger.info("Created new model")
+            logger.info(f"Created new {self.architecture} model")
             return model
         except Exception as e:
             logger.error(f"Error creating model: {e}")
             logger.error(traceback.format_exc())
             raise
     
+    @staticmethod
+    def build_lstm(input_shape, num_classes):
+        """Uncompiled stacked LSTM model"""
+        return Sequential([
+            # First LSTM layer with bidirectional wrapper
+            Bidirectional(LSTM(64, return_sequences=True), input_shape=input_shape),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            # Second LSTM layer
+            Bidirectional(LSTM(128, return_sequences=True)),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            # Third LSTM layer
+            LSTM(64),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            # Dense layers
+            Dense(64, activation='relu'),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            Dense(32, activation='relu'),
+            BatchNormalization(),
+            
+            # Output layer
+            Dense(num_classes, activation='softmax')
+        ])
+    
+    def training_samples(self, sequence):
+        """Preprocessed samples for one raw training sequence, augmented copies included"""
+        samples = [self.preprocess_landmarks(sequence)]
+        # Teach mask-aware models what partially tracked captures look like
+        if self.presence_mask and MISSING_FRAME_AUGMENT > 0:
+            samples.append(self.preprocess_landmarks(drop_frames(sequence, MISSING_FRAME_AUGMENT)))
+        return samples
+    
     def prepare_data_from_directory(self, data_dir):
-        """Load and preprocess training data from directory"""
+        """Load and preprocess training data from a seq_N.npy tree or a landmark dataset"""
         try:
             X = []
             y = []
+            # Sequences this data trains the model on, saved as its manifest by train()
+            self.data_manifest = {}
             
             logger.info(f"Loading data from {data_dir}")
             for class_idx, class_name in enumerate(self.classes):
-                class_dir = os.path.join(data_dir, class_name)
-                
-                if not os.path.exists(class_dir):
-                    logger.warning(f"Warning: Directory for class {class_name} not found at {class_dir}")
-                    continue
-                
                 logger.info(f"Processing class: {class_name}")
-                files = [f for f in os.listdir(class_dir) if f.endswith('.npy')]
-                logger.info(f"Found {len(files)} sequences")
+                count = 0
                 
-                for file_name in files:
-                    file_path = os.path.join(class_dir, file_name)
-                    sequence = np.load(file_path)
+                for key, digest, sequence in iter_keyed_sequences(data_dir, class_name):
+                    count += 1
+                    self.data_manifest[key] = digest
                     
                     # Preprocess landmarks
-                    processed_sequence = self.preprocess_landmarks(sequence)
-                    X.append(processed_sequence)
-                    y.append(class_idx)
+                    for processed_sequence in self.training_samples(sequence):
+                        X.append(processed_sequence)
+                        y.append(class_idx)
+                
+                if count == 0:
+                    logger.warning(f"Warning: No sequences for class {class_name} in {data_dir}")
+                else:
+                    logger.info(f"Found {count} sequences")
             
             return np.array(X), np.array(y)
         except Exception as e:
@@ -258,51 +319,125 @@ class SignLanguageModel:
             
             # Load the best model
             self.model = load_model(self.model_path)
+            # Temperature for this version's confidences, from the held-out split
+            self.calibrate(X_val, np.argmax(y_val, axis=1))
+            
+            # Baseline for later incremental updates
+            if getattr(self, 'data_manifest', None):
+                save_training_manifest(self.model_path, self.classes, self.data_manifest)
+            
+            return history
+        except Exception as e:
+            logger.error(f"Error training model: {e}")
+            logger.error(traceback.format_exc())
+            raise
+    
+    def train_incremental(self, data_dir, epochs=None, batch_size=16):
+        """Fine-tune the model at model_path on the new or changed sequences of data_dir
+
+        Classes in self.classes that the model does not know yet are added
+        as new outputs; see incremental.py.
+        """
+        try:
+            # Always continue from the model being refreshed, not whichever one __init__ found first
+            self.model = load_model(self.model_path)
+            self.num_hands, self.presence_mask = input_layout(self.model)
+            self.features = input_features(self.model)
             
+            self.model, self.classes, history = incremental_update(
+                self.model, self.model_path, self.classes, data_dir, self.training_samples,
+                epochs=epochs, batch_size=batch_size
+            )
+            if history is not None:
+                # The fine-tuned weights need their own temperature; refit it on the
+                # same held-out split as calibrate_model.py
+                X, y = self.prepare_data_from_directory(data_dir)
+                _, X_val, _, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+                self.calibrate(X_val, y_val)
+            else:
+                self.load_calibration()
             return history
         except Exception as e:
             logger.error(f"Error training model: {e}")
             logger.error(traceback.format_exc())
             raise
     
+    def classify(self, processed_sequence):
+        """Run the model on one preprocessed sequence and map the output to a class"""
+        # Add batch dimension
+        X = np.expand_dims(processed_sequence, axis=0)
+        
+        # Make prediction
+        logger.debug(f"Making prediction with processed sequence shape: {X.shape}")
+        prediction = self.model.predict(X, verbose=0)[0]
+        if self.temperature != 1.0:
+            prediction = apply_temperature(prediction, self.temperature)
+        
+        # Get class and confidence
+        predicted_class_idx = np.argmax(prediction)
+        confidence = prediction[predicted_class_idx]
+        
+        logger.debug(f"Raw prediction: {prediction}")
+        logger.debug(f"Predicted index: {predicted_class_idx}, Confidence: {confidence}")
+        
+        if confidence < CONFIDENCE_THRESHOLD:
+            logger.info(f"Low confidence prediction: {confidence:.4f}")
+            return "uncertain", float(confidence)
+        
+        if predicted_class_idx >= len(self.classes):
+            logger.warning(f"Predicted index {predicted_class_idx} out of range for classes {self.classes}")
+            return "unknown", float(confidence)
+        
+        return self.classes[predicted_class_idx], float(confidence)
+    
     def predict(self, landmarks_sequence):
-        """Predict sign from a sequence of hand landmarks"""
+        """Predict sign from per-frame hand landmarks (None for frames without a hand)"""
+        sign, confidence, _ = self.predict_cached(landmarks_sequence, None)
+        return sign, confidence
+    
+    def predict_cached(self, landmarks_sequence, cache):
+        """Predict sign, consulting a PredictionCache first; returns (sign, confidence, cache_hit)"""
         try:
             if self.model is None:
                 raise ValueError("Model not initialized. Create or load a model first.")
             
-            if not landmarks_sequence:
+            if not landmarks_sequence or all(landmarks is None for landmarks in landmarks_sequence):
                 logger.warning("No landmarks provided for prediction")
-                return "unknown", 0.0
+                return "unknown", 0.0, False
             
             # Preprocess the landmarks
             processed_sequence = self.preprocess_landmarks(landmarks_sequence)
             
-            # Add batch dimension
-            X = np.expand_dims(processed_sequence, axis=0)
+            if cache is not None:
+                cached = cache.get(processed_sequence, self.version)
+                if cached is not None:
+                    logger.debug(f"Prediction cache hit: {cached}")
+                    return cached[0], float(cached[1]), True
             
-            # Make prediction
-            logger.debug(f"Making prediction with processed sequence shape: {X.shape}")
-            prediction = self.model.predict(X, verbose=0)[0]
+            predicted_sign, confidence = self.classify(processed_sequence)
             
-            # Get class and confidence
-            predicted_class_idx = np.argmax(prediction)
-            confidence = prediction[predicted_class_idx]
+            if cache is not None:
+                cache.set(processed_sequence, self.version, [predicted_sign, confidence])
             
-            logger.debug(f"Raw prediction: {prediction}")
-            logger.debug(f"Predicted index: {predicted_class_idx}, Confidence: {confidence}")
-            
-            if confidence < 0.35:
-                logger.info(f"Low confidence prediction: {confidence:.4f}")
-                return "uncertain", float(confidence)
-            
-            if predicted_class_idx >= len(self.classes):
-                logger.warning(f"Predicted index {predicted_class_idx} out of range for classes {self.classes}")
-                return "unknown", float(confidence)
-            
-            return self.classes[predicted_class_idx], float(confidence)
+            return predicted_sign, confidence, False
         
         except Exception as e:
             logger.error(f"Error in prediction: {e}")
             logger.error(traceback.format_exc())
-            return "error", 0.0
\ No newline at end of file
+            return "error", 0.0, False
+
+
+class StudentModel(SignLanguageModel):
+    """Distilled compact model, a drop-in replacement for SignLanguageModel in serving
+
+    Unlike SignLanguageModel it never falls back to a fresh, untrained
+    network: a missing or unreadable student raises instead.
+    """
+    
+    def __init__(self, model_path=None):
+        model_path = model_path or STUDENT_MODEL_PATH
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No student model at {model_path}; train one with distill_student.py")
+        super().__init__(model_path)
+        if self.version == "untrained":
+            raise ValueError(f"Could not load the student model at {model_path}")
@@ -6,13 +6,26 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-import base64
-import cv2
-import numpy as np
+import asyncio
 import os
-import mediapipe as mp
 import tensorflow as tf
 import pickle
+from admission import frame_stride, is_degraded, register_admission, thin_frames
+from profiling import register_profiling
+from frame_decoder import decode_frames
+from keyframes import extract_keyframe_landmarks, record_keyframe_metrics
+from landmarks import prepare_sequence, input_layout, input_features
+from metrics import register_metrics
+from calibration import load_calibration
+from model import artifact_version
+from landmark_classifier import classify_landmarks
+from prediction_cache import create_prediction_cache
+from responses import fast_json_response
+from server_config import uvicorn_options
+import shared_weights
+from streaming import BinaryFrameParser, StreamingLandmarkPipeline
+from tiers import resolve_tier
+from vision import landmark_extractor
 import logging
 import uvicorn
 
@@ -35,14 +48,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize MediaPipe Hands
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Opt-in per-request profiling (requires PROFILE_TOKEN)
+register_profiling(app)
+register_metrics(app)
+# Per-client rate limits, and reduced fidelity or 503 under overload
+register_admission(app)
 
 # Load recognition model
 model_dir = 'models'
@@ -52,33 +62,50 @@ labels_path = os.path.join(model_dir, 'scaler_numbers_letters.pkl')
 # Check if model exists
 if os.path.exists(model_path) and os.path.exists(labels_path):
     try:
-        model = tf.keras.models.load_model(model_path)
+        model = shared_weights.load_model(model_path)
         with open(labels_path, 'rb') as f:
             gesture_labels = pickle.load(f)
         logger.info(f"Model loaded successfully with {len(gesture_labels)} gestures")
+        model_version = artifact_version(model_path)
+        # Confidence temperature fitted by train.py / calibrate_model.py (see calibration.py)
+        calibration = load_calibration(model_path)
+        temperature = calibration['temperature'] if calibration else 1.0
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         model = None
         gesture_labels = None
+        temperature = 1.0
 else:
     logger.warning("Model files not found. Use train.py to train first.")
     model = None
     gesture_labels = ['one', 'two', 'three', 'a', 'b', 'c']  # Default labels
+    temperature = 1.0
+
+# Repeat submissions of the same capture are answered from the cache
+prediction_cache = create_prediction_cache()
 
 # Sequence parameters
 sequence_length = 30
 num_landmarks = 21
 num_coords = 3
 
+# Hands per frame, presence mask column and feature set the loaded model expects
+num_hands, presence_mask = input_layout(model)
+feature_set = input_features(model)
+# Quality tier of requests that do not ask for one (see tiers.py)
+RECOGNIZE_QUALITY_TIER = os.getenv("RECOGNIZE_QUALITY_TIER", "balanced")
+
 # Data models
 class FrameData(BaseModel):
     frames: List[str]  # Base64 encoded frames
+    include_predictions: bool = False  # Return per-class scores in all_predictions
 
 class RecognitionResult(BaseModel):
     detected_sign: str
     confidence: float
     all_predictions: Optional[Dict[str, float]] = None
     message: Optional[str] = None
+    tier: Optional[str] = None  # Quality tier the request was served at
 
 # Increase the maximum size for requests
 @app.middleware("http")
@@ -87,103 +114,44 @@ async def add_process_time_header(request: Request, call_next):
     response = await call_next(request)
     return response
 
-def base64_to_image(base64_string):
-    """Convert base64 string to OpenCV image"""
-    try:
-        # Remove the data URL prefix if present
-        if "data:image" in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64
-        img_data = base64.b64decode(base64_string)
-        np_arr = np.frombuffer(img_data, np.uint8)
-        
-        # Convert to OpenCV image
-        return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    except Exception as e:
-        logger.error(f"Error converting base64 to image: {e}")
-        return None
-
-def extract_hand_landmarks(frame):
-    """Extract hand landmarks from frame using MediaPipe"""
-    try:
-        # Convert to RGB (MediaPipe requires RGB)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = hands.process(rgb_frame)
-        
-        # Check for hand landmarks
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]  # First hand
-            
-            # Extract landmarks
-            landmarks = []
-            for landmark in hand_landmarks.landmark:
-                landmarks.append([landmark.x, landmark.y, landmark.z])
-            
-            return landmarks
-        
-        return None
-    except Exception as e:
-        logger.error(f"Error extracting hand landmarks: {e}")
-        return None
+def recognition_response(detected_sign, confidence, all_predictions=None, message=None, tier=None):
+    """RecognitionResult-shaped response, serialized without per-request validation"""
+    return fast_json_response({
+        "detected_sign": detected_sign,
+        "confidence": confidence,
+        "all_predictions": all_predictions,
+        "message": message,
+        "tier": tier
+    })
 
 def preprocess_landmarks(landmarks_sequence):
-    """Normalize and preprocess hand landmarks for model input"""
-    # Ensure we have the right number of frames
-    if len(landmarks_sequence) < sequence_length:
-        # Pad with the last frame
-        last_frame = landmarks_sequence[-1]
-        landmarks_sequence = landmarks_sequence + [last_frame] * (sequence_length - len(landmarks_sequence))
-    elif len(landmarks_sequence) > sequence_length:
-        # Truncate
-        landmarks_sequence = landmarks_sequence[:sequence_length]
-    
-    # Flatten landmarks for each frame
-    flattened_sequence = []
-    for landmarks in landmarks_sequence:
-        # Convert to numpy array if not already
-        landmarks = np.array(landmarks)
-        
-        # Center the landmarks around the wrist
-        wrist = landmarks[0]  # Wrist is the first landmark in MediaPipe
-        centered = landmarks - wrist
-        
-        # Normalize for scale
-        max_dist = np.max(np.abs(centered))
-        if max_dist > 0:
-            normalized = centered / max_dist
-        else:
-            normalized = centered
-        
-        # Flatten to 1D array
-        flattened = normalized.flatten()
-        flattened_sequence.append(flattened)
-    
-    return np.array(flattened_sequence)
+    """Impute frames without a hand (None), then normalize and preprocess hand landmarks for model input"""
+    return prepare_sequence(landmarks_sequence, sequence_length, presence_mask, features=feature_set)
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "Numbers and Letters Sign Recognition API"}
 
+def mock_response():
+    """For demonstration purposes, a mock response when the model isn't available"""
+    mock_sign = "one"  # Default 
+    mock_confidence = 0.8
+    
+    return recognition_response(
+        detected_sign=mock_sign,
+        confidence=mock_confidence,
+        message="Using mock response (model not loaded)"
+    )
+
 @app.post("/api/recognize", response_model=RecognitionResult)
-async def recognize_sign(data: FrameData):
+async def recognize_sign(data: FrameData, request: Request):
     """
     Recognize sign language from a sequence of frames
     """
     # Check if model is initialized
     if model is None:
-        # For demonstration purposes, use a mock response if model isn't available
-        mock_sign = "one"  # Default 
-        mock_confidence = 0.8
-        
-        return RecognitionResult(
-            detected_sign=mock_sign,
-            confidence=mock_confidence,
-            message="Using mock response (model not loaded)"
-        )
+        return mock_response()
     
     # Check for frames
     if not data.frames or len(data.frames) == 0:
@@ -191,68 +159,110 @@ async def recognize_sign(data: FrameData):
     
     logger.info(f"Received {len(data.frames)} frames for recognition")
     
-    # Process frames
-    all_landmarks = []
-    frames_processed = 0
-    frames_with_hands = 0
+    # Under load only a subset of the frames is processed, one tier lower
+    degraded = is_degraded(request)
+    frames = thin_frames(data.frames) if degraded else data.frames
+    tier = resolve_tier(request, RECOGNIZE_QUALITY_TIER, degraded)
+    frames_processed = len(frames)
     
     try:
-        for base64_frame in data.frames:
-            # Convert base64 to image
-            frame = base64_to_image(base64_frame)
-            frames_processed += 1
-            
-            if frame is None:
-                continue
-            
-            # Extract landmarks
-            landmarks = extract_hand_landmarks(frame)
-            
-            if landmarks is not None:
-                all_landmarks.append(landmarks)
-                frames_with_hands += 1
+        # Decode all frames of the request in parallel
+        decoded_frames = [frame for frame in decode_frames(frames, tier.decode_scale) if frame is not None]
         
-        logger.info(f"Processed {frames_processed} frames, found hands in {frames_with_hands} frames")
+        # Run MediaPipe on keyframes only and interpolate the frames in between
+        frame_landmarks, keyframe_count = extract_keyframe_landmarks(
+            decoded_frames, landmark_extractor(num_hands, tier.model_complexity),
+            tier.keyframe_threshold, tier.keyframe_max_gap
+        )
+    except Exception as e:
+        logger.error(f"Error in recognition: {e}")
+        raise HTTPException(status_code=500, detail=f"Error in recognition: {str(e)}")
+    
+    record_keyframe_metrics("recognize", len(decoded_frames), keyframe_count, tier)
+    return recognize_landmarks(frame_landmarks, keyframe_count, frames_processed, tier,
+                               data.include_predictions, degraded)
+
+@app.post("/api/recognize/frames", response_model=RecognitionResult)
+async def recognize_sign_frames(request: Request):
+    """
+    Recognize a binary body of length-prefixed encoded frames
+
+    Each frame is a 4-byte big-endian length followed by the JPEG/PNG bytes.
+    Frames are decoded and hand-tracked while the rest of the body is still
+    arriving, without base64 or JSON on either side. include_predictions=true
+    may be passed as a query parameter.
+    """
+    include_predictions = request.query_params.get("include_predictions", "false").lower() == "true"
+    if model is None:
+        return mock_response()
+    
+    # Under load only every n-th frame is processed, one tier lower
+    degraded = is_degraded(request)
+    tier = resolve_tier(request, RECOGNIZE_QUALITY_TIER, degraded)
+    parser = BinaryFrameParser()
+    pipeline = StreamingLandmarkPipeline(landmark_extractor(num_hands, tier.model_complexity),
+                                         tier.keyframe_threshold, tier.keyframe_max_gap,
+                                         stride=frame_stride(request), scale=tier.decode_scale)
+    try:
+        async for chunk in request.stream():
+            for frame in parser.feed(chunk):
+                pipeline.submit_encoded(frame)
+        parser.close()
+    except ValueError as e:
+        pipeline.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # Client went away mid-upload; give the tracker back
+        pipeline.cancel()
+        raise
+    
+    if pipeline.frames_received == 0:
+        raise HTTPException(status_code=400, detail="No frames provided")
+    
+    logger.info(f"Received {pipeline.frames_received} binary frames for recognition")
+    
+    try:
+        frame_landmarks, keyframe_count = await pipeline.finish()
+    except Exception as e:
+        logger.error(f"Error in recognition: {e}")
+        raise HTTPException(status_code=500, detail=f"Error in recognition: {str(e)}")
+    
+    record_keyframe_metrics("recognize_frames", pipeline.frames_decoded, keyframe_count, tier)
+    # The model runs off the event loop, so other uploads keep streaming in meanwhile
+    return await asyncio.to_thread(recognize_landmarks, frame_landmarks, keyframe_count, pipeline.frames_received,
+                                   tier, include_predictions, degraded)
+
+def recognize_landmarks(frame_landmarks, keyframe_count, frames_processed, tier, include_predictions=False,
+                        degraded=False):
+    """Classify per-frame landmarks (None where no hand was found)"""
+    try:
+        result = classify_landmarks(frame_landmarks, model, gesture_labels, preprocess_landmarks, model_version,
+                                    temperature, prediction_cache)
+        logger.info(f"Processed {frames_processed} frames ({keyframe_count} keyframes), found hands in {result.frames_with_hands} frames")
         
-        # Check if we have enough landmarks
-        if len(all_landmarks) == 0:
-            return RecognitionResult(
-                detected_sign="unknown",
+        if result.rejection:
+            return recognition_response(
+                detected_sign=result.sign,
                 confidence=0.0,
-                message="No hand landmarks detected in any frame"
+                message=result.rejection,
+                tier=tier.name
             )
         
-        # Preprocess landmarks for model input
-        processed_sequence = preprocess_landmarks(all_landmarks)
-        
-        # Add batch dimension
-        input_data = np.expand_dims(processed_sequence, axis=0)
-        
-        # Get prediction
-        prediction = model.predict(input_data, verbose=0)[0]
-        
-        # Get top prediction
-        predicted_idx = np.argmax(prediction)
-        confidence = float(prediction[predicted_idx])
-        
-        if predicted_idx < len(gesture_labels):
-            detected_sign = gesture_labels[predicted_idx]
-        else:
-            detected_sign = "unknown"
-            
-        # Prepare all predictions for debugging
-        all_predictions = {
-            gesture_labels[i]: float(prediction[i]) 
-            for i in range(len(gesture_labels))
-        }
+        # Per-class scores are only built when the client asks for them
+        all_predictions = None
+        if include_predictions:
+            all_predictions = dict(zip(gesture_labels, result.probabilities.tolist()))
         
-        logger.info(f"Detected: {detected_sign} ({confidence:.2f})")
+        logger.info(f"Detected: {result.sign} ({result.confidence:.2f})")
         
-        return RecognitionResult(
-            detected_sign=detected_sign,
-            confidence=confidence,
+        return recognition_response(
+            detected_sign=result.sign,
+            confidence=result.confidence,
             all_predictions=all_predictions,
-            message=f"Hand detected in {frames_with_hands}/{frames_processed} frames"
+            message=f"Hand detected in {result.frames_with_hands}/{frames_processed} frames ({keyframe_count} keyframes)"
+                    + (", cached prediction" if result.cache_hit else "")
+                    + (", reduced fidelity under load" if degraded else ""),
+            tier=tier.name
         )
     
     except Exception as e:
@@ -260,4 +270,4 @@ async def recognize_sign(data: FrameData):
         raise HTTPException(status_code=500, detail=f"Error in recognition: {str(e)}")
 
 if __name__ == "__main__":
-    uvicorn.run("numbers_letters_api:app", host="0.0.0.0", port=8002, reload=True)
\ No newline at end of file
+    uvicorn.run("numbers_letters_api:app", host="0.0.0.0", port=8002, reload=True, **uvicorn_options())
\ No newline at end of file
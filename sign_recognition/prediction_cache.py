@@ -0,0 +1,119 @@
+"""
+Prediction cache for the sign recognition APIs.
+Predictions are keyed by a hash of the quantized, preprocessed landmark
+tensor plus the model version, so re-submitting the same capture (or holding
+a sign in front of the translate client) skips the model entirely. Entries
+live in an in-process LRU with a TTL, or in Redis when REDIS_URL is set.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Optional shared backend
+try:
+    import redis
+except ImportError:
+    redis = None
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))  # 0 disables caching
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))  # Seconds
+# Landmarks are normalized to [-1, 1]; rounding to 1/64 absorbs jitter between re-submissions
+PREDICTION_CACHE_QUANT = int(os.getenv("PREDICTION_CACHE_QUANT", "64"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+def cache_key(processed_sequence, model_version, quant=PREDICTION_CACHE_QUANT):
+    """Key for a preprocessed (sequence_length, features) tensor"""
+    quantized = np.round(np.asarray(processed_sequence, dtype=np.float32) * quant).astype(np.int16)
+    digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+    digest.update(str(quantized.shape).encode())
+    return f"sign:{model_version}:{digest.hexdigest()}"
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Backend for any client with Redis get/set(ex=) semantics"""
+
+    def __init__(self, client, ttl=PREDICTION_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+
+class PredictionCache:
+    """Cache of prediction results scoped by model version"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, processed_sequence, model_version):
+        try:
+            value = self.backend.get(cache_key(processed_sequence, model_version))
+        except Exception as e:
+            # A cache outage must never fail a prediction
+            logger.warning(f"Prediction cache lookup failed: {e}")
+            value = None
+        metrics.inc("sign_prediction_cache_total", result="hit" if value is not None else "miss")
+        return value
+
+    def set(self, processed_sequence, model_version, value):
+        try:
+            self.backend.set(cache_key(processed_sequence, model_version), value)
+        except Exception as e:
+            logger.warning(f"Prediction cache store failed: {e}")
+
+
+def create_prediction_cache():
+    """Build the cache from the environment; None when caching is disabled"""
+    if PREDICTION_CACHE_SIZE <= 0:
+        return None
+
+    if REDIS_URL:
+        if redis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed, using in-process cache")
+        else:
+            return PredictionCache(RedisBackend(redis.Redis.from_url(REDIS_URL)))
+
+    return PredictionCache(MemoryBackend())
@@ -0,0 +1,207 @@
+"""
+Opt-in per-request sampling profiler for the sign recognition APIs.
+A request asks for a profile with the `X-Profile: 1` header or `?profile=1`
+query flag and must carry the `X-Profile-Token` matching the PROFILE_TOKEN
+environment variable. The sampled stacks are written in the folded format
+used by flamegraph.pl / speedscope and can be fetched back by request ID.
+
+Besides the event loop, the threads that do a request's heavy lifting are
+sampled: the frame decoder pool, the stream trackers and the asyncio and
+AnyIO thread pools. Each stack is rooted at its thread's name. These pools
+are shared, so under concurrent load a profile includes other requests'
+work in them; idle pool threads are not counted.
+"""
+from fastapi import HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from collections import Counter
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Profiling is disabled entirely unless a token is configured
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # Seconds between samples
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))  # Oldest profiles are pruned
+
+# Name prefixes of the worker threads sampled alongside the event loop
+PROFILE_THREADS = [prefix for prefix in os.getenv(
+    "PROFILE_THREADS", "frame-decode,stream-tracker,asyncio,AnyIO worker thread"
+).split(',') if prefix]
+
+# Innermost frames of a pool thread waiting for work
+IDLE_FRAMES = {('thread.py', '_worker'), ('queue.py', 'get'), ('threading.py', 'wait')}
+
+# Request IDs end up in file names, so keep them to a safe alphabet
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of a thread and of the worker threads at a fixed interval.
+
+    Native work (MediaPipe graphs, OpenCV, TensorFlow kernels) is attributed
+    to the Python frame that called into it, e.g. `process (solution_base.py)`.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL, thread_prefixes=PROFILE_THREADS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _thread_label(self, thread_id, names):
+        """Root frame name for a sampled thread, None for threads that are not sampled"""
+        if thread_id == self.thread_id:
+            return 'event-loop'
+        name = names.get(thread_id, '')
+        for prefix in self.thread_prefixes:
+            if name.startswith(prefix):
+                return prefix
+        return None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                label = self._thread_label(thread_id, names)
+                if label is None:
+                    continue
+                code = frame.f_code
+                if thread_id != self.thread_id and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+
+                # Walk from the innermost frame outwards, then flip to root-first order
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(label)
+
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def folded(self):
+        """Return the samples as folded stacks, one `stack count` per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def is_authorized(request: Request):
+    """Check the profiling token without leaking timing information"""
+    if not PROFILE_TOKEN:
+        return False
+    supplied = request.headers.get("x-profile-token", "")
+    return hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+
+def profiling_requested(request: Request):
+    """Whether the caller asked for this request to be profiled"""
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    return flag is not None and flag.lower() in ("1", "true", "yes")
+
+
+def get_request_id(request: Request, in_progress=()):
+    """Reuse a well-formed X-Request-ID from the caller, otherwise mint one
+
+    An ID that already names a stored or in-progress profile gets a random
+    suffix, so one request cannot overwrite another's profile.
+    """
+    request_id = request.headers.get("x-request-id", "")
+    if not REQUEST_ID_PATTERN.match(request_id):
+        return uuid.uuid4().hex
+    if request_id in in_progress or os.path.exists(profile_path(request_id)):
+        return f"{request_id[:55]}-{uuid.uuid4().hex[:8]}"
+    return request_id
+
+
+def profile_path(request_id):
+    return os.path.join(PROFILE_DIR, f"{request_id}.folded")
+
+
+def save_profile(request_id, profiler):
+    """Write a folded-stack profile to disk and prune old ones"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(profile_path(request_id), 'w') as f:
+        f.write(profiler.folded())
+
+    profiles = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith('.folded')),
+        key=os.path.getmtime
+    )
+    for stale in profiles[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+def register_profiling(app):
+    """Install the profiling middleware and the profile retrieval endpoint on an app"""
+    # IDs of profiles being recorded; only touched on the event loop
+    in_progress = set()
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not profiling_requested(request):
+            return await call_next(request)
+
+        if not is_authorized(request):
+            logger.warning(f"Rejected profiling request for {request.url.path}: missing or invalid token")
+            return await call_next(request)
+
+        request_id = get_request_id(request, in_progress)
+        in_progress.add(request_id)
+
+        # Handlers run on the event loop thread; the worker threads are sampled alongside it
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+            in_progress.discard(request_id)
+            try:
+                save_profile(request_id, profiler)
+                logger.info(f"Saved profile {request_id} for {request.url.path}: "
+                            f"{profiler.sample_count} samples over {profiler.duration:.3f}s")
+            except Exception as e:
+                logger.error(f"Error saving profile {request_id}: {e}")
+
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Profile-ID"] = request_id
+        return response
+
+    @app.get("/api/profiles/{request_id}", response_class=PlainTextResponse)
+    async def get_profile(request_id: str, request: Request):
+        """Return a stored folded-stack profile by request ID"""
+        if not is_authorized(request):
+            raise HTTPException(status_code=403, detail="Profiling not authorized")
+
+        if not REQUEST_ID_PATTERN.match(request_id) or not os.path.exists(profile_path(request_id)):
+            raise HTTPException(status_code=404, detail="Profile not found")
+
+        with open(profile_path(request_id)) as f:
+            return PlainTextResponse(f.read())
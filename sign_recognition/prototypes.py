@@ -0,0 +1,202 @@
+"""
+Large-vocabulary sign recognition by nearest-prototype search.
+The penultimate layer of a trained sign model serves as a landmark-sequence
+embedding. Every sign is stored as one or more L2-normalized prototype
+embeddings, and recognition is a single matrix-vector product against the
+prototype matrix, so the cost does not grow with an output layer. New signs
+are added by inserting prototypes; the backbone is never retrained.
+"""
+import hashlib
+import os
+import threading
+import numpy as np
+import tensorflow as tf
+import logging
+import traceback
+from model import SignLanguageModel
+
+logger = logging.getLogger(__name__)
+
+PROTOTYPE_INDEX_PATH = os.getenv(
+    "PROTOTYPE_INDEX_PATH", os.path.join(os.path.dirname(__file__), 'models', 'sign_prototypes.npz')
+)
+# Softmax temperature over cosine similarities when turning them into a confidence
+PROTOTYPE_TEMPERATURE = float(os.getenv("PROTOTYPE_TEMPERATURE", "0.05"))
+# Best cosine similarity below which the prediction is reported as "uncertain"
+PROTOTYPE_MIN_SIMILARITY = float(os.getenv("PROTOTYPE_MIN_SIMILARITY", "0.5"))
+# Number of nearest prototypes considered for the confidence
+PROTOTYPE_TOP_K = int(os.getenv("PROTOTYPE_TOP_K", "10"))
+
+
+def l2_normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class PrototypeIndex:
+    """Labelled prototype embeddings with cosine nearest-neighbour search"""
+
+    def __init__(self, dim, vectors=None, labels=None):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32) if vectors is None else vectors.astype(np.float32)
+        self.labels = [] if labels is None else list(labels)
+        self._lock = threading.Lock()
+        self._update_version()
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def classes(self):
+        return list(dict.fromkeys(self.labels))
+
+    def _update_version(self):
+        # Changes whenever prototypes change, so cached predictions are not reused
+        digest = hashlib.sha1(self.vectors.tobytes())
+        digest.update('\n'.join(self.labels).encode())
+        self.version = digest.hexdigest()[:12]
+
+    def add(self, label, embeddings):
+        """Insert the mean of a sign's example embeddings as one more prototype"""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding size {embeddings.shape[1]} does not match index size {self.dim}")
+
+        prototype = l2_normalize(l2_normalize(embeddings).mean(axis=0))
+        with self._lock:
+            # Copy-on-write so concurrent searches keep a consistent matrix
+            self.vectors = np.vstack([self.vectors, prototype[None, :]])
+            self.labels = self.labels + [label]
+            self._update_version()
+
+    def remove(self, label):
+        with self._lock:
+            keep = [i for i, existing in enumerate(self.labels) if existing != label]
+            self.vectors = self.vectors[keep]
+            self.labels = [self.labels[i] for i in keep]
+            self._update_version()
+
+    def search(self, embedding, k=PROTOTYPE_TOP_K):
+        """(label, similarity) of the best prototype per sign among the k nearest"""
+        vectors, labels = self.vectors, self.labels
+        if not labels:
+            return []
+
+        similarities = vectors @ l2_normalize(np.asarray(embedding, dtype=np.float32))
+        k = min(k, len(labels))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        nearest = nearest[np.argsort(-similarities[nearest])]
+
+        results = {}
+        for i in nearest:
+            results.setdefault(labels[i], float(similarities[i]))
+        return list(results.items())
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, vectors=self.vectors, labels=np.array(self.labels, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        vectors = data['vectors']
+        return cls(vectors.shape[1], vectors, data['labels'].tolist())
+
+
+class PrototypeEngine:
+    """Recognizer over a prototype index, served like SignLanguageModel
+
+    Exposes classes, num_hands, version and predict_cached(), so it can be
+    used in-process or through an InferencePool ("prototypes:PrototypeEngine").
+    """
+
+    def __init__(self, index_path=PROTOTYPE_INDEX_PATH, backbone=None):
+        self.index_path = index_path
+        self.backbone = backbone or SignLanguageModel()
+        self.num_hands = self.backbone.num_hands
+
+        # Everything up to the output layer is the embedding
+        keras_model = self.backbone.model
+        self.embedder = tf.keras.Model(inputs=keras_model.inputs, outputs=keras_model.layers[-2].output)
+        dim = self.embedder.output_shape[-1]
+
+        if os.path.exists(index_path):
+            self.index = PrototypeIndex.load(index_path)
+            if self.index.dim != dim:
+                raise ValueError(f"Prototype index at {index_path} has size {self.index.dim}, backbone embeds to {dim}")
+            logger.info(f"Loaded {len(self.index)} prototypes for {len(self.index.classes)} signs from {index_path}")
+        else:
+            logger.warning(f"No prototype index at {index_path}, starting empty. Use build_prototypes.py to add signs.")
+            self.index = PrototypeIndex(dim)
+
+        # Kept for parity with SignLanguageModel so callers can check `engine.model is not None`
+        self.model = self.embedder
+
+    @property
+    def classes(self):
+        return self.index.classes
+
+    @property
+    def version(self):
+        return f"{self.backbone.version}-{self.index.version}"
+
+    def embed(self, processed_sequences):
+        """L2-normalized embeddings for a batch of preprocessed sequences"""
+        batch = np.asarray(processed_sequences, dtype=np.float32)
+        return l2_normalize(self.embedder(batch, training=False).numpy())
+
+    def add_sign(self, label, landmark_sequences):
+        """Add a sign (or another prototype for it) from example landmark sequences"""
+        processed = [self.backbone.preprocess_landmarks(sequence) for sequence in landmark_sequences]
+        self.index.add(label, self.embed(processed))
+
+    def save(self):
+        self.index.save(self.index_path)
+
+    def classify(self, processed_sequence):
+        """Nearest prototypes for one preprocessed sequence, mapped to (sign, confidence)"""
+        matches = self.index.search(self.embed(processed_sequence[None])[0])
+        if not matches:
+            return "unknown", 0.0
+
+        similarities = np.array([similarity for _, similarity in matches])
+        weights = np.exp((similarities - similarities[0]) / PROTOTYPE_TEMPERATURE)
+        confidence = float(weights[0] / weights.sum())
+
+        label, best = matches[0]
+        logger.debug(f"Nearest prototypes: {matches[:3]}")
+        if best < PROTOTYPE_MIN_SIMILARITY:
+            logger.info(f"No prototype close enough: {label} at similarity {best:.4f}")
+            return "uncertain", confidence
+        return label, confidence
+
+    def predict(self, landmarks_sequence):
+        sign, confidence, _ = self.predict_cached(landmarks_sequence, None)
+        return sign, confidence
+
+    def predict_cached(self, landmarks_sequence, cache):
+        """Predict sign, consulting a PredictionCache first; returns (sign, confidence, cache_hit)"""
+        try:
+            if not landmarks_sequence or all(landmarks is None for landmarks in landmarks_sequence):
+                logger.warning("No landmarks provided for prediction")
+                return "unknown", 0.0, False
+
+            processed_sequence = self.backbone.preprocess_landmarks(landmarks_sequence)
+            version = self.version
+
+            if cache is not None:
+                cached = cache.get(processed_sequence, version)
+                if cached is not None:
+                    return cached[0], float(cached[1]), True
+
+            predicted_sign, confidence = self.classify(processed_sequence)
+
+            if cache is not None:
+                cache.set(processed_sequence, version, [predicted_sign, confidence])
+
+            return predicted_sign, confidence, False
+
+        except Exception as e:
+            logger.error(f"Error in prototype prediction: {e}")
+            logger.error(traceback.format_exc())
+            return "error", 0.0, False
@@ -0,0 +1,50 @@
+"""
+Input quality gate run before recognition.
+Captures where the hand is mostly missing, too small to track reliably, or
+shaking from frame to frame (MediaPipe losing the hand rather than the user
+moving) cannot be classified meaningfully. They are rejected from their
+landmarks alone, before any model runs, with a message telling the user
+what to fix.
+"""
+import os
+import numpy as np
+
+# Fraction of frames that must show a hand
+MIN_HAND_RATIO = float(os.getenv("QUALITY_MIN_HAND_RATIO", "0.3"))
+# Median palm length (wrist to middle finger knuckle) as a fraction of the frame width
+MIN_HAND_SIZE = float(os.getenv("QUALITY_MIN_HAND_SIZE", "0.03"))
+# Median frame-to-frame acceleration of the finger landmarks, in palm lengths
+MAX_JITTER = float(os.getenv("QUALITY_MAX_JITTER", "0.5"))
+
+
+def capture_stats(frame_landmarks):
+    """Hand ratio, median hand size and jitter of a per-frame landmark list (None without a hand)"""
+    present = [np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+               for landmarks in frame_landmarks if landmarks is not None]
+    stats = {'hand_ratio': len(present) / max(len(frame_landmarks), 1), 'hand_size': 0.0, 'jitter': 0.0}
+    if not present:
+        return stats
+
+    hands = np.stack(present)  # (frames, hands, 21, 3); an absent second hand is all zeros
+    # Largest hand of each frame, so a missing second hand does not count as a small one
+    palm = np.linalg.norm(hands[:, :, 9, :2] - hands[:, :, 0, :2], axis=-1).max(axis=1)
+    stats['hand_size'] = float(np.median(palm))
+
+    if len(hands) >= 3:
+        centered = (hands - hands[:, :, :1]) / np.maximum(palm, 1e-6)[:, None, None, None]
+        acceleration = centered[2:] - 2 * centered[1:-1] + centered[:-2]
+        stats['jitter'] = float(np.median(np.linalg.norm(acceleration, axis=-1).mean(axis=(1, 2))))
+    return stats
+
+
+def capture_problem(frame_landmarks):
+    """(reason, message) when a capture is too poor to classify, None when it may go to the model"""
+    stats = capture_stats(frame_landmarks)
+    if stats['hand_ratio'] < MIN_HAND_RATIO:
+        visible = round(stats['hand_ratio'] * len(frame_landmarks))
+        return 'few_hands', f"Hand visible in only {visible}/{len(frame_landmarks)} frames, keep it in view"
+    if stats['hand_size'] < MIN_HAND_SIZE:
+        return 'hand_too_small', "Hand too small in the frame, move closer to the camera"
+    if stats['jitter'] > MAX_JITTER:
+        return 'jittery', "Hand tracking was unstable, check the lighting and keep the hand steady"
+    return None
@@ -0,0 +1,34 @@
+"""
+Fast JSON responses for the hot API endpoints.
+Handlers build plain dicts and return them through the fastest installed
+serializer (orjson, then ujson, then the standard library), which skips
+FastAPI's per-request Pydantic validation of the output.
+"""
+from fastapi.responses import Response
+import json
+
+# Optional faster serializers
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+if orjson is not None:
+    def dumps(payload):
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+elif ujson is not None:
+    def dumps(payload):
+        return ujson.dumps(payload, ensure_ascii=False).encode()
+else:
+    def dumps(payload):
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def fast_json_response(payload, status_code=200, headers=None):
+    """Serialize a plain dict straight into a response"""
+    return Response(content=dumps(payload), status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,191 @@
+"""
+Pre-forking server for the sign recognition APIs.
+The parent process loads the heavy runtimes and the model weights once,
+binds the listening socket and then forks the uvicorn workers, so the
+TensorFlow, MediaPipe and OpenCV pages and the weights are shared instead
+of being duplicated per worker.
+
+No TensorFlow op runs in the parent: the weights are read with h5py into a
+shared mapping (see shared_weights.py), and each worker imports the app
+after the fork and builds its models from that mapping.
+
+Usage:
+    python serve.py main:app --workers 4 --port 8000
+    python serve.py translate_api:app --workers 2 --port 8001 --preload modules
+
+Preload levels:
+    app     - import TensorFlow, MediaPipe, OpenCV and NumPy and read the weights of
+              every .h5 model under --models into shared memory (default)
+    modules - only import the runtimes; every worker reads the model files itself
+    none    - plain multi-worker serving, every worker loads everything itself
+"""
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+import logging
+import uvicorn
+from server_config import BACKLOG, uvicorn_options
+from shared_weights import preload_weights
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("serve")
+
+# Modules whose import cost (and resident memory) we want to pay once in the parent
+PRELOAD_MODULES = ['numpy', 'cv2', 'mediapipe', 'tensorflow']
+
+# Directories searched for .h5 models to share with --preload app
+MODEL_DIRS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+              for name in ('models', 'translation_models')]
+
+# Minimum delay before respawning a worker that died, to avoid crash loops
+RESPAWN_DELAY = 1.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-forking server for the sign recognition APIs")
+    parser.add_argument('app', nargs='?', default=os.getenv("APP", "main:app"),
+                        help="ASGI app in module:attribute form")
+    parser.add_argument('--host', default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument('--workers', type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument('--preload', choices=['none', 'modules', 'app'], default=os.getenv("PRELOAD", "app"))
+    parser.add_argument('--models', nargs='+', default=MODEL_DIRS,
+                        help="Directories (searched recursively) or .h5 files whose weights are shared")
+    parser.add_argument('--log-level', default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+
+def find_models(paths):
+    """.h5 files given directly or found under the given directories"""
+    models = []
+    for path in paths:
+        if os.path.isfile(path):
+            models.append(path)
+            continue
+        for root, _, files in os.walk(path):
+            models.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.h5'))
+    return models
+
+
+def preload(level, model_paths=()):
+    """Import the runtimes and share the model weights in the parent, without running TensorFlow"""
+    if level == 'none':
+        return
+
+    started = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+
+    shared = 0
+    if level == 'app':
+        shared = preload_weights(find_models(model_paths))
+
+    logger.info(f"Preloaded ({level}) in {time.perf_counter() - started:.2f}s, "
+                f"weights of {shared} model(s) shared")
+
+
+def bind_socket(host, port):
+    """Create the listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, args):
+    """Serve requests on the inherited socket until uvicorn exits"""
+    # Drop the parent's handlers; uvicorn installs its own for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, log_level=args.log_level, **uvicorn_options())
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn_worker(app, sock, args):
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            run_worker(app, sock, args)
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} crashed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def main():
+    args = parse_args()
+    if not hasattr(os, 'fork'):
+        logger.error("serve.py requires a platform with os.fork(); use uvicorn --workers instead")
+        sys.exit(1)
+
+    preload(args.preload, args.models)
+    # The app itself is imported in each worker, after the fork, so that its
+    # models are built there (from the shared weights)
+    target = args.app
+
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    # Move everything loaded so far out of the collector's reach, so GC passes
+    # in the workers do not write to (and un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+
+    workers = set()
+    shutting_down = False
+
+    def handle_shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+
+    for _ in range(args.workers):
+        workers.add(spawn_worker(target, sock, args))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        workers.discard(pid)
+        if shutting_down:
+            continue
+
+        logger.warning(f"Worker {pid} exited with status {status}, respawning")
+        time.sleep(RESPAWN_DELAY)
+        workers.add(spawn_worker(target, sock, args))
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Uvicorn settings shared by serve.py and the API modules' __main__ blocks.
+The Node proxy keeps pooled keep-alive connections open to these services,
+so idle connections are held longer than its agent's idle timeout (a
+connection closed by the server while the proxy reuses it fails the
+request). HTTP/2 is terminated by the ingress in front of the proxy;
+uvicorn speaks HTTP/1.1 and uses the C parser and event loop when
+installed.
+"""
+import os
+
+# Seconds an idle keep-alive connection is held open; above the proxy's idle timeout
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "75"))
+# Largest request head h11 buffers (uvicorn's default of 16 KB is tight behind proxies adding headers)
+H11_MAX_INCOMPLETE_EVENT_SIZE = int(os.getenv("H11_MAX_INCOMPLETE_EVENT_SIZE", str(64 * 1024)))
+# Connections queued by the kernel before uvicorn accepts them
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+# Concurrent connections per worker before new ones get 503; unset for no limit
+LIMIT_CONCURRENCY = os.getenv("LIMIT_CONCURRENCY")
+# Proxies whose X-Forwarded-For / X-Session-ID headers are trusted, comma separated addresses or
+# CIDR ranges ("*" for any); rate limiting stays off until this is set (see admission.py)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1,::1")
+
+
+def _installed(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def uvicorn_options():
+    """Keyword arguments for uvicorn.run() / uvicorn.Config()"""
+    options = {
+        'timeout_keep_alive': KEEP_ALIVE_TIMEOUT,
+        'backlog': BACKLOG,
+        # admission.py reads the forwarded headers itself and needs the real peer address to trust them
+        'proxy_headers': False,
+        # httptools parses requests in C; h11 is the pure-Python fallback
+        'http': 'httptools' if _installed('httptools') else 'h11',
+        'loop': 'uvloop' if _installed('uvloop') else 'asyncio',
+    }
+    if options['http'] == 'h11':
+        options['h11_max_incomplete_event_size'] = H11_MAX_INCOMPLETE_EVENT_SIZE
+    if LIMIT_CONCURRENCY:
+        options['limit_concurrency'] = int(LIMIT_CONCURRENCY)
+    return options
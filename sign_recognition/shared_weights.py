@@ -0,0 +1,120 @@
+"""
+Keras model weights shared by the preforked serving workers.
+serve.py reads the weights of every saved model in the parent process with
+h5py, so no TensorFlow op runs before the fork, and packs them into one
+anonymous shared memory mapping that every forked worker inherits. In a
+worker, load_model() builds the architecture from the config saved in the
+.h5 file and assigns the weights from that mapping instead of parsing the
+file again. The mapping is never written after the fork, so its pages stay
+shared by all workers (respawned ones included).
+
+Keras copies assigned weights into variables each process owns, so every
+worker still holds one working copy of the weights it serves; the parsed
+weights themselves exist once. Models that were not preloaded, or whose
+file changed since, are loaded from disk as usual.
+"""
+import json
+import mmap
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Offsets in the mapping are kept aligned for vectorized reads
+ALIGNMENT = 64
+
+# Absolute model path -> (size and mtime of the file, model config JSON, {layer name: [weight arrays]})
+_shared = {}
+_mapping = None
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def read_h5_weights(path):
+    """(model config JSON, [(layer name, [weight arrays])]) of a full-model .h5 file, read without TensorFlow"""
+    import h5py
+
+    with h5py.File(path, 'r') as f:
+        if 'model_config' not in f.attrs or 'model_weights' not in f:
+            raise ValueError(f"{path} is not a full Keras model file")
+        config = _text(f.attrs['model_config'])
+        weights_group = f['model_weights']
+        layers = []
+        for layer_name in weights_group.attrs['layer_names']:
+            layer_name = _text(layer_name)
+            group = weights_group[layer_name]
+            weight_names = [_text(name) for name in group.attrs.get('weight_names', [])]
+            if weight_names:
+                layers.append((layer_name, [np.asarray(group[name]) for name in weight_names]))
+    return config, layers
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def preload_weights(paths):
+    """Read the weights of the given .h5 models into shared memory; call before forking
+
+    Returns the number of models preloaded. Files that cannot be read are
+    skipped (and load from disk in the workers).
+    """
+    global _mapping
+
+    models = []
+    for path in paths:
+        path = os.path.abspath(path)
+        try:
+            models.append((path, _file_state(path)) + read_h5_weights(path))
+        except Exception as e:
+            logger.warning(f"Not sharing the weights of {path}: {e}")
+    if not models:
+        return 0
+
+    # Lay every array out at an aligned offset of one anonymous shared mapping
+    layout = []
+    size = 0
+    for _, _, _, layers in models:
+        for _, arrays in layers:
+            for array in arrays:
+                size = -(-size // ALIGNMENT) * ALIGNMENT
+                layout.append((size, array))
+                size += array.nbytes
+    mapping = mmap.mmap(-1, max(size, 1), flags=mmap.MAP_SHARED)
+
+    views = []
+    for offset, array in layout:
+        view = np.frombuffer(mapping, dtype=array.dtype, count=array.size, offset=offset).reshape(array.shape)
+        view[...] = array
+        view.flags.writeable = False
+        views.append(view)
+
+    views = iter(views)
+    for path, state, config, layers in models:
+        _shared[path] = (state, config, {name: [next(views) for _ in arrays] for name, arrays in layers})
+    _mapping = mapping
+    logger.info(f"Shared the weights of {len(models)} model(s), {size / 1e6:.1f} MB")
+    return len(models)
+
+
+def load_model(path):
+    """Keras model at path, built from the preloaded shared weights when available"""
+    import tensorflow as tf
+
+    entry = _shared.get(os.path.abspath(path))
+    if entry is not None and os.path.exists(path) and _file_state(path) == entry[0]:
+        _, config, weights = entry
+        model = tf.keras.models.model_from_json(config)
+        for layer in model.layers:
+            if layer.weights:
+                layer.set_weights(weights[layer.name])
+        logger.info(f"Built {path} from the shared weights")
+        return model
+
+    if entry is not None:
+        logger.warning(f"{path} changed since its weights were shared, loading it from disk")
+    return tf.keras.models.load_model(path)
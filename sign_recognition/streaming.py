@@ -0,0 +1,423 @@
+"""
+Streaming ingestion for large frame payloads.
+FrameStreamParser pulls base64 frames out of a {"frames": [...], ...} JSON body
+as the bytes arrive, and StreamingLandmarkPipeline decodes and hand-tracks
+each frame while the rest of the upload is still in flight, so the full body
+is never buffered or parsed into a list of strings.
+
+BinaryFrameParser does the same for the compact binary body, where every
+encoded image is preceded by its length as a 4-byte big-endian integer, so
+proxies can forward frames without base64 or JSON.
+
+StreamingFrameDecoder only decodes, for services that hand tracking off to
+inference worker processes.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import struct
+from frame_decoder import get_decoder
+from keyframes import KeyframeSelector, interpolate_landmarks
+from vision import extract_hand_landmarks, reset_trackers
+
+WHITESPACE = b' \t\r\n'
+# Largest encoded frame accepted in a binary body
+MAX_BINARY_FRAME_BYTES = int(os.getenv("MAX_BINARY_FRAME_BYTES", str(8 * 1024 * 1024)))
+
+
+class FrameStreamParser:
+    """Incremental parser for request bodies shaped like {"frames": [...], ...}
+
+    feed() returns the frames (as ASCII bytes) completed by each chunk; the
+    other top-level fields end up in `fields` once they have been read.
+    """
+
+    def __init__(self, array_key="frames"):
+        self.array_key = array_key
+        self.fields = {}
+        self.frame_count = 0
+        self._buffer = bytearray()
+        self._pos = 0
+        self._state = 'start'
+        self._key = None
+        self._string_start = None  # Set while in the middle of reading a string
+        self._search_from = 0
+        self._value_start = None  # Set while capturing a non-frame field value
+        self._value_depth = 0
+
+    def _error(self, message):
+        raise ValueError(f"Malformed request body at byte {self._pos}: {message}")
+
+    def _skip_whitespace(self):
+        buffer = self._buffer
+        while self._pos < len(buffer) and buffer[self._pos] in WHITESPACE:
+            self._pos += 1
+        return self._pos < len(buffer)
+
+    def _read_string(self):
+        """Read the string starting at the current quote; None until it is complete"""
+        if self._string_start is None:
+            self._string_start = self._pos + 1
+            self._search_from = self._string_start
+
+        buffer = self._buffer
+        while True:
+            end = buffer.find(b'"', self._search_from)
+            if end < 0:
+                self._search_from = len(buffer)
+                return None
+
+            # A quote preceded by an odd number of backslashes is escaped
+            backslashes = 0
+            while buffer[end - 1 - backslashes] == 0x5C:
+                backslashes += 1
+            if backslashes % 2 == 0:
+                break
+            self._search_from = end + 1
+
+        raw = bytes(buffer[self._string_start:end])
+        self._string_start = None
+        self._pos = end + 1
+        if b'\\' in raw:
+            return json.loads(b'"' + raw + b'"').encode()
+        return raw
+
+    def _read_value(self):
+        """Capture a non-frame value up to the next top-level ',' or '}'; True when done"""
+        if self._value_start is None:
+            self._value_start = self._pos
+            self._value_depth = 0
+
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._string_start is not None or char == 0x22:  # '"'
+                if self._read_string() is None:
+                    return False
+                continue
+            if char in b'[{':
+                self._value_depth += 1
+            elif char in b']}':
+                if self._value_depth == 0:
+                    break
+                self._value_depth -= 1
+            elif char == 0x2C and self._value_depth == 0:  # ','
+                break
+            self._pos += 1
+        else:
+            return False
+
+        self.fields[self._key] = json.loads(bytes(self._buffer[self._value_start:self._pos]))
+        self._value_start = None
+        return True
+
+    def feed(self, chunk):
+        """Consume the next chunk of the body and return newly completed frames"""
+        self._buffer += chunk
+        frames = []
+
+        while self._state != 'done':
+            if self._string_start is None and self._value_start is None and not self._skip_whitespace():
+                break
+            char = self._buffer[self._pos] if self._pos < len(self._buffer) else None
+
+            if self._state == 'start':
+                if char != 0x7B:  # '{'
+                    self._error("expected a JSON object")
+                self._pos += 1
+                self._state = 'key'
+            elif self._state in ('key', 'next_key'):
+                if char == 0x7D and self._state == 'key':  # '}' (empty object)
+                    self._pos += 1
+                    self._state = 'done'
+                    continue
+                if self._string_start is None and char != 0x22:
+                    self._error("expected a field name")
+                key = self._read_string()
+                if key is None:
+                    break
+                self._key = key.decode()
+                self._state = 'colon'
+            elif self._state == 'colon':
+                if char != 0x3A:  # ':'
+                    self._error("expected ':'")
+                self._pos += 1
+                self._state = 'array_start' if self._key == self.array_key else 'value'
+            elif self._state == 'value':
+                if not self._read_value():
+                    break
+                self._state = 'after_value'
+            elif self._state == 'array_start':
+                if char != 0x5B:  # '['
+                    self._error(f"expected '{self.array_key}' to be an array")
+                self._pos += 1
+                self._state = 'array_item'
+            elif self._state == 'array_item':
+                if char == 0x5D and self._string_start is None:  # ']'
+                    self._pos += 1
+                    self._state = 'after_value'
+                    continue
+                if self._string_start is None and char != 0x22:
+                    self._error("expected a base64 string frame")
+                frame = self._read_string()
+                if frame is None:
+                    break
+                frames.append(frame)
+                self.frame_count += 1
+                self._state = 'array_separator'
+            elif self._state == 'array_separator':
+                self._pos += 1
+                if char == 0x2C:
+                    self._state = 'array_item'
+                elif char == 0x5D:
+                    self._state = 'after_value'
+                else:
+                    self._error("expected ',' or ']'")
+            elif self._state == 'after_value':
+                self._pos += 1
+                if char == 0x2C:
+                    self._state = 'next_key'
+                elif char == 0x7D:
+                    self._state = 'done'
+                else:
+                    self._error("expected ',' or '}'")
+
+        # Drop everything already consumed so only the partial tail is kept; an
+        # unfinished string starts at _pos, an unfinished field value at _value_start
+        consumed = self._pos if self._value_start is None else self._value_start
+        if consumed:
+            del self._buffer[:consumed]
+            self._pos -= consumed
+            self._search_from = max(0, self._search_from - consumed)
+            if self._string_start is not None:
+                self._string_start -= consumed
+            if self._value_start is not None:
+                self._value_start -= consumed
+
+        return frames
+
+    def close(self):
+        """Check that the whole body was received"""
+        if self._state != 'done':
+            raise ValueError("Incomplete request body")
+        if self._buffer[self._pos:].strip(WHITESPACE):
+            self._error("unexpected data after the JSON object")
+
+
+class BinaryFrameParser:
+    """Incremental parser for bodies of length-prefixed frames: (4-byte big-endian length, image bytes)*"""
+
+    def __init__(self, max_frame_bytes=MAX_BINARY_FRAME_BYTES):
+        self.max_frame_bytes = max_frame_bytes
+        self.frame_count = 0
+        self._buffer = bytearray()
+        self._received = 0
+
+    def feed(self, chunk):
+        """Consume the next chunk of the body and return newly completed frames (as bytes)"""
+        self._buffer += chunk
+        frames = []
+        pos = 0
+        while len(self._buffer) - pos >= 4:
+            (length,) = struct.unpack_from('>I', self._buffer, pos)
+            if length == 0 or length > self.max_frame_bytes:
+                raise ValueError(f"Malformed request body at byte {self._received + pos}: "
+                                 f"frame length {length} outside 1..{self.max_frame_bytes}")
+            if len(self._buffer) - pos - 4 < length:
+                break
+            frames.append(bytes(self._buffer[pos + 4:pos + 4 + length]))
+            pos += 4 + length
+            self.frame_count += 1
+
+        if pos:
+            del self._buffer[:pos]
+            self._received += pos
+        return frames
+
+    def close(self):
+        """Check that the whole body was received"""
+        if self._buffer:
+            raise ValueError(f"Incomplete request body: {len(self._buffer)} bytes of a partial frame")
+
+
+# Streamed requests hand-tracked at the same time; each one gets a tracker thread of its own
+STREAM_TRACKERS = int(os.getenv("STREAM_TRACKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class TrackerPool:
+    """Bounded set of single-thread trackers, each owning its MediaPipe graphs
+
+    vision.py keeps Hands instances per thread, so a pipeline that holds one
+    tracker for its whole request never shares a video-mode graph with
+    another capture, and a slow request only holds up itself. Requests
+    beyond the pool size wait for a tracker to come free.
+    """
+
+    def __init__(self, size=STREAM_TRACKERS):
+        self.size = max(1, size)
+        self._free = None  # Created on first use, on the serving event loop
+
+    async def acquire(self):
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for index in range(self.size):
+                self._free.put_nowait(ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"stream-tracker-{index}"))
+        tracker = await self._free.get()
+        # Queued ahead of the new capture's frames, after any left over from the previous one
+        tracker.submit(reset_trackers)
+        return tracker
+
+    def release(self, tracker):
+        self._free.put_nowait(tracker)
+
+
+_tracker_pool = None
+_tracker_pool_pid = None
+
+
+def get_tracker_pool():
+    # Threads do not survive a fork, so each process builds its own pool
+    global _tracker_pool, _tracker_pool_pid
+    if _tracker_pool is None or _tracker_pool_pid != os.getpid():
+        _tracker_pool = TrackerPool()
+        _tracker_pool_pid = os.getpid()
+    return _tracker_pool
+
+
+class StreamingLandmarkPipeline:
+    """Decodes frames in parallel and tracks hands in order as they are submitted
+
+    Must be created and fed on the event loop. Call finish() to get the
+    landmarks, or cancel() when the request is abandoned, so that the
+    pipeline's tracker goes back to the pool.
+    """
+
+    def __init__(self, extract_fn=extract_hand_landmarks, threshold=None, max_gap=None, stride=1, scale=None,
+                 tracker_pool=None):
+        self.decoder = get_decoder()
+        self.extract_fn = extract_fn
+        self.scale = scale  # Decode downscale, None for the decoder's default
+        self.selector = KeyframeSelector(threshold, max_gap)
+        self.stride = stride  # Only every stride-th received frame is decoded, to shed load
+        self.tracker_pool = tracker_pool or get_tracker_pool()
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self._keyframes = []
+        self._keyframe_landmarks = []
+        self._last_skipped = None  # Last decoded frame if it was not a keyframe
+        self._decodes = asyncio.Queue()  # Decode futures in submission order, None when done
+        self._feeder = None
+
+    def submit(self, base64_frame):
+        """Queue one frame; decoding starts immediately on the decoder pool"""
+        self.frames_received += 1
+        if (self.frames_received - 1) % self.stride:
+            return
+        self._queue(self.decoder.executor.submit(self.decoder.decode_base64, base64_frame, self.scale))
+
+    def submit_encoded(self, data):
+        """Queue one frame given as encoded image bytes (no base64)"""
+        self.frames_received += 1
+        if (self.frames_received - 1) % self.stride:
+            return
+        self._queue(self.decoder.executor.submit(self.decoder.decode_bytes, data, self.scale))
+
+    def _queue(self, decoded):
+        if self._feeder is None:
+            self._feeder = asyncio.ensure_future(self._feed())
+        self._decodes.put_nowait(decoded)
+
+    async def _feed(self):
+        # Frames go to the tracker in order, but only once decoded, so the
+        # tracker thread never waits on a decode
+        tracker = await self.tracker_pool.acquire()
+        try:
+            tracks = []
+            while True:
+                decoded = await self._decodes.get()
+                if decoded is None:
+                    break
+                frame = await asyncio.wrap_future(decoded)
+                if frame is not None:
+                    tracks.append(asyncio.wrap_future(tracker.submit(self._track, frame)))
+
+            await asyncio.gather(*tracks)
+            if self._last_skipped is not None:
+                await asyncio.wrap_future(tracker.submit(self._track_last))
+        finally:
+            self.tracker_pool.release(tracker)
+
+    def _track(self, frame):
+        # Runs on this pipeline's tracker thread, so frames are handled in submission order
+        index = self.frames_decoded
+        self.frames_decoded += 1
+        if self.selector.push(frame):
+            self._keyframes.append(index)
+            self._keyframe_landmarks.append(self.extract_fn(frame))
+            self._last_skipped = None
+        else:
+            self._last_skipped = (index, frame)
+
+    def _track_last(self):
+        # The final frame always anchors the interpolation, like select_keyframes()
+        index, frame = self._last_skipped
+        self._keyframes.append(index)
+        self._keyframe_landmarks.append(self.extract_fn(frame))
+
+    async def finish(self):
+        """Wait for outstanding frames; returns (per-frame landmarks, keyframe count)"""
+        if self._feeder is not None:
+            self._decodes.put_nowait(None)
+            await self._feeder
+
+        frame_landmarks = interpolate_landmarks(self._keyframes, self._keyframe_landmarks, self.frames_decoded)
+        return frame_landmarks, len(self._keyframes)
+
+    def cancel(self):
+        """Abandon the capture; frames already with the tracker finish in the background"""
+        if self._feeder is not None:
+            self._feeder.cancel()
+
+
+class StreamingFrameDecoder:
+    """Decodes frames in parallel as they are submitted, without tracking them
+
+    For services whose hand tracking runs in inference worker processes:
+    decoding still overlaps the upload, and finish() returns the decoded
+    frames in submission order for InferencePool.submit().
+    """
+
+    def __init__(self, stride=1, scale=None):
+        self.decoder = get_decoder()
+        self.scale = scale  # Decode downscale, None for the decoder's default
+        self.stride = stride  # Only every stride-th received frame is decoded, to shed load
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self._decodes = []
+
+    def submit(self, base64_frame):
+        """Queue one frame; decoding starts immediately on the decoder pool"""
+        self.frames_received += 1
+        if (self.frames_received - 1) % self.stride:
+            return
+        self._decodes.append(self.decoder.executor.submit(self.decoder.decode_base64, base64_frame, self.scale))
+
+    def submit_encoded(self, data):
+        """Queue one frame given as encoded image bytes (no base64)"""
+        self.frames_received += 1
+        if (self.frames_received - 1) % self.stride:
+            return
+        self._decodes.append(self.decoder.executor.submit(self.decoder.decode_bytes, data, self.scale))
+
+    async def finish(self):
+        """Wait for outstanding decodes; returns the frames that could be decoded"""
+        frames = await asyncio.gather(*(asyncio.wrap_future(decoded) for decoded in self._decodes))
+        decoded_frames = [frame for frame in frames if frame is not None]
+        self.frames_decoded = len(decoded_frames)
+        return decoded_frames
+
+    def cancel(self):
+        """Abandon the capture; decodes not yet started are dropped"""
+        for decoded in self._decodes:
+            decoded.cancel()
@@ -0,0 +1,38 @@
+"""
+Temporal convolution network (TCN), the non-recurrent alternative to the
+LSTM sign models. An LSTM steps through the frames of a sequence one after
+another, which leaves most of a CPU idle at batch size 1; the dilated
+convolutions here compute every frame of a layer at once. Select it for new
+models with MODEL_ARCHITECTURE=tcn; it reads and writes the same data and
+artifacts as the LSTM.
+"""
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import (Activation, Add, BatchNormalization, Conv1D, Dense, Dropout,
+                                     GlobalAveragePooling1D, Input)
+
+
+def build_tcn(input_shape, num_classes, filters=64, dilations=(1, 2, 4, 8)):
+    """Uncompiled temporal convolution network with the same inputs, outputs and head as the LSTM model
+
+    Residual blocks of dilated kernel-3 convolutions cover 1 + 2 * sum(dilations)
+    frames (31 with the defaults, the whole sequence), and every frame of a
+    block is computed at once instead of one timestep after another.
+    """
+    inputs = Input(shape=input_shape)
+    x = Conv1D(filters, 1)(inputs)  # Project the landmark features to the block width
+    for dilation in dilations:
+        block = Conv1D(filters, 3, padding='causal', dilation_rate=dilation)(x)
+        block = BatchNormalization()(block)
+        block = Activation('relu')(block)
+        block = Dropout(0.2)(block)
+        x = Add()([x, block])
+    x = GlobalAveragePooling1D()(x)
+
+    # Dense layers, as in the LSTM model (its penultimate layer is the prototype embedding)
+    x = Dense(64, activation='relu')(x)
+    x = BatchNormalization()(x)
+    x = Dropout(0.3)(x)
+    x = Dense(32, activation='relu')(x)
+    x = BatchNormalization()(x)
+    outputs = Dense(num_classes, activation='softmax')(x)
+    return Model(inputs=inputs, outputs=outputs)
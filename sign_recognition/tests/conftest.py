@@ -0,0 +1,8 @@
+"""
+The service modules import each other as top-level modules (they are run
+from sign_recognition/), so the tests put that directory on the path.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
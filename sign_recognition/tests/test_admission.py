@@ -0,0 +1,108 @@
+import types
+import pytest
+import admission
+from admission import LoadShedder, RateLimiter, TokenBucket, client_key, thin_frames
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+def fake_request(peer, headers=None):
+    return types.SimpleNamespace(client=types.SimpleNamespace(host=peer) if peer else None,
+                                 headers={key.lower(): value for key, value in (headers or {}).items()})
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == 0.0
+    clock.now += 100
+    assert [bucket.take() for _ in range(4)][-1] > 0  # Refill is capped at the burst
+
+
+def test_rate_limiter_keeps_clients_apart(clock):
+    limiter = RateLimiter(rate=1, burst=1, max_clients=10)
+    assert limiter.check('ip:a') == 0.0
+    assert limiter.check('ip:a') > 0
+    assert limiter.check('ip:b') == 0.0
+
+
+def test_rate_limiter_forgets_least_recently_seen_clients(clock):
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    limiter.check('ip:a')
+    limiter.check('ip:b')
+    limiter.check('ip:c')  # Evicts a
+    assert limiter.check('ip:a') == 0.0
+
+
+def test_rate_limiter_can_be_disabled():
+    limiter = RateLimiter(rate=0, burst=1)
+    assert all(limiter.check('ip:a') == 0.0 for _ in range(10))
+
+
+def test_forwarded_headers_are_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXIES', {'127.0.0.1'})
+    request = fake_request('203.0.113.5', {'X-Session-ID': 'forged', 'X-Forwarded-For': '10.0.0.1'})
+    assert client_key(request) == 'ip:203.0.113.5'
+
+
+def test_trusted_proxy_names_the_client(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXIES', {'127.0.0.1', '10.0.0.2'})
+    # Leftmost entries are whatever the browser sent; the nearest untrusted hop is the client
+    request = fake_request('127.0.0.1', {'X-Forwarded-For': '6.6.6.6, 198.51.100.7, 10.0.0.2'})
+    assert client_key(request) == 'ip:198.51.100.7'
+    request = fake_request('127.0.0.1', {'X-Session-ID': 'abc', 'X-Forwarded-For': '198.51.100.7'})
+    assert client_key(request) == 'session:abc'
+
+
+def test_trusted_proxies_can_be_cidr_ranges(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXIES', {'10.0.0.0/8'})
+    monkeypatch.setattr(admission, 'TRUSTED_NETWORKS', admission._networks({'10.0.0.0/8'}))
+    request = fake_request('10.20.30.40', {'X-Forwarded-For': '198.51.100.7, 10.1.2.3'})
+    assert client_key(request) == 'ip:198.51.100.7'
+    assert client_key(fake_request('198.51.100.7')) == 'ip:198.51.100.7'
+
+
+def test_trusted_proxy_without_client_is_not_keyed(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXIES', {'127.0.0.1'})
+    assert client_key(fake_request('127.0.0.1')) is None
+
+
+def test_load_shedder_levels():
+    shedder = LoadShedder(degrade_in_flight=2, max_in_flight=3, latency_target=1.0, smoothing=0.5)
+    assert shedder.level() == 'normal'
+    shedder.started()
+    shedder.started()
+    assert shedder.level() == 'degraded'
+    shedder.started()
+    assert shedder.level() == 'overloaded'
+    assert shedder.retry_after() >= 1
+    for _ in range(3):
+        shedder.finished(0.1)
+    assert shedder.level() == 'normal'
+    shedder.started()
+    shedder.finished(5.0)
+    assert shedder.level() == 'degraded'  # Slow recent requests
+
+
+def test_thin_frames_keeps_first_and_last():
+    frames = list(range(30))
+    thinned = thin_frames(frames, 12)
+    assert len(thinned) == 12
+    assert thinned[0] == 0 and thinned[-1] == 29
+    assert thinned == sorted(set(thinned))
+    assert thin_frames(frames[:5], 12) == frames[:5]
@@ -0,0 +1,55 @@
+import numpy as np
+from calibration import (apply_temperature, calibrate, expected_calibration_error, fit_temperature,
+                         load_calibration)
+from quality import capture_problem
+
+
+def overconfident_outputs(rng, count=2000, num_classes=4, accuracy=0.6):
+    """Softmax outputs that put 0.95 on their answer but are right only `accuracy` of the time"""
+    labels = rng.integers(num_classes, size=count)
+    answers = np.where(rng.random(count) < accuracy, labels, (labels + 1) % num_classes)
+    probabilities = np.full((count, num_classes), 0.05 / (num_classes - 1))
+    probabilities[np.arange(count), answers] = 0.95
+    return probabilities, labels
+
+
+def test_temperature_one_is_the_identity():
+    probabilities = np.array([[0.7, 0.2, 0.1]])
+    np.testing.assert_allclose(apply_temperature(probabilities, 1.0), probabilities, rtol=1e-6)
+
+
+def test_overconfident_models_get_softened():
+    probabilities, labels = overconfident_outputs(np.random.default_rng(0))
+    temperature = fit_temperature(probabilities, labels)
+    assert temperature > 1
+    calibrated = apply_temperature(probabilities, temperature)
+    assert calibrated.max(axis=1).mean() < 0.7
+    assert expected_calibration_error(calibrated, labels) < expected_calibration_error(probabilities, labels)
+    # Scaling never changes the answer
+    np.testing.assert_array_equal(calibrated.argmax(axis=1), probabilities.argmax(axis=1))
+
+
+def test_calibration_is_saved_next_to_the_model(tmp_path):
+    model_path = str(tmp_path / 'model.h5')
+    assert load_calibration(model_path) is None
+    probabilities, labels = overconfident_outputs(np.random.default_rng(1), count=200)
+    report = calibrate(model_path, probabilities, labels, version='abc')
+    saved = load_calibration(model_path)
+    assert saved['temperature'] == report['temperature']
+    assert saved['fitted_on'] == 'abc'
+    assert saved['samples'] == 200
+
+
+def hand(size=0.2, offset=0.0):
+    landmarks = np.zeros((21, 3), dtype=np.float32)
+    landmarks[:, 0] = np.linspace(0, size, 21) + offset
+    return landmarks
+
+
+def test_quality_gate_rejects_missing_small_and_jittery_hands():
+    assert capture_problem([hand()] * 30) is None
+    assert capture_problem([hand()] * 5 + [None] * 25)[0] == 'few_hands'
+    assert capture_problem([hand(size=0.01)] * 30)[0] == 'hand_too_small'
+    rng = np.random.default_rng(0)
+    shaking = [hand() + rng.normal(scale=0.2, size=(21, 3)).astype(np.float32) for _ in range(30)]
+    assert capture_problem(shaking)[0] == 'jittery'
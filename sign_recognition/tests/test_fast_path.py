@@ -0,0 +1,48 @@
+import numpy as np
+from fast_path import FastPathRouter, FrameIndex
+
+
+class StubBackbone:
+    num_hands = 1
+    model = None
+    model_path = 'stub'
+    classes = ['a', 'b', 'c']
+    version = 'stub'
+
+
+def captures(rng, hand, count, noise=0.01):
+    return [[hand + rng.normal(size=(21, 3)) * noise for _ in range(30)] for _ in range(count)]
+
+
+def router(tmp_path):
+    rng = np.random.default_rng(0)
+    hands = {sign: rng.normal(size=(21, 3)) for sign in 'abc'}
+    index = FrameIndex.build({sign: captures(rng, hand, 10) for sign, hand in hands.items()})
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    return FastPathRouter(index_path=path, backbone=StubBackbone()), hands, rng
+
+
+def test_threshold_is_fitted_and_saved(tmp_path):
+    fast_path, _, _ = router(tmp_path)
+    assert fast_path.index.distance_threshold is not None
+    assert fast_path.index.distance_threshold > 0
+
+
+def test_known_static_sign_is_answered(tmp_path):
+    fast_path, hands, rng = router(tmp_path)
+    assert fast_path.classify_fast(captures(rng, hands['b'], 1)[0]) == ('b', 1.0)
+
+
+def test_unfamiliar_handshape_is_escalated(tmp_path):
+    fast_path, _, rng = router(tmp_path)
+    # Held still, so every frame votes for the same nearest sign, but far from all of them
+    assert fast_path.classify_fast(captures(rng, rng.normal(size=(21, 3)), 1, noise=0)[0]) is None
+
+
+def test_single_sequence_signs_build_without_threshold():
+    rng = np.random.default_rng(1)
+    index = FrameIndex.build({'a': captures(rng, rng.normal(size=(21, 3)), 1)})
+    assert index.distance_threshold is None
+    shares, distances = index.search(index.frames[:2])
+    assert shares[0] == 1.0 and distances.max() < 1e-2
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from frame_buffers import FrameBufferPool
+from frame_decoder import FrameDecoder
+
+
+@pytest.fixture
+def pool():
+    pool = FrameBufferPool(num_slots=2, max_height=48, max_width=64)
+    yield pool
+    pool.close()
+
+
+def test_slots_are_handed_out_once_until_released(pool):
+    slots = {pool.acquire(), pool.acquire()}
+    assert slots == {0, 1}
+    assert pool.acquire() is None
+    pool.release([1])
+    assert pool.acquire() == 1
+
+
+def test_write_rgb_converts_in_place(pool):
+    bgr = np.zeros((24, 32, 3), dtype=np.uint8)
+    bgr[..., 0] = 255  # Blue
+    slot = pool.acquire()
+    shape = pool.write_rgb(slot, bgr)
+    assert shape == (24, 32, 3)
+    assert (pool.view(slot, shape)[..., 2] == 255).all()
+    assert (pool.view(slot, shape)[..., 0] == 0).all()
+
+
+def test_large_frames_are_downscaled_to_fit(pool):
+    shape = pool.write_rgb(pool.acquire(), np.zeros((480, 640, 3), dtype=np.uint8))
+    assert shape == (48, 64, 3)
+    assert not pool.fits((480, 640, 3))
+
+
+def test_attached_pool_sees_the_same_pixels(pool):
+    slot = pool.acquire()
+    shape = pool.write_rgb(slot, np.full((4, 4, 3), 7, dtype=np.uint8))
+    attached = FrameBufferPool.attach(pool.spec)
+    try:
+        assert (attached.view(slot, shape) == 7).all()
+    finally:
+        attached.close()
+
+
+class IntoBackend:
+    """Stands in for the TurboJPEG backend: 'decodes' a 2x3 frame into the given buffer"""
+    name = 'stub'
+
+    def decode_into(self, data, allocate, scale=1):
+        target = allocate((2, 3, 3))
+        if target is None:
+            return None
+        target[...] = 5
+        return target
+
+
+def test_decode_into_fills_the_slot(pool):
+    decoder = FrameDecoder(backend='opencv', threads=1)
+    assert decoder.decode_base64_into('AAAA', lambda shape: None) is None  # OpenCV cannot decode into buffers
+
+    decoder.backend = IntoBackend()
+    slot = pool.acquire()
+    image = decoder.decode_base64_into('AAAA', lambda shape: pool.view(slot, shape))
+    assert image.shape == (2, 3, 3)
+    assert (pool.view(slot, (2, 3, 3)) == 5).all()
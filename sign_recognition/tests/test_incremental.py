@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+# incremental.py builds Keras layers
+tf = pytest.importorskip("tensorflow")
+from incremental import grow_output_layer, load_training_manifest, replay_sample, save_training_manifest
+
+
+def small_model(num_classes):
+    inputs = tf.keras.Input(shape=(4,))
+    hidden = tf.keras.layers.Dense(8, activation='relu')(inputs)
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax')(hidden)
+    return tf.keras.Model(inputs, outputs)
+
+
+def test_grow_output_layer_keeps_the_known_classes():
+    model = small_model(3)
+    kernel, bias = model.layers[-1].get_weights()
+    grown = grow_output_layer(model, 5)
+    assert grown.output_shape[-1] == 5
+    grown_kernel, grown_bias = grown.layers[-1].get_weights()
+    np.testing.assert_array_equal(grown_kernel[:, :3], kernel)
+    np.testing.assert_array_equal(grown_bias[:3], bias)
+    # The hidden layers are shared, not copied
+    assert grown.layers[-2] is model.layers[-2]
+
+
+def test_grow_output_layer_leaves_wide_enough_models_alone():
+    model = small_model(3)
+    assert grow_output_layer(model, 3) is model
+
+
+def test_replay_sample_is_class_balanced():
+    old = [(0, f"a{i}") for i in range(10)] + [(1, "b0")]
+    sample = replay_sample(old, 2, 4, np.random.default_rng(0))
+    assert sum(class_idx == 0 for class_idx, _ in sample) == 4
+    assert (1, "b0") in sample
+
+
+def test_manifest_round_trip(tmp_path):
+    model_path = str(tmp_path / 'model.h5')
+    assert load_training_manifest(model_path) is None
+    save_training_manifest(model_path, ['a', 'b'], {'a/seq_0': 'd0'})
+    assert load_training_manifest(model_path) == {'classes': ['a', 'b'], 'sequences': {'a/seq_0': 'd0'}}
@@ -0,0 +1,39 @@
+import numpy as np
+import metrics
+from keyframes import interpolate_landmarks, record_keyframe_metrics, select_keyframes
+from tiers import TIERS
+
+
+def still_then_moving(num_still=10, num_moving=5):
+    frames = [np.full((48, 64, 3), 100, dtype=np.uint8) for _ in range(num_still)]
+    frames += [np.full((48, 64, 3), 100 + 30 * (i + 1), dtype=np.uint8) for i in range(num_moving)]
+    return frames
+
+
+def test_still_frames_are_skipped_until_the_max_gap():
+    keyframes = select_keyframes(still_then_moving(10, 0), threshold=4.0, max_gap=4)
+    assert keyframes == [0, 4, 8, 9]
+
+
+def test_motion_makes_keyframes_and_the_last_frame_is_always_one():
+    keyframes = select_keyframes(still_then_moving(), threshold=4.0, max_gap=100)
+    assert keyframes == [0, 10, 11, 12, 13, 14]
+
+
+def test_zero_threshold_tracks_every_frame():
+    assert select_keyframes(still_then_moving(3, 0), threshold=0.0) == [0, 1, 2]
+
+
+def test_interpolation_between_keyframes():
+    filled = interpolate_landmarks([0, 4], [[[0.0, 0.0, 0.0]], [[4.0, 0.0, 0.0]]], 5)
+    assert [frame[0][0] for frame in filled] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_interpolation_reuses_the_nearer_keyframe_when_a_hand_is_missing():
+    hand = [[1.0, 1.0, 1.0]]
+    assert interpolate_landmarks([0, 4], [hand, None], 5) == [hand, hand, hand, None, None]
+
+
+def test_metrics_report_the_tiers_threshold():
+    record_keyframe_metrics("test_endpoint", 30, 3, TIERS['fast'])
+    assert 'sign_keyframe_threshold{endpoint="test_endpoint",tier="fast"} 8.0' in metrics.render()
@@ -0,0 +1,56 @@
+import numpy as np
+from landmark_classifier import classify_landmarks
+from prediction_cache import MemoryBackend, PredictionCache
+
+LABELS = ['hello', 'thanks', 'yes']
+
+
+class FakeModel:
+    def __init__(self, outputs):
+        self.outputs = np.asarray(outputs, dtype=np.float32)
+        self.calls = 0
+
+    def predict(self, batch, verbose=0):
+        self.calls += 1
+        return self.outputs[None]
+
+
+def hand():
+    landmarks = np.zeros((21, 3), dtype=np.float32)
+    landmarks[:, 0] = np.linspace(0, 0.2, 21)
+    return landmarks
+
+
+def classify(model, frames=None, temperature=1.0, cache=None):
+    frames = [hand()] * 30 if frames is None else frames
+    return classify_landmarks(frames, model, LABELS, lambda frames: np.asarray(frames).reshape(len(frames), -1),
+                              'v1', temperature, cache)
+
+
+def test_confident_answers_are_labelled():
+    result = classify(FakeModel([0.1, 0.8, 0.1]))
+    assert result.sign == 'thanks'
+    assert result.confidence == np.float32(0.8)
+    assert result.rejection is None and not result.cache_hit
+
+
+def test_low_confidence_is_uncertain_after_the_temperature():
+    assert classify(FakeModel([0.5, 0.3, 0.2])).sign == 'hello'
+    assert classify(FakeModel([0.5, 0.3, 0.2]), temperature=10.0).sign == 'uncertain'
+
+
+def test_captures_without_usable_hands_never_reach_the_model():
+    model = FakeModel([1.0, 0.0, 0.0])
+    assert classify(model, frames=[None] * 30).sign == 'unknown'
+    rejected = classify(model, frames=[hand()] * 3 + [None] * 27)
+    assert rejected.sign == 'uncertain' and rejected.rejection
+    assert model.calls == 0
+
+
+def test_repeat_captures_are_answered_from_the_cache():
+    model = FakeModel([0.1, 0.1, 0.8])
+    cache = PredictionCache(MemoryBackend())
+    assert not classify(model, cache=cache).cache_hit
+    second = classify(model, cache=cache)
+    assert second.cache_hit and second.sign == 'yes'
+    assert model.calls == 1
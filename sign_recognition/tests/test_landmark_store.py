@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pytest
+import landmark_store
+from landmark_store import LandmarkDataset, decode_chunk, encode_chunk, iter_keyed_sequences, iter_sequences
+
+
+def sequence(num_frames=30, num_hands=1, seed=0, missing=()):
+    landmarks = np.random.default_rng(seed).uniform(0, 1, size=(num_frames, 21 * num_hands, 3)).astype(np.float32)
+    landmarks[list(missing)] = np.nan
+    return landmarks
+
+
+def test_chunk_round_trip_is_lossless_for_float32():
+    landmarks = sequence(50)
+    presence = np.ones(50, dtype=bool)
+    presence[[3, 4]] = False
+    decoded, mask = decode_chunk(encode_chunk(landmarks, presence), 'float32', (21, 3))
+    np.testing.assert_array_equal(decoded, landmarks)
+    np.testing.assert_array_equal(mask, presence)
+
+
+def test_dataset_round_trip_keeps_missing_frames_and_metadata(tmp_path):
+    path = str(tmp_path / 'dataset')
+    first, second = sequence(30, seed=1, missing=[0, 7]), sequence(12, seed=2)
+    with LandmarkDataset(path, create=True) as dataset:
+        dataset.append(first, 'a', source='webcam', fps=25.0)
+        dataset.append(second, 'b')
+
+    dataset = LandmarkDataset(path)
+    assert len(dataset) == 2
+    assert dataset.classes == ['a', 'b']
+    assert dataset.records[0]['fps'] == 25.0
+
+    landmarks, presence = dataset.read(0)
+    assert landmarks.shape == (30, 21, 3)
+    assert not presence[0] and not presence[7] and presence[1:7].all()
+    assert np.isnan(landmarks[[0, 7]]).all()
+    # Stored as float16
+    np.testing.assert_allclose(landmarks[presence], first[presence], atol=1e-3)
+    np.testing.assert_allclose(dataset[1], second, atol=1e-3)
+
+
+def test_sequences_are_visible_only_after_flush(tmp_path):
+    path = str(tmp_path / 'dataset')
+    dataset = LandmarkDataset(path, create=True)
+    dataset.append(sequence(), 'a')
+    assert len(LandmarkDataset(path)) == 0
+    dataset.flush()
+    assert len(LandmarkDataset(path)) == 1
+
+
+def test_full_chunks_are_written_while_appending(tmp_path, monkeypatch):
+    monkeypatch.setattr(landmark_store, 'CHUNK_FRAMES', 60)
+    path = str(tmp_path / 'dataset')
+    dataset = LandmarkDataset(path, create=True)
+    for seed in range(3):
+        dataset.append(sequence(seed=seed), 'a')
+    assert [record['chunk'] for record in LandmarkDataset(path).records] == [0, 0]
+    dataset.close()
+    assert [record['chunk'] for record in LandmarkDataset(path).records] == [0, 0, 1]
+
+
+def test_append_accepts_flat_frames(tmp_path):
+    dataset = LandmarkDataset(str(tmp_path / 'dataset'), create=True)
+    dataset.append(sequence().reshape(30, 63), 'a')
+    dataset.close()
+    assert dataset.read(0)[0].shape == (30, 21, 3)
+
+
+def test_append_rejects_frames_of_another_shape(tmp_path):
+    dataset = LandmarkDataset(str(tmp_path / 'dataset'), create=True, frame_shape=(21, 3))
+    with pytest.raises(ValueError):
+        dataset.append(sequence(num_hands=2), 'a')
+    dataset.close()
+    assert len(dataset) == 0
+
+
+def test_missing_dataset_is_not_created_implicitly(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        LandmarkDataset(str(tmp_path / 'missing'))
+
+
+def test_iter_sequences_reads_datasets_and_npy_trees(tmp_path):
+    dataset_path = str(tmp_path / 'dataset')
+    with LandmarkDataset(dataset_path, create=True) as dataset:
+        dataset.append(sequence(seed=1), 'a')
+        dataset.append(sequence(seed=2), 'b')
+    assert len(list(iter_sequences(dataset_path, 'a'))) == 1
+
+    tree = tmp_path / 'tree'
+    os.makedirs(tree / 'a')
+    np.save(tree / 'a' / 'seq_0.npy', sequence(seed=3))
+    keyed = list(iter_keyed_sequences(str(tree), 'a'))
+    assert [key for key, _, _ in keyed] == ['a/seq_0.npy']
+    np.testing.assert_array_equal(keyed[0][2], sequence(seed=3))
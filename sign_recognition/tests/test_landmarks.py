@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from landmarks import drop_frames, impute_missing, resample_sequence
+
+
+def test_resample_keeps_the_endpoints_and_interpolates_between():
+    sequence = np.arange(5, dtype=np.float32).reshape(5, 1, 1) * np.ones((5, 21, 3), dtype=np.float32)
+    resampled = resample_sequence(sequence, 9)
+    assert resampled.shape == (9, 21, 3)
+    np.testing.assert_allclose(resampled[:, 0, 0], np.linspace(0, 4, 9))
+
+
+def test_resample_downsamples_and_repeats_single_frames():
+    sequence = np.random.default_rng(0).uniform(size=(60, 21, 3)).astype(np.float32)
+    resampled = resample_sequence(sequence, 30)
+    assert resampled.shape == (30, 21, 3)
+    np.testing.assert_array_equal(resampled[0], sequence[0])
+    np.testing.assert_array_equal(resampled[-1], sequence[-1])
+    assert (resample_sequence(sequence[:1], 30) == sequence[0]).all()
+
+
+def test_resample_rejects_empty_sequences():
+    with pytest.raises(ValueError):
+        resample_sequence([], 30)
+
+
+def test_impute_interpolates_interior_gaps_and_repeats_at_the_ends():
+    frames = [None, np.zeros((21, 3)), None, np.full((21, 3), 2.0), None]
+    sequence, presence = impute_missing(frames, fill='interpolate')
+    np.testing.assert_array_equal(presence, [0, 1, 0, 1, 0])
+    np.testing.assert_allclose(sequence[:, 0, 0], [0, 0, 1, 2, 2])
+    sequence, _ = impute_missing(frames, fill='zero')
+    assert not sequence[2].any()
+    assert impute_missing([None, None]) == (None, None)
+
+
+def test_drop_frames_keeps_a_tracked_frame_in_sparse_sequences():
+    sequence = np.full((30, 21, 3), np.nan, dtype=np.float32)
+    sequence[[3, 17]] = 0.5
+    for seed in range(200):
+        frames = drop_frames(sequence, 0.9, np.random.default_rng(seed))
+        assert len(frames) == 30
+        assert any(frame is not None for frame in frames)
+
+
+def test_drop_frames_marks_nan_frames_as_missing():
+    sequence = np.full((5, 21, 3), 0.5, dtype=np.float32)
+    sequence[2] = np.nan
+    frames = drop_frames(sequence, 0.0, np.random.default_rng(0))
+    assert frames[2] is None
+    assert all(frame is not None for i, frame in enumerate(frames) if i != 2)
+
+
+def test_drop_frames_without_any_hand_returns_all_missing():
+    frames = drop_frames(np.full((4, 21, 3), np.nan), 0.5, np.random.default_rng(0))
+    assert frames == [None] * 4
+
+
+def test_wrist_velocity_is_zero_where_a_hand_appears_or_disappears():
+    from landmarks import GEOMETRIC_FEATURES, geometric_features
+    rng = np.random.default_rng(0)
+    hands = rng.uniform(0.2, 0.8, size=(6, 2, 21, 3)).astype(np.float32)
+    hands[:, 1] = hands[:, 0] + 0.01 * np.arange(6)[:, None, None]  # Second hand drifts steadily
+    hands[[2, 4], 1] = 0  # ...and drops out twice
+    features = geometric_features(hands.reshape(6, 42, 3)).reshape(6, 2, GEOMETRIC_FEATURES)
+    velocity = features[:, 1, -3:]
+    assert not velocity[[2, 3, 4, 5]].any()
+    assert velocity[1].any()
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+import prediction_cache
+from prediction_cache import MemoryBackend, PredictionCache, RedisBackend, cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis client: get/set(ex=) with expiry"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.set_calls = []
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.set_calls.append((key, ex))
+        # Real redis stores bytes
+        self.data[key] = (value.encode() if isinstance(value, str) else value,
+                          self.clock() + ex if ex is not None else None)
+        return True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    return clock
+
+
+def sample_sequence(seed=0):
+    return np.random.default_rng(seed).uniform(-1, 1, size=(30, 63)).astype(np.float32)
+
+
+def test_cache_key_is_stable_across_calls_and_dtypes():
+    sequence = sample_sequence()
+    assert cache_key(sequence, "v1") == cache_key(sequence.astype(np.float64), "v1")
+    assert cache_key(sequence, "v1") == cache_key(sequence.tolist(), "v1")
+
+
+def test_cache_key_pinned_format():
+    # Keys are shared through Redis between processes and releases; changing them invalidates every entry
+    assert cache_key(np.zeros((2, 3), dtype=np.float32), "v1") == "sign:v1:3fa89ec7d79149f7de643924a53dd210"
+    ramp = np.arange(6, dtype=np.float32).reshape(2, 3) / 8
+    assert cache_key(ramp, "v1", quant=64) == "sign:v1:019f8e0667f485a0f8445bcdfc10768e"
+
+
+def test_cache_key_absorbs_jitter_below_quantization():
+    sequence = np.full((30, 63), 0.25, dtype=np.float32)
+    jittered = sequence + 1.0 / (4 * prediction_cache.PREDICTION_CACHE_QUANT)
+    assert cache_key(sequence, "v1") == cache_key(jittered, "v1")
+
+
+def test_cache_key_separates_versions_values_and_shapes():
+    sequence = sample_sequence()
+    assert cache_key(sequence, "v1") != cache_key(sequence, "v2")
+    assert cache_key(sequence, "v1") != cache_key(sample_sequence(1), "v1")
+    flat = np.zeros(60, dtype=np.float32)
+    assert cache_key(flat.reshape(30, 2), "v1") != cache_key(flat.reshape(20, 3), "v1")
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemoryBackend(max_entries=2, ttl=60)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1  # "b" is now the least recently used
+    backend.set("c", 3)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+
+
+def test_memory_backend_expires_entries(clock):
+    backend = MemoryBackend(max_entries=10, ttl=5)
+    backend.set("a", [0.1, 0.9])
+    clock.now += 4.9
+    assert backend.get("a") == [0.1, 0.9]
+    clock.now += 0.2
+    assert backend.get("a") is None
+
+
+def test_redis_backend_round_trip_and_ttl():
+    clock = FakeClock()
+    client = FakeRedis(clock)
+    backend = RedisBackend(client, ttl=30)
+
+    backend.set("k", {"sign": "a", "scores": [0.25, 0.75]})
+    assert backend.get("k") == {"sign": "a", "scores": [0.25, 0.75]}
+    assert client.set_calls == [("k", 30)]
+
+    clock.now += 30
+    assert backend.get("k") is None
+    assert backend.get("missing") is None
+
+
+def test_redis_backend_ttl_is_at_least_one_second():
+    client = FakeRedis(FakeClock())
+    RedisBackend(client, ttl=0.2).set("k", 1)
+    assert client.set_calls == [("k", 1)]
+
+
+def test_prediction_cache_scopes_entries_by_model_version():
+    cache = PredictionCache(RedisBackend(FakeRedis(FakeClock()), ttl=60))
+    sequence = sample_sequence()
+    cache.set(sequence, "v1", [0.2, 0.8])
+    assert cache.get(sequence, "v1") == [0.2, 0.8]
+    assert cache.get(sequence, "v2") is None
+
+
+def test_prediction_cache_survives_backend_failures():
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("redis down")
+
+        def set(self, key, value):
+            raise ConnectionError("redis down")
+
+    cache = PredictionCache(Broken())
+    cache.set(sample_sequence(), "v1", [1.0])
+    assert cache.get(sample_sequence(), "v1") is None
@@ -0,0 +1,21 @@
+import numpy as np
+import shared_weights
+
+
+def test_preloaded_weights_are_read_only_aligned_copies(tmp_path, monkeypatch):
+    path = tmp_path / 'model.h5'
+    path.write_bytes(b'weights')
+    kernel = np.arange(6, dtype=np.float32).reshape(2, 3)
+    bias = np.ones(3, dtype=np.float32)
+    monkeypatch.setattr(shared_weights, 'read_h5_weights', lambda p: ('{}', [('dense', [kernel, bias])]))
+    monkeypatch.setattr(shared_weights, '_shared', {})
+
+    assert shared_weights.preload_weights([str(path), str(tmp_path / 'missing.h5')]) == 1
+
+    state, config, weights = shared_weights._shared[str(path)]
+    assert state == shared_weights._file_state(str(path))
+    shared_kernel, shared_bias = weights['dense']
+    np.testing.assert_array_equal(shared_kernel, kernel)
+    np.testing.assert_array_equal(shared_bias, bias)
+    assert not shared_kernel.flags.writeable
+    assert shared_bias.ctypes.data % shared_weights.ALIGNMENT == 0
@@ -0,0 +1,66 @@
+import base64
+import json
+import struct
+import pytest
+
+# streaming.py pulls in the MediaPipe based tracker
+pytest.importorskip("mediapipe")
+from streaming import BinaryFrameParser, FrameStreamParser
+
+
+def feed_in_chunks(parser, body, size):
+    frames = []
+    for start in range(0, len(body), size):
+        frames.extend(parser.feed(body[start:start + size]))
+    parser.close()
+    return frames
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 100000])
+def test_frame_stream_parser_handles_any_chunking(chunk_size):
+    frames = [base64.b64encode(bytes([i]) * (10 + i)).decode() for i in range(5)]
+    body = json.dumps({"expectedSign": "a", "frames": frames, "meta": {"nested": [1, "]"]}}).encode()
+    parser = FrameStreamParser()
+    parsed = feed_in_chunks(parser, body, chunk_size)
+    assert [bytes(frame).decode() for frame in parsed] == frames
+    assert parser.fields == {"expectedSign": "a", "meta": {"nested": [1, "]"]}}
+    assert parser.frame_count == 5
+
+
+def test_frame_stream_parser_reads_fields_after_frames():
+    parser = FrameStreamParser()
+    feed_in_chunks(parser, b'{"frames": ["QUJD"], "expectedSign": "b"}', 5)
+    assert parser.fields["expectedSign"] == "b"
+
+
+@pytest.mark.parametrize("body", [b'{"frames": ["QUJD"', b'[1, 2]', b'{"frames": ["QUJD"]} trailing'])
+def test_frame_stream_parser_rejects_malformed_bodies(body):
+    parser = FrameStreamParser()
+    with pytest.raises(ValueError):
+        feed_in_chunks(parser, body, 4)
+
+
+def binary_body(frames):
+    return b''.join(struct.pack('>I', len(frame)) + frame for frame in frames)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1000])
+def test_binary_frame_parser_handles_any_chunking(chunk_size):
+    frames = [b'\xff\xd8jpeg', b'x', b'\x00' * 300]
+    parser = BinaryFrameParser()
+    assert feed_in_chunks(parser, binary_body(frames), chunk_size) == frames
+    assert parser.frame_count == 3
+
+
+def test_binary_frame_parser_rejects_bad_lengths():
+    with pytest.raises(ValueError):
+        BinaryFrameParser().feed(struct.pack('>I', 0))
+    with pytest.raises(ValueError):
+        BinaryFrameParser(max_frame_bytes=10).feed(struct.pack('>I', 11) + b'x' * 11)
+
+
+def test_binary_frame_parser_rejects_truncated_bodies():
+    parser = BinaryFrameParser()
+    parser.feed(binary_body([b'abcdef'])[:-2])
+    with pytest.raises(ValueError):
+        parser.close()
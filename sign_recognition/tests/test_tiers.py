@@ -0,0 +1,45 @@
+import types
+import pytest
+from fastapi import HTTPException
+from tiers import TIERS, TIER_ORDER, resolve_tier, variant_predictors
+
+
+def fake_request(header=None, query=None):
+    return types.SimpleNamespace(
+        headers={'x-quality-tier': header} if header else {},
+        query_params={'tier': query} if query else {},
+        url=types.SimpleNamespace(path='/api/test'),
+        state=types.SimpleNamespace(),
+    )
+
+
+def test_header_wins_over_query_and_default():
+    assert resolve_tier(fake_request('Fast', 'accurate'), 'balanced').name == 'fast'
+    assert resolve_tier(fake_request(query='accurate'), 'balanced').name == 'accurate'
+    request = fake_request()
+    assert resolve_tier(request, 'balanced').name == 'balanced'
+    assert request.state.quality_tier == 'balanced'
+
+
+def test_overload_drops_one_tier_but_not_below_fast():
+    assert resolve_tier(fake_request('accurate'), degraded=True).name == 'balanced'
+    assert resolve_tier(fake_request('fast'), degraded=True).name == 'fast'
+
+
+def test_unknown_tiers_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        resolve_tier(fake_request('turbo'))
+    assert error.value.status_code == 400
+
+
+def test_tiers_are_ordered_from_cheapest():
+    assert TIER_ORDER == ['fast', 'balanced', 'accurate']
+    assert TIERS['accurate'].keyframe_threshold == 0.0  # Tracks every frame
+    assert TIERS['fast'].decode_scale >= 2
+    assert TIERS['fast'].model_variant == 'student'
+
+
+def test_other_predictors_serve_every_variant():
+    pytest.importorskip("tensorflow")
+    predictor = object()
+    assert variant_predictors(predictor) == {'full': predictor, 'student': predictor}
@@ -0,0 +1,82 @@
+"""
+Request-level quality tiers for the recognition APIs.
+Quiz grading wants the most accurate answer while live translation previews
+want the quickest one, so a request picks a tier with the X-Quality-Tier
+header (or ?tier=): 'fast', 'balanced' or 'accurate'. A tier sets the
+decode downscale, how aggressively frames are skipped between keyframes,
+the MediaPipe model complexity and the model variant. 'balanced' is the
+configured default behaviour; when the service is overloaded (see
+admission.py) requests drop one tier. The tier is reported in the
+response and in the metrics.
+"""
+from fastapi import HTTPException, Request
+from collections import namedtuple
+import os
+import logging
+from frame_decoder import DECODE_SCALE
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+Tier = namedtuple('Tier', [
+    'name',
+    'decode_scale',  # Downscale factor applied while decoding (1, 2, 4 or 8)
+    'keyframe_threshold',  # None for the KEYFRAME_THRESHOLD default, 0 tracks every frame
+    'keyframe_max_gap',  # None for the KEYFRAME_MAX_GAP default
+    'model_variant',  # 'full', or 'student' for the distilled model where one exists
+    'model_complexity',  # MediaPipe Hands model: 0 (lite) or 1 (full)
+])
+
+TIERS = {
+    'fast': Tier('fast', max(DECODE_SCALE, 2), 8.0, 12, 'student', 0),
+    'balanced': Tier('balanced', DECODE_SCALE, None, None, 'full', 1),
+    'accurate': Tier('accurate', 1, 0.0, 1, 'full', 1),
+}
+# Cheapest first; overload moves a request one step to the left
+TIER_ORDER = ['fast', 'balanced', 'accurate']
+
+
+def resolve_tier(request: Request, default='balanced', degraded=False):
+    """Tier requested by the caller (or the endpoint default), one step lower when degraded"""
+    name = (request.headers.get("x-quality-tier") or request.query_params.get("tier") or default).lower()
+    if name not in TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown quality tier {name!r}, expected one of {', '.join(TIER_ORDER)}")
+    if degraded:
+        name = TIER_ORDER[max(TIER_ORDER.index(name) - 1, 0)]
+
+    # Read back by the admission middleware to label latency by tier
+    request.state.quality_tier = name
+    inc('sign_requests_by_tier_total', tier=name, endpoint=request.url.path)
+    return TIERS[name]
+
+
+def variant_predictors(predictor):
+    """{model variant: predictor} for a loaded SignLanguageModel
+
+    The 'student' variant is the distilled model (see distill_student.py);
+    without one, or for other predictors, every tier uses `predictor`.
+    """
+    predictors = {'full': predictor, 'student': predictor}
+    # Imported here so importing tiers does not load TensorFlow
+    from model import SignLanguageModel, StudentModel, STUDENT_MODEL_PATH
+    # A served student is already the compact model
+    if not isinstance(predictor, SignLanguageModel) or isinstance(predictor, StudentModel):
+        return predictors
+
+    if not os.path.exists(STUDENT_MODEL_PATH):
+        logger.info(f"No student model at {STUDENT_MODEL_PATH}; the fast tier uses the full model")
+        return predictors
+
+    try:
+        student = StudentModel()
+    except (OSError, ValueError) as e:
+        logger.warning(f"{e}; the fast tier uses the full model")
+        return predictors
+    # Same outputs in the same order, or its answers would name the wrong signs
+    if student.num_hands != predictor.num_hands or student.classes != predictor.classes:
+        logger.warning(f"Student model at {STUDENT_MODEL_PATH} does not match the served model, not using it")
+        return predictors
+
+    logger.info(f"Fast tier uses the student model {student.version}")
+    predictors['student'] = student
+    return predictors
@@ -2,10 +2,25 @@
 Sign language model training script.
 Modified to train on numbers 1,2,3 and letters a,b,c.
 Run this after collecting data to train the sign language recognition model.
+
+Afterwards the k-NN fast path for static signs is rebuilt from the same
+data (see fast_path.py).
+
+With --incremental, the trained model is fine-tuned on just the sequences
+collected since it was last trained (see incremental.py), which takes
+seconds instead of a full retrain; --add-classes adds new signs to it.
+
+Usage:
+    python train.py
+    python train.py --incremental
+    python train.py --incremental --add-classes d e
 """
+import argparse
 import os
+import pickle
 import numpy as np
-from model import SignLanguageModel
+from model import SignLanguageModel, NUM_HANDS, PRESENCE_MASK, FEATURE_SET
+from fast_path import build_fast_path, STATIC_SIGNS
 import tensorflow as tf
 import matplotlib.pyplot as plt
 
@@ -43,7 +58,26 @@ def plot_training_history(history):
     
     print(f"Training plots saved to {plots_dir}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the numbers and letters model")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fine-tune the trained model on new or changed sequences only")
+    parser.add_argument('--add-classes', nargs='+', default=[], metavar='SIGN',
+                        help="New signs to add as output classes (with --incremental)")
+    return parser.parse_args()
+
+def save_labels(model):
+    """numbers_letters_api.py reads the class labels from the scaler path"""
+    with open(model.scaler_path, 'wb') as f:
+        pickle.dump(model.classes, f)
+
+def update_fast_path(model, data_dir):
+    """Re-index the static signs the model knows, so the router answers with the same classes"""
+    index = build_fast_path(data_dir, [sign for sign in STATIC_SIGNS if sign in model.classes])
+    print(f"Fast path indexed {len(index)} frames of {index.classes}")
+
 def main():
+    args = parse_args()
     print("=" * 50)
     print("SIGN LANGUAGE RECOGNITION MODEL TRAINING - NUMBERS AND LETTERS")
     print("=" * 50)
@@ -76,6 +110,22 @@ def main():
         print("Please run collect_data.py first to gather training data.")
         return
     
+    if args.incremental:
+        model.classes = model.classes + [name for name in args.add_classes if name not in model.classes]
+        print("\nFine-tuning on new sequences...")
+        history = model.train_incremental(data_dir)
+        save_labels(model)
+        update_fast_path(model, data_dir)
+        if history is None:
+            print("No new sequences since the last training, model unchanged.")
+        else:
+            print(f"\nModel updated with classes {model.classes}: {model.model_path}")
+        return
+    
+    # Start from scratch rather than from whichever model __init__ happened to load
+    model.num_hands, model.presence_mask, model.features = NUM_HANDS, PRESENCE_MASK, FEATURE_SET
+    model.create_model()
+    
     # Load and preprocess data
     print("\nPreparing training data...")
     X, y = model.prepare_data_from_directory(data_dir)
@@ -106,6 +156,9 @@ def main():
         validation_split=0.2
     )
     
+    save_labels(model)
+    update_fast_path(model, data_dir)
+    
     # Plot training history
     plot_training_history(history)
     
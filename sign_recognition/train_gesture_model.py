@@ -2,7 +2,16 @@
 Script to train a sign language translation model.
 Uses collected gesture data to train a classifier for sign recognition.
 Modified to train on 3 basic signs only.
+
+With --incremental, the trained model is fine-tuned on just the sequences
+collected since it was last trained (see incremental.py); --add-classes
+adds new signs to it.
+
+Usage:
+    python train_gesture_model.py
+    python train_gesture_model.py --incremental --add-classes please
 """
+import argparse
 import os
 import numpy as np
 import pickle
@@ -13,114 +22,106 @@ from tensorflow.keras.callbacks import ModelCheckpoint, ReduceLROnPlateau, Early
 from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
+from landmarks import prepare_sequence, drop_frames, input_layout, input_features, feature_width
+from landmark_store import iter_keyed_sequences
+from tcn import build_tcn
+from incremental import incremental_update, load_training_manifest, save_training_manifest
+from calibration import calibrate
+from model import artifact_version
 
 # Parameters
 data_dir = 'translation_data'
 model_dir = 'translation_models'
 os.makedirs(model_dir, exist_ok=True)
+model_path = os.path.join(model_dir, 'gesture_model.h5')
+labels_path = os.path.join(model_dir, 'gesture_labels.pkl')
 
 # Signs to recognize - reduced to 3 basic signs
 signs = ['hello', 'thanks', 'yes']
 sequence_length = 30  # frames per sequence
 num_landmarks = 21  # MediaPipe hand landmarks
 num_coords = 3  # x, y, z coordinates
+num_hands = int(os.getenv("NUM_HANDS", "1"))  # 2 for two-handed signs (collect with NUM_HANDS=2 too)
+# Add a per-frame hand presence column (set PRESENCE_MASK=true to train the mask-aware variant)
+presence_mask = os.getenv("PRESENCE_MASK", "false").lower() == "true"
+missing_frame_augment = float(os.getenv("MISSING_FRAME_AUGMENT", "0.2"))
+# Per-frame features: "landmarks" or "geometric" (joint angles, distances, velocity; see landmarks.py)
+feature_set = os.getenv("FEATURE_SET", "landmarks")
+# "lstm" or "tcn" (dilated temporal convolutions, see tcn.py)
+model_architecture = os.getenv("MODEL_ARCHITECTURE", "lstm")
 
 def preprocess_landmarks(landmarks_sequence):
     """Normalize and preprocess hand landmarks"""
-    # Ensure we have the right number of frames
-    if len(landmarks_sequence) < sequence_length:
-        # Pad with the last frame
-        last_frame = landmarks_sequence[-1]
-        landmarks_sequence = landmarks_sequence + [last_frame] * (sequence_length - len(landmarks_sequence))
-    elif len(landmarks_sequence) > sequence_length:
-        # Truncate
-        landmarks_sequence = landmarks_sequence[:sequence_length]
-    
-    # Flatten landmarks for each frame
-    flattened_sequence = []
-    for landmarks in landmarks_sequence:
-        # Convert to numpy array if not already
-        landmarks = np.array(landmarks)
-        
-        # Center the landmarks around the wrist
-        wrist = landmarks[0]  # Wrist is the first landmark in MediaPipe
-        centered = landmarks - wrist
-        
-        # Normalize for scale
-        max_dist = np.max(np.abs(centered))
-        if max_dist > 0:
-            normalized = centered / max_dist
-        else:
-            normalized = centered
-        
-        # Flatten to 1D array
-        flattened = normalized.flatten()
-        flattened_sequence.append(flattened)
-    
-    return np.array(flattened_sequence)
+    # Same imputation, resampling and normalization as the translation API
+    return prepare_sequence(landmarks_sequence, sequence_length, presence_mask, features=feature_set)
 
-def load_dataset():
-    """Load and preprocess all sign sequences"""
+def training_samples(sequence):
+    """Preprocessed samples for one raw sequence"""
+    samples = [preprocess_landmarks(sequence)]
+    # Extra copy with frames hidden so the model learns to use the mask
+    if presence_mask and missing_frame_augment > 0:
+        samples.append(preprocess_landmarks(drop_frames(sequence, missing_frame_augment)))
+    return samples
+
+def load_dataset(classes=None):
+    """Load and preprocess all sign sequences; also returns the key -> digest of every sequence"""
     X = []  # Sequences
     y = []  # Labels
+    digests = {}
     
-    for sign_idx, sign in enumerate(signs):
-        sign_dir = os.path.join(data_dir, sign)
-        if not os.path.exists(sign_dir):
-            print(f"Warning: Directory for '{sign}' not found!")
-            continue
-        
-        files = [f for f in os.listdir(sign_dir) if f.endswith('.npy')]
-        if not files:
-            print(f"Warning: No data files found for '{sign}'")
+    for sign_idx, sign in enumerate(classes or signs):
+        # data_dir may be a seq_N.npy tree or a landmark dataset (see landmark_store.py)
+        sequences = list(iter_keyed_sequences(data_dir, sign))
+        if not sequences:
+            print(f"Warning: No data found for '{sign}'")
             continue
             
-        print(f"Loading {len(files)} sequences for sign '{sign}'")
+        print(f"Loading {len(sequences)} sequences for sign '{sign}'")
         
-        for file_name in files:
+        for sequence_idx, (key, digest, sequence) in enumerate(sequences):
             try:
-                # Load the sequence
-                file_path = os.path.join(sign_dir, file_name)
-                sequence = np.load(file_path)
-                
-                # Preprocess
-                processed_sequence = preprocess_landmarks(sequence)
-                
-                # Add to dataset
-                X.append(processed_sequence)
-                y.append(sign_idx)
+                # Preprocess and add to dataset
+                for processed_sequence in training_samples(sequence):
+                    X.append(processed_sequence)
+                    y.append(sign_idx)
+                digests[key] = digest
             except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+                print(f"Error processing sequence {sequence_idx} of '{sign}': {e}")
     
-    return np.array(X), np.array(y)
+    return np.array(X), np.array(y), digests
 
 def create_model(input_shape, num_classes):
-    """Create a LSTM model for sign recognition"""
-    model = Sequential([
-        # LSTM layers
-        LSTM(64, return_sequences=True, input_shape=input_shape),
-        BatchNormalization(),
-        Dropout(0.3),
-        
-        LSTM(128, return_sequences=True),
-        BatchNormalization(),
-        Dropout(0.3),
-        
-        LSTM(64),
-        BatchNormalization(),
-        Dropout(0.3),
-        
-        # Dense layers
-        Dense(64, activation='relu'),
-        BatchNormalization(),
-        Dropout(0.3),
-        
-        Dense(32, activation='relu'),
-        BatchNormalization(),
-        
-        # Output layer
-        Dense(num_classes, activation='softmax')
-    ])
+    """Create a LSTM model for sign recognition (a temporal convolution network with MODEL_ARCHITECTURE=tcn)"""
+    if model_architecture == 'tcn':
+        model = build_tcn(input_shape, num_classes)
+    elif model_architecture != 'lstm':
+        raise ValueError(f"Unknown model architecture {model_architecture!r}, expected 'lstm' or 'tcn'")
+    else:
+        model = Sequential([
+            # LSTM layers
+            LSTM(64, return_sequences=True, input_shape=input_shape),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            LSTM(128, return_sequences=True),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            LSTM(64),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            # Dense layers
+            Dense(64, activation='relu'),
+            BatchNormalization(),
+            Dropout(0.3),
+            
+            Dense(32, activation='relu'),
+            BatchNormalization(),
+            
+            # Output layer
+            Dense(num_classes, activation='softmax')
+        ])
     
     # Compile
     model.compile(
@@ -131,10 +132,16 @@ def create_model(input_shape, num_classes):
     
     return model
 
+def calibrate_model(model, X_val, y_val):
+    """Fit the confidence temperature translate_api applies (see calibration.py) on held-out data"""
+    report = calibrate(model_path, model.predict(X_val, verbose=0), y_val, version=artifact_version(model_path))
+    print(f"Calibrated temperature {report['temperature']:.3f}: "
+          f"NLL {report['nll'][0]:.4f} -> {report['nll'][1]:.4f}, ECE {report['ece'][0]:.4f} -> {report['ece'][1]:.4f}")
+
 def train_model():
     """Load data and train the model"""
     # Load dataset
-    X, y = load_dataset()
+    X, y, digests = load_dataset()
     
     if len(X) == 0 or len(y) == 0:
         print("No data to train on!")
@@ -148,7 +155,7 @@ def train_model():
     )
     
     # Define input shape
-    input_shape = (sequence_length, num_landmarks * num_coords)
+    input_shape = (sequence_length, feature_width(num_hands, presence_mask, feature_set))
     
     # Create model
     model = create_model(input_shape, len(signs))
@@ -156,7 +163,7 @@ def train_model():
     
     # Callbacks
     checkpoint = ModelCheckpoint(
-        os.path.join(model_dir, 'gesture_model.h5'),
+        model_path,
         monitor='val_accuracy',
         save_best_only=True,
         verbose=1
@@ -190,9 +197,10 @@ def train_model():
         callbacks=[checkpoint, reduce_lr, early_stopping]
     )
     
-    # Save sign labels
-    with open(os.path.join(model_dir, 'gesture_labels.pkl'), 'wb') as f:
+    # Save sign labels, and the sequences trained on as the baseline for --incremental
+    with open(labels_path, 'wb') as f:
         pickle.dump(signs, f)
+    save_training_manifest(model_path, signs, digests)
     
     # Plot training history
     plt.figure(figsize=(12, 4))
@@ -219,7 +227,50 @@ def train_model():
     # Evaluate on test set
     test_loss, test_acc = model.evaluate(X_test, y_test)
     print(f"\nTest accuracy: {test_acc:.4f}")
-    print(f"Model saved to: {os.path.join(model_dir, 'gesture_model.h5')}")
+    print(f"Model saved to: {model_path}")
+    # Calibrate the checkpoint that is served, which may be from an earlier epoch
+    calibrate_model(tf.keras.models.load_model(model_path), X_test, y_test)
+
+def train_incremental(add_classes=()):
+    """Fine-tune the trained model on new or changed sequences, growing it for new signs"""
+    if not os.path.exists(model_path) or load_training_manifest(model_path) is None:
+        print(f"No trained model with a training manifest at {model_path}; run a full training first")
+        return
+    
+    global presence_mask, feature_set
+    model = tf.keras.models.load_model(model_path)
+    # Preprocess exactly like the model being refreshed was trained
+    presence_mask = input_layout(model)[1]
+    feature_set = input_features(model)
+    
+    model, classes, history = incremental_update(
+        model, model_path, signs + [name for name in add_classes if name not in signs],
+        data_dir, training_samples
+    )
+    if history is None:
+        print("No new sequences since the last training, model unchanged.")
+        return
+    
+    with open(labels_path, 'wb') as f:
+        pickle.dump(classes, f)
+    print(f"Model updated with signs {classes}: {model_path}")
+    
+    # The fine-tuned weights need their own temperature; refit it on the
+    # same held-out split a full training validates on
+    X, y, _ = load_dataset(classes)
+    if len(X) > 1:
+        _, X_val, _, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        calibrate_model(model, X_val, y_val)
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the gesture translation model")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fine-tune the trained model on new or changed sequences only")
+    parser.add_argument('--add-classes', nargs='+', default=[], metavar='SIGN',
+                        help="New signs to add as output classes (with --incremental)")
+    args = parser.parse_args()
+    
+    if args.incremental:
+        train_incremental(args.add_classes)
+    else:
+        train_model()
\ No newline at end of file
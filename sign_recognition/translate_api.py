@@ -7,13 +7,26 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-import base64
-import cv2
-import numpy as np
+import asyncio
 import os
-import mediapipe as mp
 import tensorflow as tf
 import pickle
+from admission import frame_stride, is_degraded, register_admission, thin_frames
+from profiling import register_profiling
+from frame_decoder import decode_frames
+from keyframes import extract_keyframe_landmarks, record_keyframe_metrics
+from landmarks import prepare_sequence, input_layout, input_features
+from metrics import register_metrics
+from calibration import load_calibration
+from model import artifact_version
+from landmark_classifier import classify_landmarks
+from prediction_cache import create_prediction_cache
+from responses import fast_json_response
+from server_config import uvicorn_options
+import shared_weights
+from tiers import resolve_tier
+from streaming import BinaryFrameParser, StreamingLandmarkPipeline
+from vision import landmark_extractor
 import logging
 import uvicorn
 
@@ -36,14 +49,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize MediaPipe Hands
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Opt-in per-request profiling (requires PROFILE_TOKEN)
+register_profiling(app)
+register_metrics(app)
+# Per-client rate limits, and reduced fidelity or 503 under overload
+register_admission(app)
 
 # Load translation model
 model_dir = 'translation_models'
@@ -53,18 +63,24 @@ labels_path = os.path.join(model_dir, 'gesture_labels.pkl')
 # Check if model exists
 if os.path.exists(model_path) and os.path.exists(labels_path):
     try:
-        model = tf.keras.models.load_model(model_path)
+        model = shared_weights.load_model(model_path)
         with open(labels_path, 'rb') as f:
             gesture_labels = pickle.load(f)
         logger.info(f"Model loaded successfully with {len(gesture_labels)} gestures")
+        model_version = artifact_version(model_path)
+        # Confidence temperature fitted by train.py / calibrate_model.py (see calibration.py)
+        calibration = load_calibration(model_path)
+        temperature = calibration['temperature'] if calibration else 1.0
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         model = None
         gesture_labels = None
+        temperature = 1.0
 else:
     logger.warning("Model files not found. Use train_gesture_model.py to train first.")
     model = None
     gesture_labels = ['hello', 'thanks', 'yes']  # Default labels
+    temperature = 1.0
 
 # Simple translation dictionary - reduced to 3 signs
 translations = {
@@ -88,15 +104,43 @@ translations = {
     }
 }
 
+def build_response_table(labels):
+    """Resolve every label's translation per language once, English fallback included"""
+    table = {}
+    for label in labels or []:
+        entry = translations.get(label, {})
+        fallback = entry.get('en', label)
+        table[label] = {language: entry.get(language, fallback) for language in LANGUAGES}
+    return table
+
+# Languages the translation dictionary covers
+LANGUAGES = sorted({language for entry in translations.values() for language in entry})
+
+# Translation of captures without a (confidently) recognized sign
+NO_SIGN_TEXT = "No sign detected"
+
+# Label -> language -> translation, rebuilt whenever a model (and its labels) is loaded
+response_table = build_response_table(gesture_labels)
+
+# Repeat submissions of the same capture are answered from the cache
+prediction_cache = create_prediction_cache()
+
 # Sequence parameters
 sequence_length = 30
 num_landmarks = 21
 num_coords = 3
 
+# Hands per frame, presence mask column and feature set the loaded model expects
+num_hands, presence_mask = input_layout(model)
+feature_set = input_features(model)
+# Quality tier of requests that do not ask for one (see tiers.py); live previews favour latency
+TRANSLATE_QUALITY_TIER = os.getenv("TRANSLATE_QUALITY_TIER", "fast")
+
 # Data models
 class FrameData(BaseModel):
     frames: List[str]  # Base64 encoded frames
     language: str = "en"  # Target language code
+    include_predictions: bool = False  # Return per-class scores in all_predictions
 
 class TranslationResult(BaseModel):
     detected_sign: str
@@ -105,6 +149,7 @@ class TranslationResult(BaseModel):
     language: str
     all_predictions: Optional[Dict[str, float]] = None
     message: Optional[str] = None
+    tier: Optional[str] = None  # Quality tier the request was served at
 
 # Increase the maximum size for requests
 @app.middleware("http")
@@ -113,114 +158,58 @@ async def add_process_time_header(request: Request, call_next):
     response = await call_next(request)
     return response
 
-def base64_to_image(base64_string):
-    """Convert base64 string to OpenCV image"""
-    try:
-        # Remove the data URL prefix if present
-        if "data:image" in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64
-        img_data = base64.b64decode(base64_string)
-        np_arr = np.frombuffer(img_data, np.uint8)
-        
-        # Convert to OpenCV image
-        return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    except Exception as e:
-        logger.error(f"Error converting base64 to image: {e}")
-        return None
-
-def extract_hand_landmarks(frame):
-    """Extract hand landmarks from frame using MediaPipe"""
-    try:
-        # Convert to RGB (MediaPipe requires RGB)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = hands.process(rgb_frame)
-        
-        # Check for hand landmarks
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]  # First hand
-            
-            # Extract landmarks
-            landmarks = []
-            for landmark in hand_landmarks.landmark:
-                landmarks.append([landmark.x, landmark.y, landmark.z])
-            
-            return landmarks
-        
-        return None
-    except Exception as e:
-        logger.error(f"Error extracting hand landmarks: {e}")
-        return None
-
 def preprocess_landmarks(landmarks_sequence):
-    """Normalize and preprocess hand landmarks for model input"""
-    # Ensure we have the right number of frames
-    if len(landmarks_sequence) < sequence_length:
-        # Pad with the last frame
-        last_frame = landmarks_sequence[-1]
-        landmarks_sequence = landmarks_sequence + [last_frame] * (sequence_length - len(landmarks_sequence))
-    elif len(landmarks_sequence) > sequence_length:
-        # Truncate
-        landmarks_sequence = landmarks_sequence[:sequence_length]
-    
-    # Flatten landmarks for each frame
-    flattened_sequence = []
-    for landmarks in landmarks_sequence:
-        # Convert to numpy array if not already
-        landmarks = np.array(landmarks)
-        
-        # Center the landmarks around the wrist
-        wrist = landmarks[0]  # Wrist is the first landmark in MediaPipe
-        centered = landmarks - wrist
-        
-        # Normalize for scale
-        max_dist = np.max(np.abs(centered))
-        if max_dist > 0:
-            normalized = centered / max_dist
-        else:
-            normalized = centered
-        
-        # Flatten to 1D array
-        flattened = normalized.flatten()
-        flattened_sequence.append(flattened)
-    
-    return np.array(flattened_sequence)
+    """Impute frames without a hand (None), then normalize and preprocess hand landmarks for model input"""
+    return prepare_sequence(landmarks_sequence, sequence_length, presence_mask, features=feature_set)
 
 def translate_text(text, target_language):
-    """Translate text to target language using dictionary"""
-    if text in translations and target_language in translations[text]:
-        return translations[text][target_language]
-    
-    # Fallback to English if translation not available
-    return translations.get(text, {}).get('en', text)
+    """Translate text to target language using the precomputed response table"""
+    row = response_table.get(text)
+    if row is None:
+        # Fallback to English if translation not available
+        return translations.get(text, {}).get('en', text)
+    return row.get(target_language, row['en'])
+
+def translation_response(detected_sign, confidence, translation, language, all_predictions=None, message=None,
+                         tier=None):
+    """TranslationResult-shaped response, serialized without per-request validation"""
+    return fast_json_response({
+        "detected_sign": detected_sign,
+        "confidence": confidence,
+        "translation": translation,
+        "language": language,
+        "all_predictions": all_predictions,
+        "message": message,
+        "tier": tier
+    })
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "Sign Language Translation API"}
 
+def mock_response(language):
+    """For demonstration purposes, a mock response when the model isn't available"""
+    mock_sign = "hello"  # Default to hello
+    mock_confidence = 0.8
+    mock_translation = translate_text(mock_sign, language)
+    
+    return translation_response(
+        detected_sign=mock_sign,
+        confidence=mock_confidence,
+        translation=mock_translation,
+        language=language,
+        message="Using mock response (model not loaded)"
+    )
+
 @app.post("/api/translate", response_model=TranslationResult)
-async def translate_sign(data: FrameData):
+async def translate_sign(data: FrameData, request: Request):
     """
     Recognize sign language from a sequence of frames and translate to selected language
     """
     # Check if model is initialized
     if model is None:
-        # For demonstration purposes, use a mock response if model isn't available
-        mock_sign = "hello"  # Default to hello
-        mock_confidence = 0.8
-        mock_translation = translate_text(mock_sign, data.language)
-        
-        return TranslationResult(
-            detected_sign=mock_sign,
-            confidence=mock_confidence,
-            translation=mock_translation,
-            language=data.language,
-            message="Using mock response (model not loaded)"
-        )
+        return mock_response(data.language)
     
     # Check for frames
     if not data.frames or len(data.frames) == 0:
@@ -228,75 +217,122 @@ async def translate_sign(data: FrameData):
     
     logger.info(f"Received {len(data.frames)} frames for translation to {data.language}")
     
-    # Process frames
-    all_landmarks = []
-    frames_processed = 0
-    frames_with_hands = 0
+    # Decode all frames of the request in parallel
+    # Under load only a subset of the frames is processed, one tier lower
+    degraded = is_degraded(request)
+    frames = thin_frames(data.frames) if degraded else data.frames
+    tier = resolve_tier(request, TRANSLATE_QUALITY_TIER, degraded)
+    return translate_frames(decode_frames(frames, tier.decode_scale), data.language, tier,
+                            data.include_predictions, degraded)
+
+@app.post("/api/translate/frames", response_model=TranslationResult)
+async def translate_sign_frames(request: Request):
+    """
+    Translate a binary body of length-prefixed encoded frames
+
+    Each frame is a 4-byte big-endian length followed by the JPEG/PNG bytes;
+    the language comes in the X-Language header (or the language query
+    parameter) and include_predictions=true may be passed as a query
+    parameter. Saves the proxy from base64 and JSON on every poll. Frames
+    are decoded and hand-tracked while the rest of the body is still arriving.
+    """
+    language = request.headers.get("x-language") or request.query_params.get("language", "en")
+    include_predictions = request.query_params.get("include_predictions", "false").lower() == "true"
+    if model is None:
+        return mock_response(language)
     
+    # Under load only every n-th frame is processed, one tier lower
+    degraded = is_degraded(request)
+    tier = resolve_tier(request, TRANSLATE_QUALITY_TIER, degraded)
+    parser = BinaryFrameParser()
+    pipeline = StreamingLandmarkPipeline(landmark_extractor(num_hands, tier.model_complexity),
+                                         tier.keyframe_threshold, tier.keyframe_max_gap,
+                                         stride=frame_stride(request), scale=tier.decode_scale)
     try:
-        for base64_frame in data.frames:
-            # Convert base64 to image
-            frame = base64_to_image(base64_frame)
-            frames_processed += 1
-            
-            if frame is None:
-                continue
-            
-            # Extract landmarks
-            landmarks = extract_hand_landmarks(frame)
-            
-            if landmarks is not None:
-                all_landmarks.append(landmarks)
-                frames_with_hands += 1
-        
-        logger.info(f"Processed {frames_processed} frames, found hands in {frames_with_hands} frames")
+        async for chunk in request.stream():
+            for frame in parser.feed(chunk):
+                pipeline.submit_encoded(frame)
+        parser.close()
+    except ValueError as e:
+        pipeline.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # Client went away mid-upload; give the tracker back
+        pipeline.cancel()
+        raise
+    
+    if pipeline.frames_received == 0:
+        raise HTTPException(status_code=400, detail="No frames provided")
+    
+    logger.info(f"Received {pipeline.frames_received} binary frames for translation to {language}")
+    
+    try:
+        frame_landmarks, keyframe_count = await pipeline.finish()
+    except Exception as e:
+        logger.error(f"Error in translation: {e}")
+        raise HTTPException(status_code=500, detail=f"Error in translation: {str(e)}")
+    
+    record_keyframe_metrics("translate_frames", pipeline.frames_decoded, keyframe_count, tier)
+    # The model runs off the event loop, so other uploads keep streaming in meanwhile
+    return await asyncio.to_thread(translate_landmarks, frame_landmarks, keyframe_count, pipeline.frames_received,
+                                   language, tier, include_predictions, degraded)
+
+def translate_frames(frames, language, tier, include_predictions=False, degraded=False):
+    """Recognize and translate decoded frames (None for frames that failed to decode) at a quality tier"""
+    decoded_frames = [frame for frame in frames if frame is not None]
+    
+    try:
+        # Run MediaPipe on keyframes only and interpolate the frames in between
+        frame_landmarks, keyframe_count = extract_keyframe_landmarks(
+            decoded_frames, landmark_extractor(num_hands, tier.model_complexity),
+            tier.keyframe_threshold, tier.keyframe_max_gap
+        )
+    except Exception as e:
+        logger.error(f"Error in translation: {e}")
+        raise HTTPException(status_code=500, detail=f"Error in translation: {str(e)}")
+    
+    record_keyframe_metrics("translate", len(decoded_frames), keyframe_count, tier)
+    return translate_landmarks(frame_landmarks, keyframe_count, len(frames), language, tier,
+                               include_predictions, degraded)
+
+def translate_landmarks(frame_landmarks, keyframe_count, frames_processed, language, tier,
+                        include_predictions=False, degraded=False):
+    """Classify per-frame landmarks (None where no hand was found) and translate the sign"""
+    try:
+        result = classify_landmarks(frame_landmarks, model, gesture_labels, preprocess_landmarks, model_version,
+                                    temperature, prediction_cache)
+        logger.info(f"Processed {frames_processed} frames ({keyframe_count} keyframes), found hands in {result.frames_with_hands} frames")
         
-        # Check if we have enough landmarks
-        if len(all_landmarks) == 0:
-            return TranslationResult(
-                detected_sign="unknown",
+        if result.rejection:
+            return translation_response(
+                detected_sign=result.sign,
                 confidence=0.0,
-                translation="No sign detected",
-                language=data.language,
-                message="No hand landmarks detected in any frame"
+                translation=NO_SIGN_TEXT,
+                language=language,
+                message=result.rejection,
+                tier=tier.name
             )
         
-        # Preprocess landmarks for model input
-        processed_sequence = preprocess_landmarks(all_landmarks)
-        
-        # Add batch dimension
-        input_data = np.expand_dims(processed_sequence, axis=0)
-        
-        # Get prediction
-        prediction = model.predict(input_data)[0]
-        
-        # Get top prediction
-        predicted_idx = np.argmax(prediction)
-        confidence = float(prediction[predicted_idx])
-        
-        if predicted_idx < len(gesture_labels):
-            detected_sign = gesture_labels[predicted_idx]
-        else:
-            detected_sign = "unknown"
-            
-        # Get translation
-        translation = translate_text(detected_sign, data.language)
+        # An uncertain answer is rejected like a capture without a sign
+        translation = NO_SIGN_TEXT if result.sign == "uncertain" else translate_text(result.sign, language)
         
-        # Prepare all predictions for debugging
-        all_predictions = {
-            gesture_labels[i]: float(prediction[i]) 
-            for i in range(len(gesture_labels))
-        }
+        # Per-class scores are only built when the client asks for them
+        all_predictions = None
+        if include_predictions:
+            all_predictions = dict(zip(gesture_labels, result.probabilities.tolist()))
         
-        logger.info(f"Detected: {detected_sign} ({confidence:.2f}), Translated to {data.language}: {translation}")
+        logger.info(f"Detected: {result.sign} ({result.confidence:.2f}), Translated to {language}: {translation}")
         
-        return TranslationResult(
-            detected_sign=detected_sign,
-            confidence=confidence,
+        return translation_response(
+            detected_sign=result.sign,
+            confidence=result.confidence,
             translation=translation,
-            language=data.language,
+            language=language,
             all_predictions=all_predictions,
-            message=f"Hand detected in {frames_with_hands}/{frames_processed} frames"
+            message=f"Hand detected in {result.frames_with_hands}/{frames_processed} frames ({keyframe_count} keyframes)"
+                    + (", cached prediction" if result.cache_hit else "")
+                    + (", reduced fidelity under load" if degraded else ""),
+            tier=tier.name
         )
     
     except Exception as e:
@@ -304,4 +340,4 @@ async def translate_sign(data: FrameData):
         raise HTTPException(status_code=500, detail=f"Error in translation: {str(e)}")
 
 if __name__ == "__main__":
-    uvicorn.run("translate_api:app", host="0.0.0.0", port=8001, reload=True)
\ No newline at end of file
+    uvicorn.run("translate_api:app", host="0.0.0.0", port=8001, reload=True, **uvicorn_options())
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Shared frame decoding and hand landmark extraction for the sign recognition APIs.
+MediaPipe graphs own native threads that do not survive a fork and are not
+safe to share between threads, so every process and thread lazily builds its
+own Hands instance on first use.
+
+Two-hand models get 42 landmarks per frame, left hand first, from a tracker
+that only pays for two-hand palm detection every few frames while a single
+hand is in view.
+"""
+import cv2
+import functools
+import numpy as np
+import os
+import threading
+import mediapipe as mp
+from frame_decoder import get_decoder
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+mp_hands = mp.solutions.hands
+
+# While only one hand is visible, look for a second one every this many frames
+TWO_HAND_REDETECT_INTERVAL = int(os.getenv("TWO_HAND_REDETECT_INTERVAL", "5"))
+
+# Per-thread state: the MediaPipe Hands instance (see get_hands()) and an
+# RGB conversion buffer reused while the frame size stays the same
+_buffers = threading.local()
+
+
+def create_hands(max_num_hands=1, model_complexity=1):
+    return mp_hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_num_hands,
+        model_complexity=model_complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def get_hands(model_complexity=1):
+    """Return the MediaPipe Hands instance owned by the current process and thread"""
+    # A forked child inherits the parent's thread-local values, so check the pid too
+    if getattr(_buffers, 'hands_pid', None) != os.getpid():
+        _buffers.hands = {}
+        _buffers.hands_pid = os.getpid()
+
+    if model_complexity not in _buffers.hands:
+        _buffers.hands[model_complexity] = create_hands(model_complexity=model_complexity)
+    return _buffers.hands[model_complexity]
+
+
+class TwoHandTracker:
+    """Two-hand landmarks at close to single-hand cost
+
+    In video mode MediaPipe runs palm detection on every frame in which it
+    tracks fewer than max_num_hands hands, so a two-hand graph pays for
+    detection on every frame of a one-handed sign. While only one hand is in
+    view, frames go to a single-hand graph that just tracks it, and the
+    two-hand graph looks for a second hand every redetect_interval frames.
+    """
+
+    def __init__(self, redetect_interval=TWO_HAND_REDETECT_INTERVAL, model_complexity=1):
+        self.redetect_interval = max(1, redetect_interval)
+        self.two_hands = create_hands(max_num_hands=2, model_complexity=model_complexity)
+        self.one_hand = create_hands(max_num_hands=1, model_complexity=model_complexity)
+        self.single_hand_frames = 0  # Consecutive frames with fewer than two hands
+
+    def process(self, rgb_frame):
+        probe = self.single_hand_frames % self.redetect_interval == 0
+        results = (self.two_hands if probe else self.one_hand).process(rgb_frame)
+
+        if len(results.multi_hand_landmarks or []) >= 2:
+            self.single_hand_frames = 0
+        else:
+            self.single_hand_frames += 1
+        return results
+
+    def reset(self):
+        reset_hands(self.two_hands)
+        reset_hands(self.one_hand)
+        self.single_hand_frames = 0
+
+    def close(self):
+        self.two_hands.close()
+        self.one_hand.close()
+
+
+def reset_hands(hands):
+    """Forget the video-mode tracking state of a Hands instance"""
+    reset = getattr(hands, 'reset', None)
+    if reset is not None:
+        reset()
+    else:
+        # Older MediaPipe releases cannot reset a graph; feed a blank frame so the hand is lost
+        hands.process(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+def reset_trackers():
+    """Reset every Hands instance and TwoHandTracker of the current thread
+
+    Video-mode graphs carry the last hand over to the next frame, so a thread
+    that starts tracking a different capture must not inherit it.
+    """
+    if getattr(_buffers, 'hands_pid', None) == os.getpid():
+        for hands in _buffers.hands.values():
+            reset_hands(hands)
+    if getattr(_buffers, 'tracker_pid', None) == os.getpid():
+        for tracker in _buffers.tracker.values():
+            tracker.reset()
+
+
+def get_two_hand_tracker(model_complexity=1):
+    """Return the TwoHandTracker owned by the current process and thread"""
+    if getattr(_buffers, 'tracker_pid', None) != os.getpid():
+        _buffers.tracker = {}
+        _buffers.tracker_pid = os.getpid()
+
+    if model_complexity not in _buffers.tracker:
+        _buffers.tracker[model_complexity] = TwoHandTracker(model_complexity=model_complexity)
+    return _buffers.tracker[model_complexity]
+
+
+def base64_to_image(base64_string):
+    """Convert base64 string to OpenCV image"""
+    return get_decoder().decode_base64(base64_string)
+
+
+def rgb_buffer(shape):
+    """Reusable RGB buffer for the calling thread"""
+    buffer = getattr(_buffers, 'rgb', None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        _buffers.rgb = buffer
+    return buffer
+
+
+def process_frame(frame, is_rgb, process):
+    """Run a MediaPipe process callable on a BGR or RGB frame"""
+    if is_rgb:
+        rgb_frame = frame
+    else:
+        # Convert to RGB (MediaPipe requires RGB) into the reusable buffer
+        rgb_frame = rgb_buffer(frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+
+    # A read-only array is passed to MediaPipe by reference instead of copied
+    rgb_frame.flags.writeable = False
+    try:
+        return process(rgb_frame)
+    finally:
+        rgb_frame.flags.writeable = True
+
+
+def hand_to_list(hand_landmarks):
+    return [[landmark.x, landmark.y, landmark.z] for landmark in hand_landmarks.landmark]
+
+
+def order_hands(results):
+    """(left, right) hand landmarks of a MediaPipe result, None for a missing hand
+
+    Hands are slotted by MediaPipe's handedness label; when both get the same
+    label the one further left in the image goes first.
+    """
+    hands = list(zip(results.multi_hand_landmarks or [], results.multi_handedness or []))[:2]
+    if not hands:
+        return None, None
+
+    labels = [handedness.classification[0].label for _, handedness in hands]
+    if len(hands) == 1:
+        landmarks = hand_to_list(hands[0][0])
+        return (landmarks, None) if labels[0] == 'Left' else (None, landmarks)
+
+    if labels[0] == labels[1]:
+        hands.sort(key=lambda hand: hand[0].landmark[0].x)
+    elif labels[0] == 'Right':
+        hands.reverse()
+    return hand_to_list(hands[0][0]), hand_to_list(hands[1][0])
+
+
+def two_hand_landmarks(results):
+    """42 landmarks (left hand, then right hand, zeros for a missing one), or None without hands"""
+    left, right = order_hands(results)
+    if left is None and right is None:
+        return None
+    absent = [[0.0, 0.0, 0.0]] * 21
+    return (left or absent) + (right or absent)
+
+
+def extract_hand_landmarks(frame, is_rgb=False, model_complexity=1):
+    """Extract hand landmarks from frame using MediaPipe"""
+    try:
+        results = process_frame(frame, is_rgb, get_hands(model_complexity).process)
+
+        # Check for hand landmarks
+        if results.multi_hand_landmarks:
+            return hand_to_list(results.multi_hand_landmarks[0])  # First hand
+
+        return None
+    except Exception as e:
+        logger.error(f"Error extracting hand landmarks: {e}")
+        logger.error(traceback.format_exc())
+        return None
+
+
+def extract_two_hand_landmarks(frame, is_rgb=False, model_complexity=1):
+    """Extract 42 handedness-ordered landmarks from frame, or None if no hand is visible"""
+    try:
+        return two_hand_landmarks(process_frame(frame, is_rgb, get_two_hand_tracker(model_complexity).process))
+    except Exception as e:
+        logger.error(f"Error extracting two-hand landmarks: {e}")
+        logger.error(traceback.format_exc())
+        return None
+
+
+def landmark_extractor(num_hands=1, model_complexity=1):
+    """Per-frame extraction function for a model built for num_hands hands"""
+    extract = extract_two_hand_landmarks if num_hands == 2 else extract_hand_landmarks
+    if model_complexity != 1:
+        # The lite hand model (0) tracks faster at some cost in precision
+        return functools.partial(extract, model_complexity=model_complexity)
+    return extract